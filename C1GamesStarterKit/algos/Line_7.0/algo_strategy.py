@@ -1,4 +1,3 @@
-import cProfile
 import timeit
 import gamelib
 import random
@@ -8,6 +7,8 @@ import json
 import operator
 import time
 import copy
+import os
+import numpy as np
 from sys import maxsize
 
 """x
@@ -62,6 +63,33 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
 
         self.storage = gamelib.Storage(config)
+
+        # Score attacks together in a BatchSimulator instead of one Simulator each. It follows the ArrayBoard rules,
+        # where our destructors fire, so it ranks attacks differently from the Simulator
+        self.batch_attacks = os.environ.get("GAMELIB_BATCH_ATTACKS", "").strip() not in ["", "0"]
+
+        # Number of worker processes used to search attacks, 0 keeps the search in this process
+        self.attack_workers = int(os.environ.get("GAMELIB_ATTACK_WORKERS", "").strip() or 0)
+        self.attack_pool = None
+        if self.attack_workers > 0:
+            self.attack_pool = gamelib.AttackPool(config, self.storage, self.attack_workers, self.batch_attacks)
+
+        self.scheduler = gamelib.SearchScheduler(config)
+
+        # Simulate the next turn's enemy attacks on a background thread while the action phase plays out.
+        # The thread has its own Storage, the FieldCache of self.storage is not safe to use from two threads
+        self.precompute_next_turn = os.environ.get("GAMELIB_PRECOMPUTE", "").strip() not in ["", "0"]
+        self.precomputer = None
+        self.precompute_storage = None
+        if self.precompute_next_turn:
+            self.precomputer = gamelib.Precomputer()
+            self.precompute_storage = gamelib.Storage(config)
+        self.precomputed = {}
+        # Candidate attacks kept for simulation after the estimator has ranked them
+        self.attack_top_k = 24
+
+        # Only used for its reach() masks in parse_action_phase
+        self.threat_map = gamelib.ThreatMap(self.storage)
         
         self.lastAttack = 0
         self.EMP = 0
@@ -120,6 +148,11 @@ class AlgoStrategy(gamelib.AlgoCore):
                 gamelib.debug_write("A {} at ({}, {})  ".format(build.unit_type, build.loc[0], build.loc[1]))
 
 
+    def on_game_end(self, game_state_string):
+        if self.attack_pool is not None:
+            self.attack_pool.close()
+            self.attack_pool = None
+
     def on_turn(self, turn_state):
         """
         This function is called every turn with the game state wrapper as
@@ -130,11 +163,15 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
 
         self.turn_state = turn_state
+        # Parsed once, every game state and simulator of the turn is built from it
+        self.turn_snapshot = gamelib.TurnSnapshot(self.config, turn_state, self.storage)
+        if self.precomputer is not None:
+            self.precomputed = self.precomputer.take(self.turn_snapshot.key())
 
         if self.action_phase:
             self.action_phase = False
 
-        game_state = gamelib.GameState(self.config, turn_state, self.storage)
+        game_state = gamelib.GameState(self.config, self.turn_snapshot, self.storage)
 
         #if self.simulation2 != None and game_state.turn_number % 2 != 0:
         #    self.simulation2.game_state.game_map.calculate()
@@ -157,11 +194,13 @@ class AlgoStrategy(gamelib.AlgoCore):
     def starter_strategy(self, game_state):
         import timeit
 
-        self.turn_start = time.clock()
+        self.scheduler.start_turn()
 
-        self.build_base_defences(game_state)
-        
-        self.deploy_attackers(game_state)
+        with gamelib.telemetry.span("build"):
+            self.build_base_defences(game_state)
+
+        with gamelib.telemetry.span("deploy"):
+            self.deploy_attackers(game_state)
 
     # Here we make the base defences!
     def build_base_defences(self, game_state):
@@ -309,13 +348,9 @@ class AlgoStrategy(gamelib.AlgoCore):
     def deploy_attackers(self, game_state):
 
         # Determine unit attack type
-        import cProfile, pstats, io
-        pr = cProfile.Profile()
-        pr.enable()
-        
         #start_time = time.clock()
 
-        base_simul = gamelib.Simulator(self.config, self.turn_state, self.storage)
+        base_simul = gamelib.Simulator(self.config, self.turn_snapshot, self.storage)
         base_simul.calculate()
         last_ideal = 0
         """
@@ -348,55 +383,26 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         """
 
-        attacks = []
-
-        # Check all possible attacks from the enemy
-        for x in range(0, 28):
-            if x < 14:
-                y = x + 14
-            else:
-                y = 41 - x
-
-            if game_state.can_spawn(SCRAMBLER, [x, y], 1, 1):
-
-                # Check EMPs
-                simul = gamelib.Simulator(self.config, self.turn_state, self.storage)
-
-                simul.game_state.game_map.copy_pathing(base_simul.game_state.game_map.pathfinding_map)
-                simul.calculated = True
-
-                enemy_info_spawn = [x, y]
-                simul.game_state.attempt_add(EMP, enemy_info_spawn, game_state.number_affordable(EMP, 1), 1)
-                simul.simulate()
-                attacks.append(gamelib.Possible_Attack(EMP, enemy_info_spawn, simul.idealness()))
-
-                # Check Scramblers                
-                simul = gamelib.Simulator(self.config, self.turn_state, self.storage)
-
-                simul.game_state.game_map.copy_pathing(base_simul.game_state.game_map.pathfinding_map)
-                simul.calculated = True
-
-                enemy_info_spawn = [x, y]
-                simul.game_state.attempt_add(SCRAMBLER, enemy_info_spawn, game_state.number_affordable(SCRAMBLER, 1), 1)
-                simul.simulate()
-                attacks.append(gamelib.Possible_Attack(SCRAMBLER, enemy_info_spawn, simul.idealness()))
-
-                # Check Pings                
-                simul = gamelib.Simulator(self.config, self.turn_state, self.storage)
-
-                simul.game_state.game_map.copy_pathing(base_simul.game_state.game_map.pathfinding_map)
-                simul.calculated = True
-
-                enemy_info_spawn = [x, y]
-                simul.game_state.attempt_add(PING, enemy_info_spawn, game_state.number_affordable(PING, 1), 1)
-                simul.simulate()
-                attacks.append(gamelib.Possible_Attack(PING, enemy_info_spawn, simul.idealness()))
-
-
-        attacks.sort(key=operator.attrgetter('idealness'), reverse=True)
-
-        for i in range(0, 5):
-            a = attacks[i]
+        candidates = self.enemy_attacks(game_state)
+
+        if self.attack_pool is not None:
+            evaluate = lambda chunk: self.attack_pool.evaluate(self.turn_state, chunk)
+        else:
+            evaluate = lambda chunk: self.simulate_attacks(base_simul, chunk)
+        # Attacks simulated while the last action phase played out are not simulated again
+        evaluate = gamelib.cached(self.precomputed, evaluate)
+        gamelib.telemetry.count("precomputed_attacks", len(self.precomputed))
+
+        # Only the attacks the estimator finds most threatening are simulated, most threatening first.
+        # Whatever is left when the budget runs out is skipped
+        estimator = gamelib.AttackEstimator(base_simul.game_state)
+        threat = lambda candidate: self.attack_threat(estimator, candidate)
+        results, skipped = self.scheduler.search(candidates, threat, evaluate, self.attack_top_k)
+        gamelib.telemetry.count("simulated_attacks", len(results))
+        gamelib.telemetry.count("skipped", skipped)
+        attacks = [gamelib.Possible_Attack(unit_type, location, idealness) for idealness, (unit_type, location, num, player_index) in results]
+
+        for a in attacks[:5]:
             unit_type = ""
             if a.unit_type == "SI":
                 unit_type = "SCRAMBLER"
@@ -407,31 +413,6 @@ class AlgoStrategy(gamelib.AlgoCore):
             gamelib.debug_write("Placing {} at {} causes idealness {}".format(unit_type, a.location, a.idealness))
         
 
-        """
-        for n_simul in range(0, 10000):
-
-            if time.clock() - self.turn_start >= 5:
-                gamelib.debug_write("Completed {} simulations this turn".format(n_simul))
-                gamelib.debug_write("Last idealness: {}".format(last_ideal))
-                self.n_simuls.append(n_simul)
-                break
-
-            #simul = gamelib.Simulator(self.config, self.turn_state, self.storage)
-            #gamelib.debug_write("Initialization of simulator in {}s".format(time.clock()-start_time))
-
-            #simul = copy.deepcopy(base_simul)
-
-            simul = gamelib.Simulator(self.config, self.turn_state, self.storage)
-
-            simul.game_state.game_map.copy_pathing(base_simul.game_state.game_map.pathfinding_map)
-            simul.calculated = True
-
-            simul.game_state.attempt_add(EMP, self.emp_spawn_loc, game_state.number_affordable(EMP), 0)
-            enemy_info_spawn = [27-24, 27-10]
-            simul.game_state.attempt_add(EMP, enemy_info_spawn, game_state.number_affordable(EMP, 1), 1)
-            simul.simulate()
-            last_ideal = simul.idealness()
-        """
         #sim()
         #prun sim()
         #timeit.timeit(sim)
@@ -439,14 +420,6 @@ class AlgoStrategy(gamelib.AlgoCore):
         #end_time = time.clock()
         #gamelib.debug_write("Finished simulation in {}s".format(end_time-start_time))
         
-        # ... do something ...
-        pr.disable()
-        s = io.StringIO()
-        sortby = 'cumulative'
-        ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
-        ps.print_stats()
-        gamelib.debug_write(s.getvalue())
-        
         """
 
         self.n_simuls.append(time_mid-time_start)
@@ -506,12 +479,69 @@ class AlgoStrategy(gamelib.AlgoCore):
                 filtered.append(location)
         return filtered
 
+    def enemy_attacks(self, game_state):
+        """Every (unit_type, location, num, player_index) attack the enemy can make with all of its bits"""
+        candidates = []
+
+        # Check all possible attacks from the enemy
+        for x in range(0, 28):
+            if x < 14:
+                y = x + 14
+            else:
+                y = 41 - x
+
+            if game_state.can_spawn(SCRAMBLER, [x, y], 1, 1):
+                enemy_info_spawn = [x, y]
+                for unit_type in [EMP, SCRAMBLER, PING]:
+                    candidates.append((unit_type, enemy_info_spawn, game_state.number_affordable(unit_type, 1), 1))
+
+        return candidates
+
+    def precompute_attacks(self, snapshot):
+        """Starts simulating the enemy attacks of the turn that should follow the last frame of an action phase"""
+        next_turn = snapshot.next_turn(self.precompute_storage)
+
+        def prepare():
+            base_simul = gamelib.Simulator(self.config, next_turn, self.precompute_storage)
+            base_simul.calculate()
+            estimator = gamelib.AttackEstimator(base_simul.game_state)
+            threat = lambda candidate: self.attack_threat(estimator, candidate)
+            candidates = gamelib.SearchScheduler.rank(self.enemy_attacks(base_simul.game_state), threat, self.attack_top_k)
+            return candidates, lambda chunk: self.simulate_attacks(base_simul, chunk)
+
+        self.precomputer.start(next_turn.key(), prepare)
+
+    def simulate_attacks(self, base_simul, candidates):
+        """Simulates each (unit_type, location, num, player_index) candidate against base_simul and returns their idealness
+
+        Every candidate runs on its own fork of base_simul, so attacks are ranked by Simulator.idealness. With
+        batch_attacks they run together in a BatchSimulator instead, which follows the ArrayBoard rules: our
+        destructors fire on the attack, which the Simulator never lets them do, so the ranking differs.
+        """
+        if self.batch_attacks:
+            batch = gamelib.BatchSimulator(base_simul, [[candidate] for candidate in candidates])
+            batch.simulate()
+            return batch.idealness()
+        return base_simul.evaluate(candidates)
+
+    def attack_threat(self, estimator, candidate):
+        """Cheap estimate of how dangerous an enemy attack is, the idealness it is predicted to cost us"""
+        return -estimator.estimate(*candidate).idealness
+
 
     def parse_action_phase(self, turn_state):
-        game_state = gamelib.GameState(self.config, turn_state, self.storage)
+        snapshot = gamelib.TurnSnapshot(self.config, turn_state, self.storage)
+        self.record_action_frame(snapshot)
+
+        # Nothing can change the board once every information unit is gone, the next turn can be worked on
+        if self.precomputer is not None and snapshot.settled():
+            self.precompute_attacks(snapshot)
+
+    def record_action_frame(self, snapshot):
+        game_state = gamelib.GameState(self.config, snapshot, self.storage)
 
         self.simulation2 = self.simulation
-        self.simulation = gamelib.Simulator(self.config, turn_state, self.storage)
+        self.simulation = gamelib.Simulator(self.config, snapshot, self.storage)
 
         any_enemies = False
 
@@ -527,17 +557,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         if not self.action_phase:
             self.enemy_spawn_locs.append([])
 
-            self.enemy_attack_map.append([])
-            for x in range(0, self.ARENA_SIZE):
-                self.enemy_attack_map[-1].append([])
-                for _ in range(0, self.ARENA_SIZE):
-                    self.enemy_attack_map[-1][x].append(0)
-
-            self.enemy_attack_intensity.append([])
-            for x in range(0, self.ARENA_SIZE):
-                self.enemy_attack_intensity[-1].append([])
-                for _ in range(0, self.ARENA_SIZE):
-                    self.enemy_attack_intensity[-1][x].append(0)
+            self.enemy_attack_map.append(np.zeros((self.ARENA_SIZE, self.ARENA_SIZE), dtype=int))
+            self.enemy_attack_intensity.append(np.zeros((self.ARENA_SIZE, self.ARENA_SIZE)))
 
             self.enemy_movement_map.append([])
             for x in range(0, self.ARENA_SIZE):
@@ -567,9 +588,9 @@ class AlgoStrategy(gamelib.AlgoCore):
                 # Enemy movement path (ignored for now)
 
                 # Enemy attack locations (single map)
-                for loc in game_state.game_map.get_locations_in_range([unit.x, unit.y], unit.range):
-                    self.enemy_attack_map[-1][loc[0]][loc[1]] += 1
-                    self.enemy_attack_intensity[-1][loc[0]][loc[1]] += unit.damage
+                reach = self.threat_map.reach([unit.x, unit.y], unit.range)
+                self.enemy_attack_map[-1][reach] += 1
+                self.enemy_attack_intensity[-1][reach] += unit.damage
 
                 # Enemy attack locations (pathing) (ignored for now)
 
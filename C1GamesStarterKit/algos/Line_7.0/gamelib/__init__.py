@@ -10,6 +10,17 @@ from .game_map import GameMap
 from .navigation import PathFinding, Coord
 from .advanced_game_state import AdvancedGameState
 from .simulator import Simulator, Storage, Possible_Attack, Simulator_2
+from .simulation_result import SimulationResult, SCORE_WEIGHTS
+from .array_board import ArrayBoard, UnitStats
+from .batch_simulator import BatchSimulator
+from .parallel import AttackPool
+from .scheduler import SearchScheduler
+from .threat_map import ThreatMap
+from .estimator import AttackEstimator, AttackEstimate
+from .turn_snapshot import TurnSnapshot
+from .telemetry import Telemetry, telemetry
+from .profiler import SamplingProfiler
+from .precompute import Precomputer, cached
 
-__all__ = ["advanced_game_state", "algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["advanced_game_state", "algocore", "array_board", "batch_simulator", "estimator", "game_state", "game_map", "navigation", "parallel", "pathing", "precompute", "profiler", "scheduler", "simulation_result", "spatial_index", "telemetry", "threat_map", "turn_snapshot", "unit", "util"]
  
\ No newline at end of file
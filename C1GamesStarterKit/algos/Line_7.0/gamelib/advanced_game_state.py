@@ -1,4 +1,5 @@
 from .game_state import GameState, GameUnit
+from .threat_map import ThreatMap
 import sys
 import warnings
 import gamelib
@@ -15,6 +16,8 @@ class AdvancedGameState(GameState):
         Their targeting priority is as follows:
             Infantry > Nearest Unit > Lowest Stability > Lowest Y position > Closest to edge (Highest distance of X from the boards center, 13.5)
 
+        If the game map has a spatial index, only the tiles it marks as occupied by the opponent are looked at.
+
         Args:
             * attacking_unit: A GameUnit
 
@@ -23,101 +26,101 @@ class AdvancedGameState(GameState):
 
         """
         
-        from .game_state import SCRAMBLER, is_stationary
-        
         if not isinstance(attacking_unit, GameUnit):
             warnings.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
             return
 
-        attacker_location = [attacking_unit.x, attacking_unit.y]
+        return self.__get_target_rings(attacking_unit, information_start, firewall_start)
+
+    def __get_target_rings(self, attacking_unit, information_start, firewall_start):
+        """get_target over the dense tile rings of the attacker's tile.
+        With a spatial index, rings and tiles without an opponent in it are skipped."""
+        from .game_state import SCRAMBLER
+
+        game_map = self.game_map
+        storage = game_map.storage
+        index = game_map.spatial_index
+
+        tile = storage.tile_index[attacking_unit.x][attacking_unit.y]
         if attacking_unit.range == 3:
-            possible_locations = self.locs_in_range_3_sorted
+            rings = storage.tile_rings_3[tile]
         else:
-            possible_locations = self.locs_in_range_5_sorted
-            
-        #possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.range)
+            rings = storage.tile_rings_5[tile]
 
         target = None
         target_stationary = True
-        target_distance = sys.maxsize
         target_stability = sys.maxsize
         target_y = self.ARENA_SIZE
         target_x_distance = 0
 
-        #attacking_unit_index = attacking_unit.player_index
+        player_index = attacking_unit.player_index
+        if index is not None:
+            opponent_information = index.information[1 - player_index]
+            opponent_firewalls = index.firewalls[1 - player_index]
+        else:
+            # Every bit set, every tile is looked at
+            opponent_information = opponent_firewalls = -1
 
         forget_about_stationary = attacking_unit.unit_type == SCRAMBLER
 
-        unit_loc = attacking_unit.loc
-        in_arena_bounds = self.game_map.in_arena_bounds
-        game_map = self.game_map
-        distance_between_locations = self.game_map.distance_between_locations
-
-        index = 0
+        arena_tiles = storage.arena_tiles
+        board = game_map.map
+        half_arena = self.HALF_ARENA - 0.5
 
-        for set_dist in possible_locations:
-            
-            dist = distance_between_locations(set_dist[0], [0, 0])
+        for dist, ring_mask, ring_tiles in rings:
 
             skip_info = dist < information_start
             skip_fire = forget_about_stationary or dist < firewall_start
-                
-            if skip_fire and skip_info:
-                continue
-            
-            for location in set_dist:
-                
-                location = [unit_loc[0] + location[0], unit_loc[1] + location[1]]
 
-                #if (not in_arena_bounds(location)) or (skip_info and location[1] >= 14 == bool(attacking_unit_index)):
-                #    continue
-                
-                if not in_arena_bounds(location):
-                    continue
+            occupied = 0
+            if not skip_info:
+                occupied |= opponent_information
+            if not skip_fire:
+                occupied |= opponent_firewalls
 
-                units = game_map[location]
-                for unit in units:
-                    """
-                    NOTE: scrambler units cannot attack firewalls so skip them if unit is firewall
-                    """
-                    if unit.player_index == attacking_unit.player_index or (skip_fire and is_stationary(unit.unit_type)) or (skip_info and not is_stationary(unit.unit_type)) or unit.stability <= 0:
+            if ring_mask & occupied:
+                for ring_tile in ring_tiles:
+                    if not (occupied >> ring_tile) & 1:
                         continue
 
-                    new_target = False
-                    unit_stationary = unit.stationary
-                    unit_distance = distance_between_locations(location, [attacking_unit.x, attacking_unit.y])
-                    unit_stability = unit.stability
-                    unit_y = unit.y
-                    unit_x_distance = abs(self.HALF_ARENA - 0.5 - unit.x)
+                    x, y = arena_tiles[ring_tile]
+                    for unit in board[x][y]:
+                        unit_stationary = unit.stationary
+                        if unit.player_index == player_index or (skip_fire and unit_stationary) or (skip_info and not unit_stationary) or unit.stability <= 0:
+                            continue
 
-                    if target_stationary and not unit_stationary:
-                        new_target = True
-                    elif not target_stationary and unit_stationary:
-                        continue
-                    else:
-                        if target_stability > unit_stability:
+                        new_target = False
+                        unit_stability = unit.stability
+                        unit_y = unit.y
+                        unit_x_distance = abs(half_arena - unit.x)
+
+                        if target_stationary and not unit_stationary:
                             new_target = True
-                        elif target_stability < unit_stability and not new_target:
+                        elif not target_stationary and unit_stationary:
                             continue
                         else:
-                            if target_y > unit_y:
+                            if target_stability > unit_stability:
                                 new_target = True
-                            elif target_y < unit_y and not new_target:
-                                continue       
+                            elif target_stability < unit_stability and not new_target:
+                                continue
                             else:
-                                if target_x_distance < unit_x_distance:
+                                if target_y > unit_y:
                                     new_target = True
-                    
-                    if new_target:
-                        target = unit
-                        target_stationary = unit_stationary
-                        target_distance = unit_distance
-                        target_stability = unit_stability
-                        target_y = unit_y
-                        target_x_distance = unit_x_distance
-
-                        if (not forget_about_stationary) and (not target_stationary):
-                            forget_about_stationary = True
+                                elif target_y < unit_y and not new_target:
+                                    continue
+                                else:
+                                    if target_x_distance < unit_x_distance:
+                                        new_target = True
+
+                        if new_target:
+                            target = unit
+                            target_stationary = unit_stationary
+                            target_stability = unit_stability
+                            target_y = unit_y
+                            target_x_distance = unit_x_distance
+
+                            if (not forget_about_stationary) and (not target_stationary):
+                                forget_about_stationary = True
 
             if not target_stationary:
                 break
@@ -261,6 +264,9 @@ class AdvancedGameState(GameState):
             warnings.warn("Location {} is not in the arena bounds.".format(location))
 
         attackers = []
+        if self.get_threat_map().attackers(location, player_index) == 0:
+            return attackers
+
         """
         Get locations in the range of DESTRUCTOR units
         """
@@ -270,3 +276,29 @@ class AdvancedGameState(GameState):
                 if unit.unit_type == DESTRUCTOR and unit.player_index != player_index:
                     attackers.append(unit)
         return attackers
+
+    def get_threat_map(self):
+        """Gets the ThreatMap of the destructors on the board
+
+        The map is built the first time it is asked for, after that the game map keeps it up to date
+        as units are added and removed.
+
+        Returns:
+            The ThreatMap of the game map
+        """
+        if self.game_map.threat_map is None:
+            self.game_map.threat_map = ThreatMap.from_game_map(self.game_map)
+        return self.game_map.threat_map
+
+    def get_path_damage(self, path, player_index, frames_per_tile=1):
+        """Gets the damage destructors deal to a unit walking a path
+
+        Args:
+            * path: A list of locations, like find_path_to_edge returns
+            * player_index: The index corresponding to the walking unit's player, 0 for you 1 for the enemy
+            * frames_per_tile: Frames the unit spends on each tile, 1 / speed
+
+        Returns:
+            The damage summed over the path, see ThreatMap.path_damage
+        """
+        return self.get_threat_map().path_damage(path, player_index, frames_per_tile)
@@ -2,6 +2,8 @@ import json
 import gamelib
 
 from .game_state import GameState
+from .profiler import SamplingProfiler
+from .telemetry import telemetry
 from .util import get_command, debug_write, BANNER_TEXT, send_command
 
 class AlgoCore(object):
@@ -21,6 +23,13 @@ class AlgoCore(object):
         """
         self.config = config
 
+    def on_game_end(self, game_state_string):
+        """
+        Override this to release anything the algo started, it is called once
+        with the end game message before the program finishes.
+        """
+        pass
+
     def on_turn(self, game_state):
         """
         This step function is called every turn and is passed a string containing
@@ -40,6 +49,8 @@ class AlgoCore(object):
         it receives the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        telemetry.configure_from_env()
+        profiler = SamplingProfiler.from_env()
 
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
@@ -50,6 +61,7 @@ class AlgoCore(object):
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
                 parsed_config = json.loads(game_state_string)
+                profiler.set_config(parsed_config)
                 self.on_game_start(parsed_config,game_state_string)
             elif "turnInfo" in game_state_string:
                 state = json.loads(game_state_string)
@@ -59,18 +71,26 @@ class AlgoCore(object):
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    telemetry.start_turn(int(state.get("turnInfo")[1]))
+                    profiler.start_turn(int(state.get("turnInfo")[1]))
+                    with telemetry.span("on_turn"):
+                        self.on_turn(game_state_string)
+                    profiler.end_turn()
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents the results of an action phase
                     """
-                    self.parse_action_phase(game_state_string)
+                    with telemetry.span("action_frame"):
+                        self.parse_action_phase(game_state_string)
                     continue
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
                     """
                     #debug_write(game_state_string)
+                    self.on_game_end(game_state_string)
+                    telemetry.end_turn()
+                    profiler.finish()
                     debug_write("Got end state quitting bot.")
                     break
                 else:
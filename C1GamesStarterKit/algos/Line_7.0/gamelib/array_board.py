@@ -0,0 +1,596 @@
+import collections
+import numpy as np
+from .pathing import field_grids
+
+# Offsets in the same order PathFinding.next_loc tries them: up, down, left, right
+STEP_X = np.array([0, 0, -1, 1], dtype=np.intp)
+STEP_Y = np.array([1, -1, 0, 0], dtype=np.intp)
+STEP_HORIZONTAL = np.array([False, False, True, True])
+
+NO_UNIT = -1
+
+# Safety net against units walking back and forth on a plateau of the pathing field
+MAX_FRAMES = 1000
+
+
+class UnitStats:
+    """Per-type stat columns built from the config, indexed by the unit's index in unitInformation
+
+    Attributes:
+        * shorthand (list): The shorthand of each unit type
+        * stationary (ndarray): True for firewall types
+        * range (ndarray): Attack range
+        * damage (ndarray): Damage a firewall deals to information
+        * damage_f (ndarray): Damage an information unit deals to firewalls
+        * damage_i (ndarray): Damage an information unit deals to information
+        * shield (ndarray): Shield an encryptor gives to friendly information
+        * period (ndarray): Frames between two steps of an information unit
+        * stability (ndarray): Starting stability
+        * cost (ndarray): Resource cost
+        * damage_to_player (ndarray): Health removed from the opponent on a breach
+
+    """
+    def __init__(self, config):
+        unit_information = config["unitInformation"][:6]
+        n_types = len(unit_information)
+
+        self.shorthand = [info["shorthand"] for info in unit_information]
+        self.index = {shorthand: i for i, shorthand in enumerate(self.shorthand)}
+
+        self.FILTER = 0
+        self.ENCRYPTOR = 1
+        self.DESTRUCTOR = 2
+
+        self.stationary = np.zeros(n_types, dtype=bool)
+        self.range = np.zeros(n_types, dtype=np.float32)
+        self.damage = np.zeros(n_types, dtype=np.float32)
+        self.damage_f = np.zeros(n_types, dtype=np.float32)
+        self.damage_i = np.zeros(n_types, dtype=np.float32)
+        self.shield = np.zeros(n_types, dtype=np.float32)
+        self.period = np.zeros(n_types, dtype=np.int16)
+        self.stability = np.zeros(n_types, dtype=np.float32)
+        self.cost = np.zeros(n_types, dtype=np.float32)
+        self.damage_to_player = np.zeros(n_types, dtype=np.float32)
+
+        for i, info in enumerate(unit_information):
+            self.stationary[i] = "speed" not in info
+            self.range[i] = info.get("range", 0)
+            self.damage[i] = info.get("damage", 0)
+            self.damage_f[i] = info.get("damageF", 0)
+            self.damage_i[i] = info.get("damageI", 0)
+            self.shield[i] = info.get("shieldAmount", 0)
+            if not self.stationary[i]:
+                self.period[i] = int(round(1 / info["speed"]))
+            self.stability[i] = info["stability"]
+            self.cost[i] = info["cost"]
+            self.damage_to_player[i] = info.get("damageToPlayer", 0)
+
+        mechanics = config.get("mechanics", {})
+        self.self_destruct_steps = mechanics.get("stepsRequiredSelfDestruct", 5)
+        self.self_destruct_radius = mechanics.get("selfDestructRadius", 1.5)
+        self.shield_decay = mechanics.get("shieldDecayPerFrame", 0.15)
+
+
+class ArrayBoard:
+    """A struct-of-arrays copy of a board that can run the action phase without GameUnit objects.
+
+    Firewalls live in per-tile grids, information units live in columns with one entry per unit.
+    The pathing field is copied out of the PathFinding map the board was built from.
+
+    The board follows the engine's targeting rules, which the GameUnit Simulator does not:
+    destructors fire on information units, and information units keep hitting the firewalls in their range
+    every frame. The Simulator's firewalls never fire because its loc_in_range is built around [0, 0], outside
+    the arena, and its incremental target search loses firewalls once a unit has moved. Boards where
+    information units only meet each other and encryptors come out the same in both, see ArrayBoardTests.
+
+    It is a reference for the engine's rules, not a fast path. The per-frame numpy calls cost more than the
+    handful of units they replace, so an action phase takes about twice as long as in the Simulator, while
+    its player health is about four times closer to the engine's (scripts/simulator_benchmark.py). Nothing in
+    the attack search runs on it unless asked to, see BatchSimulator.
+
+    Attributes:
+        * owner (ndarray): int8 [28, 28], player index of the firewall on each tile or -1
+        * unit_type (ndarray): int8 [28, 28], unit index of the firewall on each tile or -1
+        * stability (ndarray): float32 [28, 28], stability of the firewall on each tile
+        * x, y (ndarray): integer columns, location of each information unit
+        * player (ndarray): integer column, owner of each information unit
+        * kind (ndarray): integer column, unit index of each information unit
+        * hp (ndarray): float32 column, stability of each information unit (without shields)
+        * shield (ndarray): float32 column, shield currently held by each information unit
+        * target (ndarray): integer column, edge each information unit is heading to
+        * tiles_moved (ndarray): int16 column, steps taken by each information unit
+        * dir_up (ndarray): bool column, the next_dir_up flag of each information unit
+        * alive (ndarray): bool column
+        * health (ndarray): float32 [2], player healths
+        * curr_frame (int): The last frame that was simulated
+
+    """
+    def __init__(self, stats, in_arena, edge_mask, dist, temp, storage=None):
+        self.stats = stats
+        self.storage = storage
+        self.in_arena = in_arena
+        self.edge_mask = edge_mask
+        self.dist = dist
+        self.temp = temp
+
+        size = in_arena.shape[0]
+        self.ARENA_SIZE = size
+        self.HALF_ARENA = size // 2
+
+        self.owner = np.full((size, size), NO_UNIT, dtype=np.int8)
+        self.unit_type = np.full((size, size), NO_UNIT, dtype=np.int8)
+        self.stability = np.zeros((size, size), dtype=np.float32)
+
+        self.x = np.zeros(0, dtype=np.intp)
+        self.y = np.zeros(0, dtype=np.intp)
+        self.player = np.zeros(0, dtype=np.intp)
+        self.kind = np.zeros(0, dtype=np.intp)
+        self.hp = np.zeros(0, dtype=np.float32)
+        self.shield = np.zeros(0, dtype=np.float32)
+        self.target = np.zeros(0, dtype=np.intp)
+        self.tiles_moved = np.zeros(0, dtype=np.int16)
+        self.dir_up = np.zeros(0, dtype=bool)
+        self.alive = np.zeros(0, dtype=bool)
+
+        self.health = np.zeros(2, dtype=np.float32)
+        self.curr_frame = 0
+        self.finished = False
+
+    @classmethod
+    def from_game_state(cls, game_state, stats=None):
+        """Builds an ArrayBoard from a GameState whose game_map is a PathFinding map with a calculated field
+
+        Args:
+            * game_state: The GameState to copy
+            * stats: A UnitStats, built from game_state.config when omitted
+
+        Returns:
+            A new ArrayBoard
+        """
+        if stats is None:
+            stats = UnitStats(game_state.config)
+
+        game_map = game_state.game_map
+        size = game_map.ARENA_SIZE
+
+        in_arena = np.array(game_map.storage.arena_bounds, dtype=bool)[:size, :size]
+
+        edge_mask = np.zeros((4, size, size), dtype=bool)
+        for i, edge in enumerate(game_map.edges):
+            for x, y in edge:
+                edge_mask[i, x, y] = True
+
+        pathfinding_map = game_map.pathfinding_map
+        dist = np.array([[node.dist for node in column] for column in pathfinding_map], dtype=np.int32).transpose(2, 0, 1).copy()
+        temp = np.array([[node.temp for node in column] for column in pathfinding_map], dtype=bool).transpose(2, 0, 1).copy()
+        dist[:, ~in_arena] = -1
+        temp[:, ~in_arena] = False
+
+        board = cls(stats, in_arena, edge_mask, dist, temp, game_map.storage)
+        board.health[0] = game_state.my_health
+        board.health[1] = game_state.enemy_health
+
+        columns = []
+        for x in range(size):
+            for y in range(size):
+                if not in_arena[x, y]:
+                    continue
+                for unit in game_map[x, y]:
+                    index = stats.index[unit.unit_type]
+                    if unit.stationary:
+                        board.owner[x, y] = unit.player_index
+                        board.unit_type[x, y] = index
+                        board.stability[x, y] = unit.stability
+                    else:
+                        columns.append((x, y, unit.player_index, index, unit.stability, board.__path_target(unit), unit.tiles_moved, unit.next_dir_up))
+
+        board.add_units(columns)
+        return board
+
+    def __path_target(self, unit):
+        if unit.path_target is not None:
+            return unit.path_target
+        # Units that were not spawned on an edge head to the far side of the board
+        if unit.player_index == 0:
+            return 0 if unit.x >= self.HALF_ARENA else 1
+        return 3 if unit.x >= self.HALF_ARENA else 2
+
+    def add_units(self, columns):
+        """Appends information units to the unit columns
+
+        Args:
+            * columns: A list of (x, y, player_index, unit_index, stability, path_target, tiles_moved, next_dir_up) tuples
+        """
+        if len(columns) == 0:
+            return
+
+        x, y, player, kind, hp, target, tiles_moved, dir_up = zip(*columns)
+        self.x = np.concatenate([self.x, np.array(x, dtype=np.intp)])
+        self.y = np.concatenate([self.y, np.array(y, dtype=np.intp)])
+        self.player = np.concatenate([self.player, np.array(player, dtype=np.intp)])
+        self.kind = np.concatenate([self.kind, np.array(kind, dtype=np.intp)])
+        self.hp = np.concatenate([self.hp, np.array(hp, dtype=np.float32)])
+        self.shield = np.concatenate([self.shield, np.zeros(len(columns), dtype=np.float32)])
+        self.target = np.concatenate([self.target, np.array(target, dtype=np.intp)])
+        self.tiles_moved = np.concatenate([self.tiles_moved, np.array(tiles_moved, dtype=np.int16)])
+        self.dir_up = np.concatenate([self.dir_up, np.array(dir_up, dtype=bool)])
+        self.alive = np.concatenate([self.alive, np.ones(len(columns), dtype=bool)])
+
+    def simulate(self):
+        """Runs frames until every information unit has been removed
+
+        Returns:
+            The number of frames simulated
+        """
+        self.__prepare()
+        while not self.finished:
+            self.frame()
+        return self.curr_frame
+
+    def __prepare(self):
+        """Caches the firewall columns used for targeting"""
+        fx, fy = np.nonzero(self.unit_type >= 0)
+        self.fx = fx
+        self.fy = fy
+        self.f_owner = self.owner[fx, fy].astype(np.intp)
+        self.f_kind = self.unit_type[fx, fy].astype(np.intp)
+        self.f_alive = np.ones(len(fx), dtype=bool)
+
+        self.f_column = np.full(self.unit_type.shape, NO_UNIT, dtype=np.int16)
+        self.f_column[fx, fy] = np.arange(len(fx))
+
+        self.e_index = np.nonzero(self.f_kind == self.stats.ENCRYPTOR)[0]
+        self.shielded = np.zeros((len(self.x), len(self.e_index)), dtype=bool)
+
+        self.__cache_firewalls()
+
+        self.finished = not self.alive.any()
+
+    def __cache_firewalls(self):
+        """Rebuilds the target and attacker columns of the firewalls that are still standing"""
+        stats = self.stats
+
+        firewalls = np.nonzero(self.f_alive)[0]
+        self.t_firewalls = firewalls
+        self.t_fx = self.fx[firewalls]
+        self.t_fy = self.fy[firewalls]
+        self.t_f_owner = self.f_owner[firewalls]
+
+        destructors = firewalls[self.f_kind[firewalls] == stats.DESTRUCTOR]
+        self.d_x = self.fx[destructors]
+        self.d_y = self.fy[destructors]
+        self.d_owner = self.f_owner[destructors]
+        self.d_kind = self.f_kind[destructors]
+
+        # Tiles where an information unit of each player is close enough to a firewall to interact with it
+        reach = stats.range.max() + 0.51
+        tile_x, tile_y = np.indices(self.unit_type.shape)
+        d2 = (tile_x.reshape(-1, 1) - self.t_fx[None, :]) ** 2 + (tile_y.reshape(-1, 1) - self.t_fy[None, :]) ** 2
+        near = d2 < reach * reach
+        encryptor = self.f_kind[firewalls] == stats.ENCRYPTOR
+        self.active_tiles = np.zeros((2,) + self.unit_type.shape, dtype=bool)
+        for player in range(2):
+            interacts = (self.t_f_owner != player) | encryptor
+            self.active_tiles[player] = near[:, interacts].any(axis=1).reshape(self.unit_type.shape)
+
+    def frame(self):
+        """
+        Order:
+        Each unit takes a step, if it is time for them to take a step.
+        Each shield decays.
+        New shields are applied, if a unit has entered the range of a friendly encryptor
+        All units attack.
+        Units that were reduced below 0 stability are removed
+        """
+        self.curr_frame += 1
+
+        self.move_units()
+
+        if self.finished:
+            return
+
+        self.unit_attack()
+
+        if not self.alive.any() or self.curr_frame >= MAX_FRAMES:
+            self.finished = True
+
+    def move_units(self):
+        stats = self.stats
+
+        self.shield = np.maximum(self.shield - stats.shield_decay, 0)
+
+        movers = self.alive & (self.curr_frame % stats.period[self.kind] == 0)
+        if not movers.any():
+            return
+
+        x = self.x
+        y = self.y
+        target = self.target
+
+        here_dist = self.dist[target, x, y]
+        here_temp = self.temp[target, x, y]
+
+        self_destruct = movers & (here_dist == 1) & here_temp
+        breach = movers & ~self_destruct & self.edge_mask[target, x, y]
+        step = movers & ~self_destruct & ~breach
+
+        if step.any():
+            new_x, new_y, stuck = self.__next_locs(np.nonzero(step)[0])
+            index = np.nonzero(step)[0]
+
+            # A unit with nowhere to go self destructs where it stands
+            self_destruct[index[stuck]] = True
+            index = index[~stuck]
+            new_x = new_x[~stuck]
+            new_y = new_y[~stuck]
+
+            moved_x = new_x != self.x[index]
+            moved_y = new_y != self.y[index]
+            self.dir_up[index[moved_x]] = True
+            self.dir_up[index[~moved_x & moved_y]] = False
+
+            self.x[index] = new_x
+            self.y[index] = new_y
+            self.tiles_moved[index] += 1
+
+        if breach.any():
+            damage = stats.damage_to_player[self.kind[breach]]
+            np.subtract.at(self.health, 1 - self.player[breach], damage)
+            self.alive[breach] = False
+
+        if self_destruct.any():
+            self.alive[self_destruct] = False
+            exploding = self_destruct & (self.tiles_moved >= stats.self_destruct_steps)
+            if exploding.any():
+                self.__self_destruct(np.nonzero(exploding)[0])
+
+        if not self.alive.any():
+            self.finished = True
+
+    def __next_locs(self, index):
+        """Vectorized PathFinding.next_loc for the given unit columns
+
+        Returns:
+            new x column, new y column and a mask of the units that cannot move
+        """
+        x = self.x[index][:, None]
+        y = self.y[index][:, None]
+        target = self.target[index][:, None]
+
+        nx = x + STEP_X[None, :]
+        ny = y + STEP_Y[None, :]
+        size = self.ARENA_SIZE
+        on_board = (nx >= 0) & (nx < size) & (ny >= 0) & (ny < size)
+        cx = np.clip(nx, 0, size - 1)
+        cy = np.clip(ny, 0, size - 1)
+
+        open_tile = on_board & self.in_arena[cx, cy] & (self.unit_type[cx, cy] < 0)
+
+        diff = self.dist[target, x, y] - self.dist[target, cx, cy]
+        valid = open_tile & (diff >= 0)
+
+        dir_up = self.dir_up[index][:, None]
+        score = diff.astype(np.float32)
+        score += (dir_up != STEP_HORIZONTAL[None, :]) - 0.5
+        score += (((nx > x) == (target % 3 == 0)) - 0.5) / 10
+        score += (((ny > y) == (target < 2)) - 0.5) / 10
+        score[~valid] = -np.inf
+
+        best = np.argmax(score, axis=1)
+        rows = np.arange(len(index))
+        stuck = score[rows, best] <= -1
+
+        return nx[rows, best], ny[rows, best], stuck
+
+    def __self_destruct(self, index):
+        stats = self.stats
+        radius = stats.self_destruct_radius + 0.51
+        damage = stats.stability[self.kind[index]]
+
+        for i, amount in zip(index, damage):
+            # Information units
+            dx = self.x - self.x[i]
+            dy = self.y - self.y[i]
+            hit = self.alive & (self.player != self.player[i]) & (dx * dx + dy * dy < radius * radius)
+            if hit.any():
+                self.__damage_units(np.nonzero(hit)[0], np.full(hit.sum(), amount, dtype=np.float32))
+
+            # Firewalls
+            x0, y0 = int(self.x[i]), int(self.y[i])
+            r = int(radius)
+            for fx in range(max(x0 - r, 0), min(x0 + r + 1, self.ARENA_SIZE)):
+                for fy in range(max(y0 - r, 0), min(y0 + r + 1, self.ARENA_SIZE)):
+                    if self.unit_type[fx, fy] >= 0 and self.owner[fx, fy] != self.player[i] and (fx - x0) ** 2 + (fy - y0) ** 2 < radius * radius:
+                        self.stability[fx, fy] -= amount
+                        if self.stability[fx, fy] <= 0:
+                            self.__destroy_firewall(fx, fy)
+
+    def unit_attack(self):
+        stats = self.stats
+
+        alive = np.nonzero(self.alive)[0]
+        n_alive = len(alive)
+
+        ux = self.x[alive]
+        uy = self.y[alive]
+        u_player = self.player[alive]
+        u_kind = self.kind[alive]
+
+        # Nothing can happen while every unit is away from firewalls and only one player has units left
+        if not self.active_tiles[u_player, ux, uy].any() and (u_player == u_player[0]).all():
+            return
+
+        # New shields from friendly encryptors
+        if len(self.e_index) > 0:
+            e_live = self.f_alive[self.e_index]
+            ex = self.fx[self.e_index]
+            ey = self.fy[self.e_index]
+            e_range = stats.range[stats.ENCRYPTOR] + 0.51
+            in_range = (ux[:, None] - ex[None, :]) ** 2 + (uy[:, None] - ey[None, :]) ** 2 < e_range * e_range
+            new_shield = in_range & e_live[None, :] & (u_player[:, None] == self.f_owner[self.e_index][None, :]) & ~self.shielded[alive]
+            if new_shield.any():
+                self.shielded[alive] |= new_shield
+                self.shield[alive] += new_shield.sum(axis=1) * stats.shield[stats.ENCRYPTOR]
+
+        # Attackers are information units followed by destructors
+        ax = np.concatenate([ux, self.d_x])
+        ay = np.concatenate([uy, self.d_y])
+        a_player = np.concatenate([u_player, self.d_owner])
+        a_kind = np.concatenate([u_kind, self.d_kind])
+
+        # Targets are information units followed by firewalls
+        tx = np.concatenate([ux, self.t_fx])
+        ty = np.concatenate([uy, self.t_fy])
+        t_player = np.concatenate([u_player, self.t_f_owner])
+
+        d2 = (ax[:, None] - tx[None, :]) ** 2 + (ay[:, None] - ty[None, :]) ** 2
+        reach = stats.range[a_kind] + 0.51
+        valid = (d2 < (reach * reach)[:, None]) & (a_player[:, None] != t_player[None, :])
+
+        # Destructors only hit information, scramblers can not hit firewalls
+        valid[:n_alive, n_alive:] &= (stats.damage_f[u_kind] > 0)[:, None]
+        valid[n_alive:, n_alive:] = False
+
+        attackers = np.nonzero(valid.any(axis=1))[0]
+        if len(attackers) == 0:
+            return
+
+        valid = valid[attackers]
+        t_stationary = np.arange(len(tx)) >= n_alive
+        t_hp = np.concatenate([self.hp[alive] + self.shield[alive], self.stability[self.fx[self.t_firewalls], self.fy[self.t_firewalls]]])
+
+        chosen = select_targets(valid, [
+            t_stationary[None, :],
+            d2[attackers],
+            t_hp[None, :],
+            ty[None, :],
+            -np.abs(self.HALF_ARENA - 0.5 - tx)[None, :],
+        ])
+
+        a_kind = a_kind[attackers]
+        a_mobile = attackers < n_alive
+        hit_stationary = t_stationary[chosen]
+
+        damage = np.where(
+            a_mobile,
+            np.where(hit_stationary, stats.damage_f[a_kind], stats.damage_i[a_kind]),
+            stats.damage[a_kind])
+
+        unit_hits = ~hit_stationary
+        if unit_hits.any():
+            self.__damage_units(alive[chosen[unit_hits]], damage[unit_hits])
+
+        if hit_stationary.any():
+            columns = self.t_firewalls[chosen[hit_stationary] - n_alive]
+            totals = np.zeros(len(self.fx), dtype=np.float32)
+            np.add.at(totals, columns, damage[hit_stationary])
+            for column in np.nonzero(totals)[0]:
+                fx, fy = int(self.fx[column]), int(self.fy[column])
+                self.stability[fx, fy] -= totals[column]
+                if self.stability[fx, fy] <= 0:
+                    self.__destroy_firewall(fx, fy)
+
+    def __damage_units(self, index, damage):
+        totals = np.zeros(len(self.hp), dtype=np.float32)
+        np.add.at(totals, index, damage)
+
+        absorbed = np.minimum(self.shield, totals)
+        self.shield -= absorbed
+        self.hp -= totals - absorbed
+
+        self.alive &= self.hp > 0
+
+    def __destroy_firewall(self, x, y):
+        self.f_alive[self.f_column[x, y]] = False
+        self.__cache_firewalls()
+
+        self.owner[x, y] = NO_UNIT
+        self.unit_type[x, y] = NO_UNIT
+        self.stability[x, y] = 0
+        self.reopen_tile(x, y)
+
+    def reopen_tile(self, x, y):
+        """Spreads the pathing field out from a tile that was just cleared, the same way PathFinding.reopen does"""
+        reopen_tile(self.dist, self.temp, self.unit_type >= 0, self.in_arena, x, y, self.storage)
+
+    def apply_to(self, game_state):
+        """Writes the outcome of the simulation back into a GameState
+
+        Healths are copied, damaged firewalls get their new stability, destroyed firewalls and
+        all information units are removed from the map. The map's threat_map and spatial_index are
+        told about every unit that is removed.
+        """
+        game_state.my_health = float(self.health[0])
+        game_state.enemy_health = float(self.health[1])
+
+        game_map = game_state.game_map
+        size = self.ARENA_SIZE
+        for x in range(size):
+            for y in range(size):
+                if not self.in_arena[x, y] or len(game_map[x, y]) == 0:
+                    continue
+                kept = []
+                if self.unit_type[x, y] >= 0:
+                    firewall = game_map[x, y][0]
+                    firewall.stability = float(self.stability[x, y])
+                    kept = [firewall]
+                for unit in game_map[x, y]:
+                    if unit not in kept:
+                        if game_map.threat_map is not None:
+                            game_map.threat_map.remove(unit)
+                        if game_map.spatial_index is not None:
+                            game_map.spatial_index.remove(unit)
+                game_map.map[x][y] = kept
+
+
+def select_targets(valid, keys):
+    """Picks one target per attacker row by comparing keys in order, lowest first
+
+    Args:
+        * valid: bool [attackers, targets], which targets each attacker may hit. Every row needs at least one
+        * keys: A list of arrays broadcastable to valid, in priority order
+
+    Returns:
+        The chosen target column for each attacker
+    """
+    for key in keys:
+        masked = np.where(valid, key, np.inf)
+        valid = masked == masked.min(axis=1)[:, None]
+    return np.argmax(valid, axis=1)
+
+
+def reopen_tile(dist, temp, blocked, in_arena, x, y, storage=None):
+    """Spreads a pathing field out from a tile that was just cleared, the same way PathFinding.reopen does
+
+    Args:
+        * dist: int [4, 28, 28], distance to each edge, updated in place
+        * temp: bool [4, 28, 28], the temp flag of each distance, updated in place
+        * blocked: bool [28, 28], tiles holding a firewall
+        * in_arena: bool [28, 28], tiles inside the diamond
+        * x, y: The cleared tile
+        * storage: The Storage with the dense tile tables, the field is calculated again from it when the
+          tile joins a region that can not reach an edge. Without it only the relaxation is done.
+    """
+    size = in_arena.shape[0]
+
+    frontier = collections.deque([(x, y)])
+    while frontier:
+        cx, cy = frontier.popleft()
+        for nx, ny in ((cx, cy + 1), (cx, cy - 1), (cx - 1, cy), (cx + 1, cy)):
+            if nx < 0 or ny < 0 or nx >= size or ny >= size or not in_arena[nx, ny]:
+                continue
+            loc_change = False
+            for i in range(4):
+                d = dist[i, cx, cy]
+                if d == -1:
+                    continue
+                next_dist = dist[i, nx, ny]
+                if next_dist == -1 or (temp[i, nx, ny] and not temp[i, cx, cy]) or (temp[i, nx, ny] == temp[i, cx, cy] and next_dist > d + 1):
+                    dist[i, nx, ny] = d + 1
+                    temp[i, nx, ny] = temp[i, cx, cy]
+                    loc_change = True
+            if loc_change and not blocked[nx, ny]:
+                frontier.append((nx, ny))
+
+    if storage is not None and ((dist[:, x, y] == -1).any() or temp[:, x, y].any()):
+        dist[:], temp[:] = field_grids(storage, blocked)
@@ -0,0 +1,380 @@
+import warnings
+import numpy as np
+from .simulator import Simulator
+from .array_board import ArrayBoard, STEP_X, STEP_Y, STEP_HORIZONTAL, MAX_FRAMES, select_targets, reopen_tile
+from .telemetry import telemetry
+
+
+class BatchSimulator:
+    """Runs many candidate spawn sets against one parsed board in lockstep.
+
+    Every scenario starts from the same firewalls, pathing field and information units as the base
+    Simulator, then adds its own spawns. Unit state is stored in [scenario, unit] arrays padded to the
+    largest scenario, firewall state in [scenario, firewall] arrays over the shared firewall layout.
+
+    Scenarios follow the ArrayBoard rules, not the Simulator's: destructors fire, so an attack that runs past
+    them scores differently than it would in Simulator.idealness. The attack search only uses it when asked to.
+
+    Attributes:
+        * n_scenarios (int): Number of scenarios
+        * health (ndarray): float32 [scenario, 2], player healths
+        * f_alive (ndarray): bool [scenario, firewall], firewalls still standing
+        * frames (ndarray): int [scenario], the frame each scenario finished on
+        * curr_frame (int): The last frame that was simulated
+
+    """
+    def __init__(self, simulator, scenarios):
+        """Builds the stacked arrays for every scenario
+
+        Args:
+            * simulator: A Simulator whose game state every scenario starts from
+            * scenarios: A list of spawn sets, each a list of (unit_type, location, num, player_index) like attempt_add
+
+        """
+        if not simulator.calculated:
+            simulator.calculate()
+
+        game_state = simulator.game_state
+        self.game_state = game_state
+        self.stats = stats = game_state.storage.unit_stats
+        base = ArrayBoard.from_game_state(game_state, stats)
+
+        self.n_scenarios = n = len(scenarios)
+        self.ARENA_SIZE = base.ARENA_SIZE
+        self.HALF_ARENA = base.HALF_ARENA
+        self.storage = base.storage
+        self.in_arena = base.in_arena
+        self.edge_mask = base.edge_mask
+
+        # Firewall layout shared by all scenarios
+        fx, fy = np.nonzero(base.unit_type >= 0)
+        self.fx = fx
+        self.fy = fy
+        self.f_owner = base.owner[fx, fy].astype(np.intp)
+        self.f_kind = base.unit_type[fx, fy].astype(np.intp)
+        self.f_column = np.full(base.unit_type.shape, -1, dtype=np.intp)
+        self.f_column[fx, fy] = np.arange(len(fx))
+        self.d_index = np.nonzero(self.f_kind == stats.DESTRUCTOR)[0]
+        self.e_index = np.nonzero(self.f_kind == stats.ENCRYPTOR)[0]
+
+        self.f_stability = np.repeat(base.stability[fx, fy][None, :], n, axis=0)
+        self.f_alive = np.ones((n, len(fx)), dtype=bool)
+        self.blocked = np.repeat((base.unit_type >= 0)[None], n, axis=0)
+        self.dist = np.repeat(base.dist[None], n, axis=0)
+        self.temp = np.repeat(base.temp[None], n, axis=0)
+        self.health = np.repeat(base.health[None], n, axis=0)
+
+        # Spawns are charged the way attempt_add charges them, so idealness matches a Simulator run
+        self.spent = np.zeros(n, dtype=np.float32)
+        columns = [self.__spawn_columns(base, spawns, i) for i, spawns in enumerate(scenarios)]
+
+        n_units = max([len(c) for c in columns] + [1])
+        self.x = np.zeros((n, n_units), dtype=np.intp)
+        self.y = np.zeros((n, n_units), dtype=np.intp)
+        self.player = np.zeros((n, n_units), dtype=np.intp)
+        self.kind = np.zeros((n, n_units), dtype=np.intp)
+        self.target = np.zeros((n, n_units), dtype=np.intp)
+        self.hp = np.zeros((n, n_units), dtype=np.float32)
+        self.shield = np.zeros((n, n_units), dtype=np.float32)
+        self.tiles_moved = np.zeros((n, n_units), dtype=np.int16)
+        self.dir_up = np.ones((n, n_units), dtype=bool)
+        self.alive = np.zeros((n, n_units), dtype=bool)
+        self.shielded = np.zeros((n, n_units, len(self.e_index)), dtype=bool)
+
+        for i, scenario in enumerate(columns):
+            for j, (x, y, player, kind, hp, target, tiles_moved, dir_up) in enumerate(scenario):
+                self.x[i, j] = x
+                self.y[i, j] = y
+                self.player[i, j] = player
+                self.kind[i, j] = kind
+                self.hp[i, j] = hp
+                self.target[i, j] = target
+                self.tiles_moved[i, j] = tiles_moved
+                self.dir_up[i, j] = dir_up
+                self.alive[i, j] = True
+
+        self.frames = np.zeros(n, dtype=np.intp)
+        self.curr_frame = 0
+        self.finished = not self.alive.any()
+
+    def __spawn_columns(self, base, spawns, scenario):
+        columns = list(zip(base.x, base.y, base.player, base.kind, base.hp, base.target, base.tiles_moved, base.dir_up))
+        for unit_type, location, num, player_index in spawns:
+            if self.stats.stationary[self.stats.index[unit_type]]:
+                warnings.warn("BatchSimulator can only spawn information units, {} at {} was skipped".format(unit_type, location))
+                continue
+            if not self.game_state.can_spawn(unit_type, location, num, player_index, False):
+                warnings.warn("Could not spawn {} at location {}. Location is blocked or invalid.".format(unit_type, location))
+                continue
+
+            x, y = map(int, location)
+            # Same edge to target mapping as attempt_add, TR -> BL, TL -> BR, BL -> TR, BR -> TL
+            edges = np.nonzero(self.edge_mask[:, x, y])[0]
+            target = (edges[-1] + 2) % 4
+            kind = self.stats.index[unit_type]
+            for _ in range(num):
+                columns.append((x, y, player_index, kind, self.stats.stability[kind], target, 0, True))
+            self.spent[scenario] += num * self.stats.cost[kind]
+        return columns
+
+    def simulate(self):
+        """Runs frames until every scenario has run out of information units
+
+        Returns:
+            The frame each scenario finished on
+        """
+        with telemetry.span("batch_simulate"):
+            while not self.finished:
+                self.frame()
+        telemetry.count("scenarios", self.n_scenarios)
+        return self.frames
+
+    def frame(self):
+        """Runs one frame of every scenario, in the same order as ArrayBoard.frame"""
+        self.curr_frame += 1
+
+        running = self.alive.any(axis=1)
+        self.move_units()
+        self.unit_attack()
+
+        done = running & ~self.alive.any(axis=1)
+        self.frames[done] = self.curr_frame
+
+        if not self.alive.any() or self.curr_frame >= MAX_FRAMES:
+            self.frames[self.alive.any(axis=1)] = self.curr_frame
+            self.finished = True
+
+    def move_units(self):
+        stats = self.stats
+
+        self.shield = np.maximum(self.shield - stats.shield_decay, 0)
+
+        # Padding slots hold kind 0, a firewall type without a period, so only living units are checked
+        period = stats.period[self.kind]
+        movers = self.alive.copy()
+        movers[movers] = self.curr_frame % period[movers] == 0
+        if not movers.any():
+            return
+
+        s, u = np.nonzero(movers)
+        x = self.x[s, u]
+        y = self.y[s, u]
+        target = self.target[s, u]
+
+        self_destruct = (self.dist[s, target, x, y] == 1) & self.temp[s, target, x, y]
+        breach = ~self_destruct & self.edge_mask[target, x, y]
+        step = ~self_destruct & ~breach
+
+        if step.any():
+            new_x, new_y, stuck = self.__next_locs(s[step], u[step])
+            index = np.nonzero(step)[0]
+
+            # A unit with nowhere to go self destructs where it stands
+            self_destruct[index[stuck]] = True
+            ss = s[index[~stuck]]
+            uu = u[index[~stuck]]
+            new_x = new_x[~stuck]
+            new_y = new_y[~stuck]
+
+            moved_x = new_x != self.x[ss, uu]
+            moved_y = new_y != self.y[ss, uu]
+            self.dir_up[ss[moved_x], uu[moved_x]] = True
+            self.dir_up[ss[~moved_x & moved_y], uu[~moved_x & moved_y]] = False
+
+            self.x[ss, uu] = new_x
+            self.y[ss, uu] = new_y
+            self.tiles_moved[ss, uu] += 1
+
+        if breach.any():
+            bs = s[breach]
+            bu = u[breach]
+            np.subtract.at(self.health, (bs, 1 - self.player[bs, bu]), stats.damage_to_player[self.kind[bs, bu]])
+            self.alive[bs, bu] = False
+
+        if self_destruct.any():
+            ds = s[self_destruct]
+            du = u[self_destruct]
+            self.alive[ds, du] = False
+            exploding = self.tiles_moved[ds, du] >= stats.self_destruct_steps
+            for i, j in zip(ds[exploding], du[exploding]):
+                self.__self_destruct(i, j)
+
+    def __next_locs(self, s, u):
+        """Vectorized PathFinding.next_loc for the given (scenario, unit) pairs
+
+        Returns:
+            new x, new y and a mask of the units that cannot move
+        """
+        x = self.x[s, u][:, None]
+        y = self.y[s, u][:, None]
+        target = self.target[s, u][:, None]
+        scenario = s[:, None]
+
+        nx = x + STEP_X[None, :]
+        ny = y + STEP_Y[None, :]
+        size = self.ARENA_SIZE
+        on_board = (nx >= 0) & (nx < size) & (ny >= 0) & (ny < size)
+        cx = np.clip(nx, 0, size - 1)
+        cy = np.clip(ny, 0, size - 1)
+
+        open_tile = on_board & self.in_arena[cx, cy] & ~self.blocked[scenario, cx, cy]
+
+        diff = self.dist[scenario, target, x, y] - self.dist[scenario, target, cx, cy]
+        valid = open_tile & (diff >= 0)
+
+        dir_up = self.dir_up[s, u][:, None]
+        score = diff.astype(np.float32)
+        score += (dir_up != STEP_HORIZONTAL[None, :]) - 0.5
+        score += (((nx > x) == (target % 3 == 0)) - 0.5) / 10
+        score += (((ny > y) == (target < 2)) - 0.5) / 10
+        score[~valid] = -np.inf
+
+        best = np.argmax(score, axis=1)
+        rows = np.arange(len(s))
+        stuck = score[rows, best] <= -1
+
+        return nx[rows, best], ny[rows, best], stuck
+
+    def __self_destruct(self, s, u):
+        stats = self.stats
+        radius = stats.self_destruct_radius + 0.51
+        amount = stats.stability[self.kind[s, u]]
+        x0 = self.x[s, u]
+        y0 = self.y[s, u]
+        player = self.player[s, u]
+
+        dx = self.x[s] - x0
+        dy = self.y[s] - y0
+        hit = self.alive[s] & (self.player[s] != player) & (dx * dx + dy * dy < radius * radius)
+        if hit.any():
+            index = np.nonzero(hit)[0]
+            self.__damage_units(np.full(len(index), s), index, np.full(len(index), amount, dtype=np.float32))
+
+        f_d2 = (self.fx - x0) ** 2 + (self.fy - y0) ** 2
+        hit = self.f_alive[s] & (self.f_owner != player) & (f_d2 < radius * radius)
+        if hit.any():
+            columns = np.nonzero(hit)[0]
+            self.__damage_firewalls(np.full(len(columns), s), columns, np.full(len(columns), amount, dtype=np.float32))
+
+    def unit_attack(self):
+        stats = self.stats
+
+        scenarios = np.nonzero(self.alive.any(axis=1))[0]
+        if len(scenarios) == 0:
+            return
+
+        alive = self.alive[scenarios]
+        ux = self.x[scenarios]
+        uy = self.y[scenarios]
+        u_player = self.player[scenarios]
+        u_kind = self.kind[scenarios]
+        f_alive = self.f_alive[scenarios]
+        n_units = ux.shape[1]
+
+        # New shields from friendly encryptors
+        if len(self.e_index) > 0:
+            ex = self.fx[self.e_index]
+            ey = self.fy[self.e_index]
+            e_range = stats.range[stats.ENCRYPTOR] + 0.51
+            in_range = (ux[:, :, None] - ex) ** 2 + (uy[:, :, None] - ey) ** 2 < e_range * e_range
+            new_shield = (in_range & f_alive[:, None, self.e_index] & alive[:, :, None]
+                          & (u_player[:, :, None] == self.f_owner[self.e_index]) & ~self.shielded[scenarios])
+            if new_shield.any():
+                self.shielded[scenarios] |= new_shield
+                self.shield[scenarios] += new_shield.sum(axis=2) * stats.shield[stats.ENCRYPTOR]
+
+        n = len(scenarios)
+        d_count = len(self.d_index)
+
+        # Attackers are information units followed by destructors
+        ax = np.concatenate([ux, np.broadcast_to(self.fx[self.d_index], (n, d_count))], axis=1)
+        ay = np.concatenate([uy, np.broadcast_to(self.fy[self.d_index], (n, d_count))], axis=1)
+        a_player = np.concatenate([u_player, np.broadcast_to(self.f_owner[self.d_index], (n, d_count))], axis=1)
+        a_kind = np.concatenate([u_kind, np.broadcast_to(self.f_kind[self.d_index], (n, d_count))], axis=1)
+        a_alive = np.concatenate([alive, f_alive[:, self.d_index]], axis=1)
+
+        # Targets are information units followed by firewalls
+        tx = np.concatenate([ux, np.broadcast_to(self.fx, (n, len(self.fx)))], axis=1)
+        ty = np.concatenate([uy, np.broadcast_to(self.fy, (n, len(self.fx)))], axis=1)
+        t_player = np.concatenate([u_player, np.broadcast_to(self.f_owner, (n, len(self.fx)))], axis=1)
+        t_alive = np.concatenate([alive, f_alive], axis=1)
+
+        d2 = (ax[:, :, None] - tx[:, None, :]) ** 2 + (ay[:, :, None] - ty[:, None, :]) ** 2
+        reach = stats.range[a_kind] + 0.51
+        valid = ((d2 < (reach * reach)[:, :, None]) & (a_player[:, :, None] != t_player[:, None, :])
+                 & a_alive[:, :, None] & t_alive[:, None, :])
+
+        # Destructors only hit information, scramblers can not hit firewalls
+        valid[:, :n_units, n_units:] &= (stats.damage_f[u_kind] > 0)[:, :, None]
+        valid[:, n_units:, n_units:] = False
+
+        rows, attackers = np.nonzero(valid.any(axis=2))
+        if len(rows) == 0:
+            return
+
+        t_stationary = np.arange(tx.shape[1]) >= n_units
+        t_hp = np.concatenate([self.hp[scenarios] + self.shield[scenarios], self.f_stability[scenarios]], axis=1)
+
+        chosen = select_targets(valid[rows, attackers], [
+            t_stationary[None, :],
+            d2[rows, attackers],
+            t_hp[rows],
+            ty[rows],
+            -np.abs(self.HALF_ARENA - 0.5 - tx[rows]),
+        ])
+
+        a_kind = a_kind[rows, attackers]
+        a_mobile = attackers < n_units
+        hit_stationary = t_stationary[chosen]
+
+        damage = np.where(
+            a_mobile,
+            np.where(hit_stationary, stats.damage_f[a_kind], stats.damage_i[a_kind]),
+            stats.damage[a_kind])
+
+        s = scenarios[rows]
+        unit_hits = ~hit_stationary
+        if unit_hits.any():
+            self.__damage_units(s[unit_hits], chosen[unit_hits], damage[unit_hits])
+
+        if hit_stationary.any():
+            self.__damage_firewalls(s[hit_stationary], chosen[hit_stationary] - n_units, damage[hit_stationary])
+
+    def __damage_units(self, s, u, damage):
+        totals = np.zeros(self.hp.shape, dtype=np.float32)
+        np.add.at(totals, (s, u), damage)
+
+        absorbed = np.minimum(self.shield, totals)
+        self.shield -= absorbed
+        self.hp -= totals - absorbed
+
+        self.alive &= self.hp > 0
+
+    def __damage_firewalls(self, s, columns, damage):
+        totals = np.zeros(self.f_stability.shape, dtype=np.float32)
+        np.add.at(totals, (s, columns), damage)
+        self.f_stability -= totals
+
+        destroyed = self.f_alive & (totals > 0) & (self.f_stability <= 0)
+        for i, column in zip(*np.nonzero(destroyed)):
+            x, y = int(self.fx[column]), int(self.fy[column])
+            self.f_alive[i, column] = False
+            self.f_stability[i, column] = 0
+            self.blocked[i, x, y] = False
+            reopen_tile(self.dist[i], self.temp[i], self.blocked[i], self.in_arena, x, y, self.storage)
+
+    def idealness(self):
+        """Scores every scenario the way Simulator.idealness scores a single simulation
+
+        Returns:
+            A list with one idealness per scenario
+        """
+        game_state = self.game_state
+        cost = self.stats.cost[self.f_kind]
+        cores_on_board = [(self.f_alive * (cost * (self.f_owner == i))).sum(axis=1) for i in range(2)]
+        cores_in_storage = [game_state.get_resource(game_state.CORES, 0), game_state.get_resource(game_state.CORES, 1)]
+        bits_in_storage = [game_state.get_resource(game_state.BITS, 0) - self.spent, game_state.get_resource(game_state.CORES, 1)]
+        player_health = [self.health[:, 0], self.health[:, 1]]
+
+        return [float(score) for score in Simulator.score(cores_on_board, cores_in_storage, bits_in_storage, player_health)]
+
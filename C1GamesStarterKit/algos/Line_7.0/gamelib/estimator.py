@@ -0,0 +1,207 @@
+import math
+
+
+class AttackEstimate:
+    """The predicted outcome of one stack of information units
+
+    Attributes:
+        * path (list): Locations the stack walks through, starting at the spawn location
+        * breaches (int): Units that reach the target edge
+        * survivors (int): Units alive when the stack breaches or self destructs
+        * self_destructed (bool): Whether the stack got stuck and self destructed
+        * structure_damage (float): Stability taken from the opponent's firewalls
+        * cores_destroyed (list): Cost of the firewalls destroyed, per player
+        * idealness (float): Predicted change of Simulator.idealness caused by the stack
+
+    """
+    def __init__(self, path, breaches, survivors, self_destructed, structure_damage, cores_destroyed, idealness):
+        self.path = path
+        self.breaches = breaches
+        self.survivors = survivors
+        self.self_destructed = self_destructed
+        self.structure_damage = structure_damage
+        self.cores_destroyed = cores_destroyed
+        self.idealness = idealness
+
+
+class AttackEstimator:
+    """Predicts what a stack of information units does without simulating it
+
+    The stack follows the next step table of the pathing field. Its units are treated as one pool of stability
+    that loses the damage per frame of the opponent's destructors on every tile, the survivors hit the nearest
+    opponent firewall in range. Shields, opposing information units and paths changing after a firewall is
+    destroyed are left out, so use it to rank or prune candidates and simulate the ones that are kept.
+
+    Attributes:
+        * game_state: The AdvancedGameState the estimates are made on, its PathFinding map must be calculated
+        * threat_map: The ThreatMap of the board
+
+    """
+    def __init__(self, game_state):
+        """Collects the firewalls and the threat map of the board
+
+        Args:
+            * game_state: An AdvancedGameState whose game_map is a calculated PathFinding map
+        """
+        self.game_state = game_state
+        game_map = game_state.game_map
+        self.storage = game_map.storage
+        self.stats = self.storage.unit_stats
+        self.threat_map = game_state.get_threat_map()
+
+        self.firewalls = []
+        for x, y in self.storage.arena_tiles:
+            tile = game_map.map[x][y]
+            if len(tile) > 0 and tile[0].stationary:
+                self.firewalls.append(tile[0])
+
+        # Damage per frame as nested lists, indexing them is much cheaper than indexing the numpy grids
+        self.damage = [self.threat_map.damage[i].tolist() for i in range(0, 2)]
+        # (x, y, squared reach, player) -> indices into self.firewalls in range, nearest first
+        self.in_range = {}
+
+        self.edge_sets = [set(edge) for edge in self.storage.edge_tiles]
+
+    def estimate(self, unit_type, location, num, player_index):
+        """Predicts the outcome of spawning num units of unit_type at location
+
+        Args:
+            * unit_type: The type of the units, like attempt_add
+            * location: The spawn location on an edge
+            * num: Number of units in the stack
+            * player_index: The player spawning them
+
+        Returns:
+            An AttackEstimate
+        """
+        storage = self.storage
+        stats = self.stats
+        game_map = self.game_state.game_map
+
+        kind = stats.index[unit_type]
+        stability = float(stats.stability[kind])
+        period = int(stats.period[kind])
+        damage_f = float(stats.damage_f[kind])
+        reach = (float(stats.range[kind]) + 0.51) ** 2
+        sd_reach = (stats.self_destruct_radius + 0.51) ** 2
+
+        tile = storage.tile_index[location[0]][location[1]]
+        target = storage.tile_path_target[tile]
+        next_steps = game_map.get_next_steps()[target]
+        target_edge = self.edge_sets[target]
+        pathfinding_map = game_map.pathfinding_map
+
+        self.__threat = self.threat_map
+        self.__damage_grid = self.damage
+        opponent = 1 - player_index
+        firewalls = [[unit, unit.stability if unit.player_index == opponent else 0] for unit in self.firewalls]
+
+        pool = stability * num
+        dir_up = True
+        tiles_moved = 0
+        frames = period - 1
+        path = [list(location)]
+        structure_damage = 0.0
+        cores_destroyed = [0.0, 0.0]
+        breached = False
+        self_destructed = False
+
+        while pool > 0 and tiles_moved < 4 * storage.ARENA_SIZE:
+            x, y = storage.arena_tiles[tile]
+
+            # Frames spent on this tile before the next step
+            for _ in range(0, frames):
+                pool -= self.__damage_grid[opponent][x][y]
+                if pool <= 0:
+                    break
+                if damage_f > 0:
+                    alive = math.ceil(pool / stability)
+                    structure_damage += self.__hit_nearest(firewalls, x, y, reach, opponent, alive * damage_f, cores_destroyed)
+            if pool <= 0:
+                break
+
+            node = pathfinding_map[x][y]
+            if node.dist[target] == 1 and node.temp[target]:
+                self_destructed = True
+                if tiles_moved >= stats.self_destruct_steps:
+                    alive = math.ceil(pool / stability)
+                    for i in self.__firewalls_in_range(x, y, sd_reach, opponent):
+                        if firewalls[i][1] > 0:
+                            structure_damage += self.__damage(firewalls[i], alive * stability, cores_destroyed)
+                break
+            if tile in target_edge:
+                breached = True
+                break
+
+            step = next_steps[dir_up][tile]
+            if step == tile:
+                # Units that can not move stay in place until they find a way, count that as a self destruct
+                self_destructed = True
+                break
+            nx, ny = storage.arena_tiles[step]
+            if nx != x:
+                dir_up = True
+            elif ny != y:
+                dir_up = False
+            tile = step
+            tiles_moved += 1
+            frames = period
+            path.append([nx, ny])
+
+        survivors = math.ceil(pool / stability) if pool > 0 else 0
+        breaches = survivors if breached else 0
+
+        # Same weights as Simulator.score, from the point of view of player 0
+        sign = 1 if player_index == 0 else -1
+        idealness = 2 * breaches * sign
+        idealness += 0.75 * (cores_destroyed[1] - cores_destroyed[0])
+        # attempt_add charges player 0 for every unit it adds
+        idealness -= 0.5 * float(stats.cost[kind]) * num
+
+        return AttackEstimate(path, breaches, survivors, self_destructed, structure_damage, cores_destroyed, idealness)
+
+    def __firewalls_in_range(self, x, y, reach, player_index):
+        key = (x, y, reach, player_index)
+        in_range = self.in_range.get(key)
+        if in_range is None:
+            in_range = []
+            for i, unit in enumerate(self.firewalls):
+                d2 = (unit.x - x) ** 2 + (unit.y - y) ** 2
+                if unit.player_index == player_index and d2 < reach:
+                    in_range.append((d2, i))
+            in_range = [i for d2, i in sorted(in_range)]
+            self.in_range[key] = in_range
+        return in_range
+
+    def __hit_nearest(self, firewalls, x, y, reach, player_index, amount, cores_destroyed):
+        """Damages the firewall get_target would pick: nearest, then lowest stability, lowest y, furthest from the center"""
+        best = None
+        best_key = None
+        for i in self.__firewalls_in_range(x, y, reach, player_index):
+            firewall = firewalls[i]
+            if firewall[1] <= 0:
+                continue
+            unit = firewall[0]
+            key = ((unit.x - x) ** 2 + (unit.y - y) ** 2, firewall[1], unit.y, -abs(13.5 - unit.x))
+            if best is not None and key[0] > best_key[0]:
+                break
+            if best is None or key < best_key:
+                best = firewall
+                best_key = key
+        if best is None:
+            return 0.0
+        return self.__damage(best, amount, cores_destroyed)
+
+    def __damage(self, firewall, amount, cores_destroyed):
+        unit = firewall[0]
+        dealt = min(amount, firewall[1])
+        firewall[1] -= amount
+        if firewall[1] <= 0:
+            cores_destroyed[unit.player_index] += unit.cost
+            if unit.unit_type == self.threat_map.destructor:
+                # Later tiles are no longer covered by it, the board's threat map is copied the first time
+                if self.__threat is self.threat_map:
+                    self.__threat = self.threat_map.fork()
+                self.__threat.remove(unit)
+                self.__damage_grid = [self.__threat.damage[i].tolist() for i in range(0, 2)]
+        return dealt
@@ -1,4 +1,5 @@
 import gamelib
+import copy
 import math
 import warnings
 from .unit import GameUnit
@@ -37,7 +38,6 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.map = self.__empty_grid()
-        self.__start = [13,0]
 
         self.storage = storage
 
@@ -52,7 +52,25 @@ class GameMap:
         self.locs_in_range_3_sorted = storage.split_locs_3
         self.locs_in_range_5_sorted = storage.split_locs_5
 
+        # Occupancy bitboards used by get_target, only kept while a Simulator runs the action phase
+        self.spatial_index = None
+
+        # Destructor coverage, built by AdvancedGameState.get_threat_map and kept up to date from then on
+        self.threat_map = None
+
     
+    def fork(self):
+        """Returns a copy of this map whose tiles hold clones of this map's units.
+        The config and the storage tables are shared with the original.
+        """
+        fork = copy.copy(self)
+        fork.map = [[[unit.clone() for unit in tile] for tile in column] for column in self.map]
+        if self.spatial_index is not None:
+            fork.spatial_index = self.spatial_index.fork()
+        if self.threat_map is not None:
+            fork.threat_map = self.threat_map.fork()
+        return fork
+
     def __getitem__(self, location):
         return self.map[location[0]][location[1]]
         #if len(location) == 2 and self.in_arena_bounds(location):
@@ -67,29 +85,18 @@ class GameMap:
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
-    def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        """Iterates over the locations in the arena row by row, from [13, 0] to [14, 27].
+        The locations are the shared lists of storage.arena_tiles, do not change them.
+        """
+        return iter(self.storage.row_locations)
+
+    def tile_units(self, tile):
+        """The units on a dense tile of storage.arena_tiles, the same list as game_map[x, y]"""
+        x, y = self.storage.arena_tiles[tile]
+        return self.map[x][y]
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        return [[[] for _ in range(0, self.ARENA_SIZE)] for _ in range(0, self.ARENA_SIZE)]
 
     def _invalid_coordinates(self, location):
         warnings.warn("{} is out of bounds.".format(str(location)))
@@ -155,8 +162,14 @@ class GameMap:
         if not new_unit.stationary:
             self.map[x][y].append(new_unit)
         else:
+            if self.threat_map is not None:
+                for unit in self.map[x][y]:
+                    self.threat_map.remove(unit)
             self.map[x][y] = [new_unit]
 
+        if self.threat_map is not None:
+            self.threat_map.add(new_unit)
+
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
 
@@ -170,6 +183,9 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
+        if self.threat_map is not None:
+            for unit in self.map[x][y]:
+                self.threat_map.remove(unit)
         self.map[x][y] = []
 
     def get_locations_in_range_sorted(self, location, radius):
@@ -251,12 +267,7 @@ class Map:
         self.grid = self.__empty_grid()
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        return [[[] for _ in range(0, self.ARENA_SIZE)] for _ in range(0, self.ARENA_SIZE)]
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -7,6 +7,7 @@ from .navigation import ShortestPathFinder, PathFinding
 from .util import send_command, debug_write
 from .unit import GameUnit
 from .game_map import GameMap
+from .turn_snapshot import TurnSnapshot
 
 def is_stationary(unit_type):
     return unit_type in FIREWALL_TYPES
@@ -43,10 +44,19 @@ class GameState:
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn,
+              or a TurnSnapshot of it to build the state without parsing the string again
+            * storage: The Storage shared by every simulation of the game
+            * pathfinding (bool): Use a PathFinding map instead of a GameMap
 
         """
-        self.serialized_string = serialized_string
+        if isinstance(serialized_string, TurnSnapshot):
+            snapshot = serialized_string
+            owned = False
+        else:
+            snapshot = TurnSnapshot(config, serialized_string, storage)
+            owned = True
+        self.serialized_string = snapshot.serialized_string
         self.config = config
 
         global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, REMOVE, FIREWALL_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
@@ -87,7 +97,8 @@ class GameState:
         self._player_resources = [
                 {'cores': 0, 'bits': 0},  # player 0, which is you
                 {'cores': 0, 'bits': 0}]  # player 1, which is the opponent
-        self.__parse_state(serialized_string)
+        # A snapshot made just for this state hands over its template units instead of cloning them
+        snapshot.apply(self, clone=not owned)
 
         self.storage = storage
 
@@ -98,72 +109,6 @@ class GameState:
         self.locs_in_range_5_sorted = self.storage.split_locs_5
 
 
-    def __parse_state(self, state_line):
-        """
-        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
-
-        
-        """
-        state = json.loads(state_line)
-
-        turn_info = state["turnInfo"]
-        self.turn_number = int(turn_info[1])
-
-        p1_health, p1_cores, p1_bits, p1_time = map(float, state["p1Stats"][:4])
-        p2_health, p2_cores, p2_bits, p2_time = map(float, state["p2Stats"][:4])
-
-        self.my_health = p1_health
-        self.my_time = p1_time
-        self.enemy_health = p2_health
-        self.enemy_time = p2_time
-
-        self._player_resources = [
-            {'cores': p1_cores, 'bits': p1_bits},
-            {'cores': p2_cores, 'bits': p2_bits}]
-
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
-
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
-
-    def __create_parsed_units(self, units, player_number):
-        """
-        Helper function for __parse_state to add units to the map.
-        """
-        typedef = self.config.get("unitInformation")
-        #gamelib.debug_write("Config: {}".format(self.config))
-        #gamelib.debug_write("Config: {}".format(enumerate(units)))
-        for i, unit_types in enumerate(units):
-            for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
-                sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
-                hp = float(shp)
-                # This depends on RM always being the last type to be processed
-                if unit_type == REMOVE:
-                    try:
-                        self.game_map[x,y][0].pending_removal = True
-                    except:
-                        debug_write("Didn't like setting a pending removal flag")
-                else:
-                    unit = GameUnit(unit_type, self.config, player_number, self.unitID, hp, x, y)
-                    self.game_map[x,y].append(unit)
-                    self.unitID += 1
-                if not is_stationary(unit_type):
-                    self.units.append(unit)
-                    if unit.loc in self.game_map.get_edge_locations(self.game_map.TOP_RIGHT):
-                        unit.path_target = self.game_map.BOTTOM_LEFT
-                    if unit.loc in self.game_map.get_edge_locations(self.game_map.TOP_LEFT):
-                        unit.path_target = self.game_map.BOTTOM_RIGHT
-                    if unit.loc in self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT):
-                        unit.path_target = self.game_map.TOP_RIGHT
-                    if unit.loc in self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT):
-                        unit.path_target = self.game_map.TOP_LEFT
-                    #debug_write("Here is an information unit! Location:{},{}".format(x,y))
-
-
     def getUnits(self):
         return self.units
 
@@ -1,4 +1,6 @@
 import heapq
+import collections
+import copy
 import math
 import sys
 import queue
@@ -6,6 +8,8 @@ import time
 import gamelib
 from .game_map import GameMap
 from .unit import GameUnit
+from .pathing import next_step_table
+from .telemetry import telemetry
 from .util import debug_write
 
 class Coord:
@@ -64,273 +68,174 @@ class PathFinding(GameMap):
 
         super(PathFinding, self).__init__(config, storage)
         
-        self.pathfinding_map = []
-
-        for x in range(0, self.ARENA_SIZE):
-            self.pathfinding_map.append([])
-            for y in range(0, self.ARENA_SIZE):
-                self.pathfinding_map[x].append(Node(x, y))
+        # Starts out sharing the blank Nodes of the storage, they are copied before anything changes them
+        self.pathfinding_map = storage.blank_pathing
                 
         self.calculated = False
+        self.pathing_shared = True
 
-        self.storage = storage
-
-    def calculate(self):
-
-        self.pathfinding_map = []
-
-        for x in range(0, self.ARENA_SIZE):
-            self.pathfinding_map.append([])
-            for y in range(0, self.ARENA_SIZE):
-                self.pathfinding_map[x].append(Node(x, y))
-
-        start_time = time.clock()
-        #`gamelib.debug_write("Starting pathfinding calculation")
-
-
-        # Start from edges
-        i=0
-        #gamelib.debug_write("Starting edgy stuff")
+        # Layout the field was calculated for and the next_loc table built from it, see next_loc
+        self.layout = None
+        self.next_steps = None
 
-        changed_locs = set()
+        # Compare every incremental update with a full calculation, for debugging
+        self.check_incremental = False
 
-        for edge in self.edges:
-            if i == 0:
-                dTR = 1
-            else:
-                dTR = -1
-            if i == 1:
-                dTL = 1
-            else:
-                dTL = -1
-            if i == 2:
-                dBL = 1
-            else:
-                dBL = -1
-            if i == 3:
-                dBR = 1
-            else:
-                dBR = -1
-            i += 1
-
-            for edge_loc in edge:
-                x, y = edge_loc[0], edge_loc[1]
-                self.pathfinding_map[x][y] = Node(x, y, dTR, dTL, dBL, dBR, not bool(dTR), not bool(dTL), not bool(dBL), not bool(dTR))
-                if self.contains_stationary_unit(edge_loc):
-                    Node.blocked = True
-                else:
-                    changed_locs.add(Coord(edge_loc))
-
-        gamelib.debug_write("Edges took {}s".format(time.clock()-start_time))
-
-
-        #for i in range(1, self.HALF_ARENA**2):
-        #    start_time_2 = time.clock()
-        #    any_changed = False
-        #    for x in range(0, self.ARENA_SIZE):
-        #        for y in range(0, self.ARENA_SIZE):
-        #            #if i == 4:
-        #            #    gamelib.debug_write("Expanding location ({}, {})".format(x,y))
-        #            if self.in_arena_bounds([x, y]):
-        #                if i in self.pathfinding_map[x][y].dist and not self.contains_stationary_unit([x, y]):
-        #                    changed = self.propogate_node([x, y])
-        #                    if len(changed) > 0:
-        #                        for loc in changed:
-        #                            if loc not in changed_nodes:
-        #                                new_changes.add(loc)
-        #                        if not any_changed:
-        #                            any_changed = True
-
-        self.propogate_from_set(changed_locs)
-
-        gamelib.debug_write("Did original propogation")
-
-        # Check for missing spots
-        in_arena_bounds = self.in_arena_bounds
-
-        missing = True
-        best_loc = [None, None, None, None]
-        x_value_less = [False, True, True, False]
-        
-        while missing:
-            missing = False
-
-            to_prop = set()
-
-            for x in range(0, 28):
-                for y in range(0, 28):
-                    if in_arena_bounds([x, y]) and not self.contains_stationary_unit([x, y]):
-                        for i in range(0, 4):
-                            if self.pathfinding_map[x][y].dist[i] == -1:
-                                # Check against best node
-                                if best_loc[i] == None or y > best_loc[i][1] or (y == best_loc[i][1] and ((x > best_loc[i][0]) != x_value_less[i])):
-                                    best_loc[i] = [x, y]
-                                    if not missing:
-                                        missing = True
-
-            if missing:
-                gamelib.debug_write("o no something missing")
-                i=0
-                for loc in best_loc:
-                    if loc != None:
-                        to_prop.add(Coord(loc))
-                        self.pathfinding_map[loc[0]][loc[1]].dist[i] = 1
-                        self.pathfinding_map[loc[0]][loc[1]].temp[i] = True
-
-                    i += 1
-
-                self.propogate_from_set(to_prop, True)
-        
-        gamelib.debug_write("Finished 'missing' values")
+        self.storage = storage
 
+    def fork(self):
+        """Returns a copy of this map that shares the pathing field until either map changes it"""
+        fork = super(PathFinding, self).fork()
+        self.pathing_shared = True
+        fork.pathing_shared = True
+        return fork
 
-        self.calculated = True
-        end_time = time.clock()
+    def __own_pathing(self):
+        """Copies the pathing field before it is changed, if it is shared with a fork"""
+        if not self.pathing_shared:
+            return
+        pathfinding_map = []
+        for column in self.pathfinding_map:
+            pathfinding_map.append([])
+            for node in column:
+                new_node = copy.copy(node)
+                new_node.dist = list(node.dist)
+                new_node.temp = list(node.temp)
+                pathfinding_map[-1].append(new_node)
+        self.pathfinding_map = pathfinding_map
+        self.pathing_shared = False
 
-        gamelib.debug_write("Calculated pathfinding in {}s".format(end_time-start_time))
+    def calculate(self):
+        """Fills the pathing field with the distance from every tile to each of the four edges"""
+        with telemetry.span("pathing"):
+            if self.pathing_shared:
+                self.pathfinding_map = [[Node(x, y) for y in range(0, self.ARENA_SIZE)] for x in range(0, self.ARENA_SIZE)]
+                self.pathing_shared = False
 
+            storage = self.storage
+            game_map = self.map
+            blocked = [len(game_map[x][y]) > 0 and game_map[x][y][0].stationary for x, y in storage.arena_tiles]
 
-    def propogate_from_set(self, locs, temp=False):
+            dist, temp = storage.field_cache.field(blocked)
+            self.layout = blocked
+            self.next_steps = None
 
-        changed_locs = locs
-        new_changes = set()
-        i=0
-        while True:
-            #start_time_2 = time.clock()
-            #gamelib.debug_write("we looping at i={} and len={}".format(i, len(changed_locs)))
-            any_changed = False
+            dist_tr, dist_tl, dist_bl, dist_br = dist
+            temp_tr, temp_tl, temp_bl, temp_br = temp
+            pathfinding_map = self.pathfinding_map
+            for tile, (x, y) in enumerate(storage.arena_tiles):
+                node = pathfinding_map[x][y]
+                node.dist[:] = dist_tr[tile], dist_tl[tile], dist_bl[tile], dist_br[tile]
+                node.temp[:] = temp_tr[tile], temp_tl[tile], temp_bl[tile], temp_br[tile]
 
-            for coord in changed_locs:
-                #gamelib.debug_write("Trying with new set of changes")
-                local_changes = self.propogate_node(coord.loc)
-                if len(local_changes) > 0:
-                    #gamelib.debug_write("{} changes".format(len(local_changes)))
-                    for loc in local_changes:
-                        new_changes.add(Coord(loc))
-                    #gamelib.debug_write("Made changes set")
-                    if not any_changed:
-                        any_changed = True
-                #gamelib.debug_write("Done with this set of changes")
+            self.calculated = True
 
 
-            if not any_changed:
-                #gamelib.debug_write("i = {} took {}s to compute. Nothing happened.".format(i, time.clock()-start_time_2))
-                break
-            else:
-                changed_locs = set(new_changes)
-                new_changes = set()
-                #gamelib.debug_write("i = {} took {}s to compute".format(i, time.clock()-start_time_2))
-            i+=1
-            
+    def propogate_from_set(self, tiles, temp=False):
+        """Spreads the pathing field out from the given dense tiles until no tile can be improved.
 
+        A tile takes a neighbour's distance + 1 if it has no distance yet, if its distance is temporary and the
+        neighbour's is not, or if it is shorter and equally temporary. Firewalls take a distance but do not pass it on.
+        All four edges are relaxed together, tiles are visited first in first out.
+        """
+        self.__own_pathing()
+        self.layout = None
+        self.next_steps = None
 
-    def propogate_node(self, loc):
+        frontier = collections.deque(tiles)
+        propogate_node = self.propogate_node
 
-        x, y = loc[0], loc[1]
-        locs = [[x, y+1], [x, y-1], [x-1, y], [x+1, y]]
-        any_changed = False
+        while frontier:
+            frontier.extend(propogate_node(frontier.popleft()))
 
-        further_propogations = []
+    def propogate_node(self, tile):
+        """Relaxes the neighbours of a dense tile against it, in the order up, down, left, right
 
-        in_arena_bounds = self.in_arena_bounds
+        Returns:
+            The neighbouring tiles that improved and can pass their distance on
+        """
+        storage = self.storage
+        arena_tiles = storage.arena_tiles
         pathfinding_map = self.pathfinding_map
-        propogate_node = self.propogate_node
-        contains_stationary_unit = self.contains_stationary_unit
-
-        dirs = []
+        game_map = self.map
 
+        x, y = arena_tiles[tile]
         node_dist = pathfinding_map[x][y].dist
         node_temp = pathfinding_map[x][y].temp
 
-        for i in range(0, 4):
-            if node_dist[i] != -1:
-                dirs.append(i)
-        
-        for new_loc in locs:
-            if not in_arena_bounds(new_loc):
-                continue
+        dirs = [i for i in range(0, 4) if node_dist[i] != -1]
+
+        further_propogations = []
+
+        for next_tile in storage.tile_neighbours[tile]:
+            next_x, next_y = arena_tiles[next_tile]
 
             loc_change = False
 
-            next_node = pathfinding_map[new_loc[0]][new_loc[1]]
+            next_node = pathfinding_map[next_x][next_y]
 
             for i in dirs:
-                if next_node.dist[i] == -1 or (next_node.temp[i] and not node_temp[i]):# or next_node.dist[i] > node_dist[i] + 1:
+                next_dist = next_node.dist[i]
+                if next_dist == -1 or (next_node.temp[i] and not node_temp[i]) or (next_node.temp[i] == node_temp[i] and next_dist > node_dist[i] + 1):
                     next_node.dist[i] = node_dist[i] + 1
                     next_node.temp[i] = node_temp[i]
-                    if not any_changed:
-                        any_changed = True
-                    if not loc_change:
-                        loc_change = True
+                    loc_change = True
 
-            if loc_change and not contains_stationary_unit(new_loc):
-                further_propogations.append(new_loc)
+            if loc_change and not any(unit.stationary for unit in game_map[next_x][next_y]):
+                further_propogations.append(next_tile)
 
         return further_propogations
 
-    """
-
-    def propogate_node(self, loc, chain_propogation=False):
-
-        in_arena_bounds = self.in_arena_bounds
-        pathfinding_map = self.pathfinding_map
-        propogate_node = self.propogate_node
-        contains_stationary_unit = self.contains_stationary_unit
-
-        x, y = loc[0], loc[1]
-        locs = [[x, y+1], [x, y-1], [x-1, y], [x+1, y]]
-
-        node = pathfinding_map[x][y]
-        nodes = []
-
-        any_changed = False
-
-        further_propogations = set()
-
-        for new_loc in locs:
-            if in_arena_bounds(new_loc):
-                nodes.append(pathfinding_map[new_loc[0]][new_loc[1]])
-
-        for i in range(0, 4):
-            for next_node in nodes:
-                if node.dist[i] != -1 and (next_node.dist[i] == -1 or next_node.dist[i] > node.dist[i] + 1):
-                    new_loc = next_node.x, next_node.y
-
-                    next_node.dist[i] = node.dist[i] + 1
-                    if not any_changed:
-                        any_changed = True
-                    if new_loc not in further_propogations and not contains_stationary_unit(new_loc):
-                        further_propogations.add(new_loc)
-
-
+    def reopen(self, location):
+        """Updates the pathing field after the firewall at location was removed.
 
+        Only the tiles that get closer to an edge are relaxed. If the tile joins a region that can not reach an edge,
+        the temporary target of that region may change, so the whole field is calculated again instead.
+        """
+        x, y = location[0], location[1]
+        self.propogate_from_set([self.storage.tile_index[x][y]])
 
-        for new_loc in locs:
-            if not in_arena_bounds(new_loc):
-                continue
-
-            loc_change = False
-
+        node = self.pathfinding_map[x][y]
+        if any(node.dist[i] == -1 or node.temp[i] for i in range(0, 4)):
+            self.calculate()
 
-        if chain_propogation and any_changed:
-            for next_loc in further_propogations:
-                try:
-                    propogate_node(next_loc, True)
-                except RecursionError:
-                    gamelib.debug_write("Too much recursion!")
+        if self.check_incremental:
+            self.check_field()
 
-        return further_propogations
+    def check_field(self):
+        """Compares the pathing field with a full calculate() of the same map
 
+        Returns:
+            The number of tiles whose distances or temp flags differ
+        """
+        fresh = PathFinding(self.config, self.storage)
+        fresh.map = self.map
+        fresh.calculate()
 
+        mismatches = 0
+        for x in range(0, self.ARENA_SIZE):
+            for y in range(0, self.ARENA_SIZE):
+                if not self.in_arena_bounds([x, y]):
+                    continue
+                node = self.pathfinding_map[x][y]
+                fresh_node = fresh.pathfinding_map[x][y]
+                if node.dist != fresh_node.dist or node.temp != fresh_node.temp:
+                    mismatches += 1
 
-    """
+        if mismatches > 0:
+            gamelib.debug_write("Pathing field differs from a full calculation on {} tiles".format(mismatches))
+        return mismatches
 
     def copy_pathing(self, map):
+        self.__own_pathing()
+        self.layout = None
+        self.next_steps = None
         for x in range(0, 28):
             for y in range(0, 28):
                 if self.in_arena_bounds([x,y]):
                     for i in range(0, 4):
                         self.pathfinding_map[x][y].dist[i] = self.storage.list[map[x][y].dist[i]]
+                        self.pathfinding_map[x][y].temp[i] = map[x][y].temp[i]
 
 
     def contains_stationary_unit(self, location):
@@ -350,56 +255,34 @@ class PathFinding(GameMap):
 
     
     def next_loc(self, unit):
+        """The tile unit moves to next, or unit.loc if it can not move
 
-        x, y = unit.x, unit.y
-
-        locs = [[x, y+1], [x, y-1], [x-1, y], [x+1, y]]
-
-        ideal_iter = -1
-        highest_score = -1
-        locs = [[x, y+1], [x, y-1], [x-1, y], [x+1, y]]
-        for loc in locs:
-            if not self.in_arena_bounds(loc) or self.contains_stationary_unit(loc):
-                #gamelib.debug_write("stationary unit")
-
-                continue
-
-            temp_score = 0
-            diff = self.pathfinding_map[x][y].dist[unit.path_target] - self.pathfinding_map[loc[0]][loc[1]].dist[unit.path_target]
-            
-            if diff < 0:
-                #gamelib.debug_write("diff < 0")
-
-                continue
-
-            temp_score += diff
-
-            #gamelib.debug_write("Score: {}".format(temp_score))
-
-            # Change idealness based on whether we want to move vertically or horizontally next
-            temp_score += (int(unit.next_dir_up != bool(int(locs.index(loc)/2)))) - 0.5
-            #gamelib.debug_write("Score: {}".format(temp_score))
-
-            # Change idealness based on whether we are trying to move closer to our edge
-            temp_score += ((int( (loc[0] > x) == (unit.path_target % 3 == 0) )) - 0.5) / 10
-            #gamelib.debug_write("Score:{} ".format(temp_score))
-
-            temp_score += ((int( (loc[1] > y) == (unit.path_target < 2) )) - 0.5) / 10
-            #gamelib.debug_write("Score: {}".format(temp_score))
-
-            if temp_score > highest_score:
-                highest_score = temp_score
-                ideal_iter = locs.index(loc)
-
-        if ideal_iter == -1:
-            #gamelib.debug_write("Unit at ({}, {}) doesn't want to move".format(x, y))
+        Looked up in a next step table that is built once per pathing field. After calculate() the table comes
+        from the field cache of the layout, after any other change to the field it is built from the Nodes.
+        """
+        storage = self.storage
+        tile = storage.tile_index[unit.x][unit.y]
+        step = self.get_next_steps()[unit.path_target][unit.next_dir_up][tile]
+        if step == tile:
             return unit.loc
-        
-        new_loc = locs[ideal_iter]
+        return list(storage.arena_tiles[step])
 
-        #gamelib.debug_write("Unit should move from ({}, {}) to ({}, {})".format(x, y, new_loc[0], new_loc[1]))
+    def get_next_steps(self):
+        """The next step table of the current field, see pathing.next_step_table"""
+        if self.next_steps is None:
+            self.next_steps = self.__build_next_steps()
+        return self.next_steps
 
-        return new_loc
+    def __build_next_steps(self):
+        storage = self.storage
+        if self.layout is not None:
+            return storage.field_cache.next_steps(self.layout)
+
+        game_map = self.map
+        pathfinding_map = self.pathfinding_map
+        blocked = [len(game_map[x][y]) > 0 and game_map[x][y][0].stationary for x, y in storage.arena_tiles]
+        dist = [[pathfinding_map[x][y].dist[i] for x, y in storage.arena_tiles] for i in range(0, 4)]
+        return next_step_table(storage, dist, blocked)
 
 
     def show_board(self, edge):
@@ -0,0 +1,98 @@
+import multiprocessing
+from .simulator import Simulator
+from .batch_simulator import BatchSimulator
+
+# Set once in every worker by __init_worker
+_worker_config = None
+_worker_storage = None
+_worker_batch = False
+
+# The last turn a worker parsed and its calculated Simulator, every chunk of that turn starts from it
+_worker_turn = None
+_worker_simulator = None
+
+
+def _init_worker(config, storage, batch):
+    global _worker_config, _worker_storage, _worker_batch
+    _worker_config = config
+    _worker_storage = storage
+    _worker_batch = batch
+
+
+def _turn_simulator(turn_state):
+    """The parsed and calculated Simulator of turn_state, only the first chunk of a turn parses it"""
+    global _worker_turn, _worker_simulator
+    if turn_state != _worker_turn:
+        _worker_simulator = Simulator(_worker_config, turn_state, _worker_storage)
+        _worker_simulator.calculate()
+        _worker_turn = turn_state
+    return _worker_simulator
+
+
+def _evaluate_chunk(task):
+    """Simulates one chunk of candidates in a worker
+
+    Args:
+        * task: (turn_state, candidates), the serialized turn and a list of (unit_type, location, num, player_index)
+
+    Returns:
+        The idealness of each candidate
+    """
+    turn_state, candidates = task
+    simulator = _turn_simulator(turn_state)
+    if _worker_batch:
+        batch = BatchSimulator(simulator, [[candidate] for candidate in candidates])
+        batch.simulate()
+        return batch.idealness()
+    return simulator.evaluate(candidates)
+
+
+class AttackPool:
+    """A pool of worker processes that simulates candidate attacks on several cores.
+
+    The config and the Storage tables are sent to each worker once when the pool starts,
+    after that only the turn string and the candidates travel to the workers. A worker parses
+    each turn once and forks every candidate of the turn from it, see Simulator.evaluate.
+
+    Attributes:
+        * processes (int): Number of worker processes
+        * batch (bool): Whether the workers score candidates with a BatchSimulator instead of one Simulator each
+
+    """
+    def __init__(self, config, storage, processes=None, batch=False):
+        """Starts the workers
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * storage: The Storage shared by every simulation of the game
+            * processes (int): Number of workers, defaults to the number of cores
+            * batch (bool): Score with a BatchSimulator, which follows the ArrayBoard rules instead of the Simulator's
+
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.batch = batch
+        self.pool = multiprocessing.Pool(self.processes, _init_worker, (config, storage, batch))
+
+    def evaluate(self, turn_state, candidates):
+        """Simulates every candidate against the given turn
+
+        Args:
+            * turn_state (string): The serialized game state the candidates are spawned into
+            * candidates: A list of (unit_type, location, num, player_index) like attempt_add
+
+        Returns:
+            The idealness of each candidate, in the order of candidates
+        """
+        if len(candidates) == 0:
+            return []
+
+        chunk_size = -(-len(candidates) // self.processes)
+        chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+        results = self.pool.map(_evaluate_chunk, [(turn_state, chunk) for chunk in chunks])
+
+        return [idealness for chunk_results in results for idealness in chunk_results]
+
+    def close(self):
+        """Stops the workers once they have finished their chunks"""
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,237 @@
+import collections
+import random
+import numpy as np
+
+
+def calculate_field(storage, blocked):
+    """Breadth first search from all four edges over the dense arena tiles of storage
+
+    Open tiles get their shortest distance to each edge, firewalls get one more than their closest open
+    neighbour but do not pass it on. Regions that can not reach an edge are given a temporary target at
+    their best tile, the same way PathFinding.calculate always has.
+
+    Args:
+        * storage: The Storage holding the dense tile tables
+        * blocked: A list with one bool per dense tile, True where a firewall stands
+
+    Returns:
+        (dist, temp), each a list of four lists (one per edge) indexed by dense tile
+    """
+    neighbours = storage.tile_neighbours
+    n_tiles = len(neighbours)
+
+    dist = []
+    temp = []
+    for i in range(0, 4):
+        edge_dist = [-1] * n_tiles
+        edge_temp = list(storage.tile_default_temp)
+
+        frontier = collections.deque()
+        for tile in storage.edge_tiles[i]:
+            edge_dist[tile] = 1
+            if not blocked[tile]:
+                frontier.append(tile)
+
+        while frontier:
+            tile = frontier.popleft()
+            next_dist = edge_dist[tile] + 1
+            for neighbour in neighbours[tile]:
+                if edge_dist[neighbour] == -1:
+                    edge_dist[neighbour] = next_dist
+                    edge_temp[neighbour] = False
+                    if not blocked[neighbour]:
+                        frontier.append(neighbour)
+
+        dist.append(edge_dist)
+        temp.append(edge_temp)
+
+    fill_pockets(storage, blocked, dist, temp)
+
+    return dist, temp
+
+
+def fill_pockets(storage, blocked, dist, temp):
+    """Gives every open region that no edge reaches a temporary target, one region at a time
+
+    The target of a region is its highest tile, ties going to the tile furthest along the edge direction.
+    Distances from temporary targets are marked in temp and never replace a distance to a real edge.
+    """
+    neighbours = storage.tile_neighbours
+    open_tiles = ~np.array(blocked, dtype=bool)
+
+    for i in range(0, 4):
+        edge_dist = dist[i]
+        edge_temp = temp[i]
+        priority = storage.pocket_priority[i]
+
+        while True:
+            missing = open_tiles & (np.array(edge_dist) == -1)
+            if not missing.any():
+                break
+
+            seed = int(np.argmax(np.where(missing, priority, -1)))
+            edge_dist[seed] = 1
+            edge_temp[seed] = True
+
+            frontier = collections.deque([seed])
+            while frontier:
+                tile = frontier.popleft()
+                next_dist = edge_dist[tile] + 1
+                for neighbour in neighbours[tile]:
+                    if edge_dist[neighbour] == -1 or (edge_temp[neighbour] and edge_dist[neighbour] > next_dist):
+                        edge_dist[neighbour] = next_dist
+                        edge_temp[neighbour] = True
+                        if not blocked[neighbour]:
+                            frontier.append(neighbour)
+
+
+def next_step_table(storage, dist, blocked):
+    """The tile PathFinding.next_loc moves to from every tile, for every target edge and next_dir_up flag
+
+    The moves are scored exactly like next_loc scores them: the drop in distance, plus half a point for the
+    preferred axis and a tenth of a point for each coordinate moving towards the target edge. The first of
+    equally scored neighbours wins.
+
+    Args:
+        * storage: The Storage holding the dense tile tables
+        * dist: Four lists (one per edge) of distances indexed by dense tile
+        * blocked: A list with one bool per dense tile, True where a firewall stands
+
+    Returns:
+        steps[target][next_dir_up][tile], the dense tile to move to, or tile itself where the unit can not move
+    """
+    steps = storage.tile_steps
+    n_tiles = len(steps)
+    tiles = np.arange(n_tiles)
+
+    # Index n_tiles stands for the tiles outside the arena
+    dist = np.array(dist, dtype=np.int64)
+    open_tile = np.append(~np.array(blocked, dtype=bool), False)
+    neighbours = np.where(steps >= 0, steps, n_tiles)
+
+    moves_right = np.array([False, False, False, True])
+    moves_up = np.array([True, False, False, False])
+    horizontal = np.array([False, False, True, True])
+
+    table = []
+    for target in range(0, 4):
+        edge_dist = np.append(dist[target], -1)
+        diff = edge_dist[tiles, None] - edge_dist[neighbours]
+        valid = open_tile[neighbours] & (diff >= 0)
+
+        toward_x = ((moves_right == (target % 3 == 0)) - 0.5) / 10
+        toward_y = ((moves_up == (target < 2)) - 0.5) / 10
+
+        by_dir_up = []
+        for dir_up in (False, True):
+            score = diff.astype(np.float64)
+            score += (dir_up != horizontal) - 0.5
+            score += toward_x
+            score += toward_y
+            score[~valid] = -np.inf
+
+            best = np.argmax(score, axis=1)
+            step = neighbours[tiles, best]
+            by_dir_up.append(np.where(valid[tiles, best], step, tiles).tolist())
+        table.append(by_dir_up)
+
+    return table
+
+
+def field_grids(storage, blocked_grid):
+    """calculate_field for the grid based boards
+
+    Args:
+        * storage: The Storage holding the dense tile tables
+        * blocked_grid: bool [28, 28], True where a firewall stands
+
+    Returns:
+        (dist, temp) as int32 and bool arrays of shape [4, 28, 28], tiles outside the arena are -1 and False
+    """
+    tile_x, tile_y = storage.arena_x, storage.arena_y
+    dist, temp = storage.field_cache.field(list(blocked_grid[tile_x, tile_y]))
+
+    size = storage.ARENA_SIZE
+    dist_grid = np.full((4, size, size), -1, dtype=np.int32)
+    temp_grid = np.zeros((4, size, size), dtype=bool)
+    dist_grid[:, tile_x, tile_y] = dist
+    temp_grid[:, tile_x, tile_y] = temp
+    return dist_grid, temp_grid
+
+
+class FieldCache:
+    """Remembers the pathing fields of the most recent firewall layouts
+
+    A layout is fingerprinted with a Zobrist hash: every dense tile has a random 64 bit key and the
+    hash of a layout is the xor of the keys of its blocked tiles. Two layouts can share a hash, so every
+    entry also keeps its layout and a hit on a different layout is calculated again like a miss. The
+    least recently used layout is dropped once the cache is full.
+
+    Attributes:
+        * storage: The Storage holding the dense tile tables
+        * size (int): Number of layouts kept
+        * hits (int): Lookups answered from the cache
+        * misses (int): Lookups that had to calculate the field
+
+    """
+    def __init__(self, storage, size=64, seed=0):
+        self.storage = storage
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+        # Seeded so every process of a game fingerprints layouts the same way
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(64) for _ in storage.arena_tiles]
+        self.fields = collections.OrderedDict()
+
+    def layout_hash(self, blocked):
+        """Zobrist hash of a list with one bool per dense tile"""
+        keys = self.keys
+        h = 0
+        for tile, is_blocked in enumerate(blocked):
+            if is_blocked:
+                h ^= keys[tile]
+        return h
+
+    @staticmethod
+    def layout(blocked):
+        """The layout as bytes, one per dense tile, to tell apart layouts with the same hash"""
+        return bytes(1 if is_blocked else 0 for is_blocked in blocked)
+
+    def field(self, blocked):
+        """calculate_field, answered from the cache when the layout was seen before
+
+        The returned lists are shared with the cache and must not be changed.
+        """
+        entry = self.__entry(blocked)
+        return entry[0], entry[1]
+
+    def next_steps(self, blocked):
+        """next_step_table of the layout, built from the cached field the first time it is asked for"""
+        entry = self.__entry(blocked)
+        if entry[2] is None:
+            entry[2] = next_step_table(self.storage, entry[0], blocked)
+        return entry[2]
+
+    def __entry(self, blocked):
+        h = self.layout_hash(blocked)
+        layout = self.layout(blocked)
+        entry = self.fields.get(h)
+        if entry is not None and entry[3] == layout:
+            self.fields.move_to_end(h)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        dist, temp = calculate_field(self.storage, blocked)
+        # [dist, temp, next step table or None, layout]
+        entry = [dist, temp, None, layout]
+        self.fields[h] = entry
+        self.fields.move_to_end(h)
+        if len(self.fields) > self.size:
+            self.fields.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self.fields.clear()
@@ -0,0 +1,102 @@
+import threading
+from .util import debug_write
+
+
+def candidate_key(candidate):
+    """A hashable version of a (unit_type, location, num, player_index) candidate"""
+    unit_type, location, num, player_index = candidate
+    return unit_type, tuple(location), num, player_index
+
+
+class Precomputer:
+    """Evaluates candidates for the next turn on a background thread while the algo waits for the engine.
+
+    While action phase frames stream in the main thread does little but parse them. Once the board can no longer
+    change the next turn can be predicted, start() evaluates its candidates in chunks on a worker thread and take()
+    hands the results to the next turn if it turned out as predicted. The worker stops between chunks as soon as
+    the turn arrives, so at most one chunk delays it. The main thread keeps parsing while the worker runs, so
+    prepare must not use its Storage: the FieldCache is not thread safe, give the worker a Storage of its own.
+
+    Attributes:
+        * key: The key of the predicted turn being worked on, None if there is none
+        * results (dict): candidate_key(candidate) -> score of the candidates evaluated so far
+        * chunk_size (int): Candidates evaluated between two checks for the turn
+
+    """
+    def __init__(self, chunk_size=4):
+        self.key = None
+        self.results = {}
+        self.chunk_size = chunk_size
+        self.stop = threading.Event()
+        self.thread = None
+
+    def start(self, key, prepare):
+        """Starts evaluating a predicted turn, whatever was being worked on is dropped
+
+        Nothing happens if the worker already has the turn, every settled frame predicts the same one.
+
+        Args:
+            * key: Identifies the predicted turn, take() only returns the results for an equal key
+            * prepare: Function run on the worker returning (candidates, evaluate), evaluate takes a list of
+              candidates and returns one score for each
+
+        """
+        if key is not None and key == self.key and self.thread is not None:
+            return
+        self.cancel()
+        self.key = key
+        self.results = {}
+        self.stop.clear()
+        self.thread = threading.Thread(target=self.__work, args=(prepare, self.results), daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """Stops the worker after its current chunk"""
+        if self.thread is not None:
+            self.stop.set()
+            self.thread.join()
+            self.thread = None
+
+    def take(self, key):
+        """Stops the worker and returns the results it has for key, an empty dict if it predicted another turn"""
+        self.cancel()
+        results = self.results if key == self.key and self.key is not None else {}
+        if self.key is not None:
+            debug_write("Reusing {} precomputed results".format(len(results)) if key == self.key else "The turn was not the predicted one")
+        self.key = None
+        self.results = {}
+        return results
+
+    def __work(self, prepare, results):
+        try:
+            candidates, evaluate = prepare()
+            for i in range(0, len(candidates), self.chunk_size):
+                if self.stop.is_set():
+                    return
+                chunk = candidates[i:i + self.chunk_size]
+                for candidate, score in zip(chunk, evaluate(chunk)):
+                    results[candidate_key(candidate)] = score
+        except Exception as e:
+            # A failed prediction only costs the head start, the turn evaluates everything itself
+            debug_write("Precomputing the next turn failed: {}".format(e))
+
+
+def cached(results, evaluate):
+    """Wraps evaluate so that candidates found in results are not evaluated again
+
+    Args:
+        * results (dict): candidate_key(candidate) -> score, as returned by Precomputer.take
+        * evaluate: Function of a list of candidates returning one score each
+
+    Returns:
+        A function like evaluate
+    """
+    if len(results) == 0:
+        return evaluate
+
+    def evaluate_cached(chunk):
+        missing = [candidate for candidate in chunk if candidate_key(candidate) not in results]
+        scores = dict(zip(map(candidate_key, missing), evaluate(missing))) if missing else {}
+        return [results.get(candidate_key(candidate), scores.get(candidate_key(candidate))) for candidate in chunk]
+
+    return evaluate_cached
@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+from .util import debug_write
+
+
+class SamplingProfiler:
+    """Samples the stack of the algo's main thread during each turn and writes it out as collapsed stacks.
+
+    A background thread looks at the main thread's stack every interval while a turn is running, so the cost to
+    the turn is a few microseconds per sample rather than the per call overhead of cProfile. Each turn is written
+    to turn_<n>.folded in the output directory, one "file:function;file:function count" line per distinct stack,
+    the format flamegraph.pl and speedscope read. When the game ends summary.txt lists the slowest turns and how
+    close they came to waitTimeBotSoft.
+
+    AlgoCore.start enables it when the GAMELIB_PROFILE environment variable holds the output directory.
+
+    Attributes:
+        * enabled (bool): Whether turns are sampled
+        * output (string): The directory the stacks are written to
+        * interval (float): Seconds between two samples
+        * time_limit (float): waitTimeBotSoft in seconds, set from the config by AlgoCore
+        * warn_fraction (float): Turns using more than this part of time_limit are reported as they happen
+        * turn_times (dict): Turn number -> seconds spent in on_turn
+
+    """
+    def __init__(self, output=None, interval=0.005, warn_fraction=0.8):
+        self.enabled = output is not None
+        self.output = output
+        self.interval = interval
+        self.time_limit = None
+        self.warn_fraction = warn_fraction
+        self.turn_times = {}
+
+        self.turn = None
+        self.turn_start = 0
+        self.samples = {}
+        self.stop = threading.Event()
+        self.thread = None
+        self.target = None
+
+        if self.enabled:
+            os.makedirs(output, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, variable="GAMELIB_PROFILE"):
+        return cls(os.environ.get(variable, "").strip() or None)
+
+    def set_config(self, config):
+        self.time_limit = config.get("timingAndReplay", {}).get("waitTimeBotSoft", 5000) / 1000
+
+    def start_turn(self, turn):
+        """Starts sampling the calling thread for turn"""
+        if not self.enabled:
+            return
+        self.turn = turn
+        self.samples = {}
+        self.target = threading.get_ident()
+        self.stop.clear()
+        self.thread = threading.Thread(target=self.__sample, daemon=True)
+        self.turn_start = time.perf_counter()
+        self.thread.start()
+
+    def end_turn(self):
+        """Stops sampling and writes the turn's collapsed stacks"""
+        if not self.enabled or self.thread is None:
+            return
+        elapsed = time.perf_counter() - self.turn_start
+        self.stop.set()
+        self.thread.join()
+        self.thread = None
+        self.turn_times[self.turn] = elapsed
+
+        with open(os.path.join(self.output, "turn_{}.folded".format(self.turn)), "w") as f:
+            for stack, count in sorted(self.samples.items(), key=lambda sample: -sample[1]):
+                f.write("{} {}\n".format(stack, count))
+
+        if self.time_limit and elapsed > self.time_limit * self.warn_fraction:
+            debug_write("Turn {} took {:.2f}s, {:.0%} of waitTimeBotSoft".format(self.turn, elapsed, elapsed / self.time_limit))
+
+    def finish(self):
+        """Writes summary.txt, the turns from slowest to fastest"""
+        if not self.enabled:
+            return
+        self.end_turn()
+        with open(os.path.join(self.output, "summary.txt"), "w") as f:
+            for turn, elapsed in sorted(self.turn_times.items(), key=lambda turn_time: -turn_time[1]):
+                line = "turn {} {:.3f}s".format(turn, elapsed)
+                if self.time_limit:
+                    line += " {:.0%} of waitTimeBotSoft".format(elapsed / self.time_limit)
+                    if elapsed > self.time_limit * self.warn_fraction:
+                        line += " SLOW"
+                f.write(line + "\n")
+
+    def __sample(self):
+        samples = self.samples
+        target = self.target
+        while not self.stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            samples[key] = samples.get(key, 0) + 1
@@ -0,0 +1,92 @@
+import time
+from .util import debug_write
+
+
+class SearchScheduler:
+    """Spends the time left in a turn simulating candidates, most promising first.
+
+    The budget of a turn is a fraction of waitTimeBotSoft from the config, counted from start_turn().
+    Candidates are ordered by a cheap heuristic and simulated in small chunks, the best result so far
+    is kept and the search stops before a chunk could run past the deadline.
+
+    Only attacks are searched. The build sets are chosen in build_base_defences by their hand-tuned
+    probability and built greedily until the cores run out, none of them is simulated, so there is
+    nothing to budget. Their time still counts, the clock starts before the builds.
+
+    Attributes:
+        * budget (float): Seconds of search allowed per turn
+        * chunk_size (int): Candidates simulated between two deadline checks
+        * turn_start (float): time.perf_counter() at the start of the current turn
+
+    """
+    def __init__(self, config, fraction=0.6, chunk_size=12):
+        """Derives the per turn budget from the config
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * fraction (float): Part of waitTimeBotSoft the search may use, the rest is left for the turn itself
+            * chunk_size (int): Candidates simulated between two deadline checks
+
+        """
+        soft_limit = config.get("timingAndReplay", {}).get("waitTimeBotSoft", 5000) / 1000
+        self.budget = soft_limit * fraction
+        self.chunk_size = chunk_size
+        self.turn_start = time.perf_counter()
+
+    def start_turn(self):
+        """Starts the clock for a new turn"""
+        self.turn_start = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.turn_start
+
+    def time_left(self):
+        return self.budget - self.elapsed()
+
+    @staticmethod
+    def rank(candidates, heuristic, limit=None):
+        """Orders candidates by heuristic, highest first, calling it once per candidate
+
+        Args:
+            * candidates: A list of candidates of any type
+            * heuristic: Function of a candidate
+            * limit (int): Only the first limit candidates are returned, all of them if None
+
+        """
+        return sorted(candidates, key=heuristic, reverse=True)[:limit]
+
+    def search(self, candidates, heuristic, evaluate, limit=None):
+        """Simulates candidates best-first until they run out or the budget is spent
+
+        Args:
+            * candidates: A list of candidates of any type
+            * heuristic: Function of a candidate, higher values are simulated first
+            * evaluate: Function of a list of candidates returning one score each, higher is better
+            * limit (int): Only the limit candidates with the highest heuristic are searched, see rank
+
+        Returns:
+            (results, skipped), results is a list of (score, candidate) sorted from best to worst and
+            skipped is the number of searched candidates that were not simulated in time
+        """
+        order = self.rank(candidates, heuristic, limit)
+        results = []
+        per_candidate = 0
+
+        i = 0
+        while i < len(order):
+            chunk = order[i:i + self.chunk_size]
+            if per_candidate * len(chunk) > self.time_left():
+                break
+
+            chunk_start = time.perf_counter()
+            scores = evaluate(chunk)
+            per_candidate = (time.perf_counter() - chunk_start) / len(chunk)
+
+            results.extend(zip(scores, chunk))
+            i += len(chunk)
+
+        if i < len(order):
+            debug_write("Search stopped after {} of {} candidates, {:.2f}s into the turn".format(i, len(order), self.elapsed()))
+
+        results.sort(key=lambda result: result[0], reverse=True)
+        return results, len(order) - i
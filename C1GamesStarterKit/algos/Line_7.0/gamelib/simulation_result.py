@@ -0,0 +1,91 @@
+SCORE_WEIGHTS = {"cores_on_board": 0.75, "cores_in_storage": 1, "bits_in_storage": 0.5, "player_health": 2}
+
+
+def weighted_score(cores_on_board, cores_in_storage, bits_in_storage, player_health, weights=None):
+    """Weighs the resources and health of both players against each other.
+    Each argument is indexed by player, the values may be numbers or numpy arrays of scenarios.
+
+    Args:
+        * weights (dict): A weight for each of the four arguments by name, SCORE_WEIGHTS if None
+    """
+    if weights is None:
+        weights = SCORE_WEIGHTS
+
+    overall_score = [0, 0]
+
+    for i in range(0, 2):
+        overall_score[i] += cores_on_board[i] * weights["cores_on_board"]
+        overall_score[i] += cores_in_storage[i] * weights["cores_in_storage"]
+        overall_score[i] += bits_in_storage[i] * weights["bits_in_storage"]
+        overall_score[i] += player_health[i] * weights["player_health"]
+
+    return overall_score[0] - overall_score[1]
+
+
+class SimulationResult:
+    """The outcome of an action phase, kept up to date by the Simulator as it runs
+
+    Every list is indexed by player, breaches by the edge they were made on, in the order of GameMap.edges.
+    A stack of information units counts as all of its units. The ArrayBoard only reports the final board, so
+    after a simulation on it breaches, self_destructs and information_destroyed are None.
+
+    Attributes:
+        * cores_on_board (list): Cost of the firewalls each player has on the board
+        * cores_destroyed (list): Cost of the firewalls each player lost
+        * firewalls_left (list): Firewalls each player has on the board
+        * firewall_damage (dict): (x, y) -> stability the firewall there lost, for every damaged firewall
+        * breaches (list): Information units that reached each edge
+        * self_destructs (list): Information units of each player that self destructed
+        * information_destroyed (list): Information units of each player that were destroyed
+        * frames (int): Frames the action phase took
+        * cores_in_storage (list): Cores of each player after the action phase
+        * bits_in_storage (list): Bits of each player after the action phase, as Simulator.idealness counts them
+        * player_health (list): Health of each player after the action phase
+
+    """
+    def __init__(self):
+        self.cores_on_board = [0, 0]
+        self.cores_destroyed = [0, 0]
+        self.firewalls_left = [0, 0]
+        self.firewall_damage = {}
+        self.breaches = [0, 0, 0, 0]
+        self.self_destructs = [0, 0]
+        self.information_destroyed = [0, 0]
+        self.frames = 0
+        self.cores_in_storage = None
+        self.bits_in_storage = None
+        self.player_health = None
+
+    def add_firewall(self, unit):
+        self.cores_on_board[unit.player_index] += unit.cost
+        self.firewalls_left[unit.player_index] += 1
+
+    def damage_firewall(self, unit, damage):
+        if damage > 0:
+            location = (unit.x, unit.y)
+            self.firewall_damage[location] = self.firewall_damage.get(location, 0) + damage
+
+    def destroy(self, unit):
+        """Records a unit reduced to 0 stability"""
+        if unit.stationary:
+            self.cores_on_board[unit.player_index] -= unit.cost
+            self.cores_destroyed[unit.player_index] += unit.cost
+            self.firewalls_left[unit.player_index] -= 1
+        else:
+            self.information_destroyed[unit.player_index] += unit.count
+
+    def breach(self, unit):
+        self.breaches[unit.path_target] += unit.count
+
+    def self_destruct(self, unit):
+        self.self_destructs[unit.player_index] += unit.count
+
+    def finish(self, frames, cores_in_storage, bits_in_storage, player_health):
+        self.frames = frames
+        self.cores_in_storage = cores_in_storage
+        self.bits_in_storage = bits_in_storage
+        self.player_health = player_health
+
+    def score(self, weights=None):
+        """The idealness of the outcome, see weighted_score"""
+        return weighted_score(self.cores_on_board, self.cores_in_storage, self.bits_in_storage, self.player_health, weights)
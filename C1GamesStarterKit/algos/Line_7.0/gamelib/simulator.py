@@ -1,12 +1,29 @@
 import gamelib
+import copy
 import time
 import timeit
 import math
+import numpy as np
 from .util import debug_write
+from .array_board import ArrayBoard, UnitStats
+from .pathing import FieldCache
+from .navigation import Node
+from .spatial_index import SpatialIndex, build_tile_rings
+from .telemetry import telemetry
+from .simulation_result import SimulationResult, weighted_score
 
 class Simulator:
-    def __init__(self, config, serialized_string, storage):
-        
+    def __init__(self, config, serialized_string, storage, array_board=False):
+        """Parses the turn and prepares a simulation of the next action phase
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * serialized_string (string): The game state to start the simulation from
+            * storage: The Storage shared by every simulation of the game
+            * array_board (bool): Run the action phase on an ArrayBoard, which follows the engine's targeting rules
+                instead of this simulator's. It is slower, and the outcome differs wherever destructors are in range
+
+        """
         global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, REMOVE, FIREWALL_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
         UNIT_TYPE_TO_INDEX = {}
         FILTER = config["unitInformation"][0]["shorthand"]
@@ -32,22 +49,81 @@ class Simulator:
         self.finished = False
         self.curr_frame = 0
 
-        self.move_times = []
-        self.attack_times = []
-
         self.unit_list = set()
         self.encryptor_list = set()
 
         self.loc_in_range = self.game_state.game_map.get_locations_in_range([0,0], 3, True)
         self.loc_in_range_1 = self.game_state.game_map.get_locations_in_range([0,0], 1, True)
+        # The dense tiles at the offsets of loc_in_range from every tile
+        self.tiles_in_range = storage.offset_tiles(self.loc_in_range)
 
         self.calculated = False
 
+        self.array_board = array_board
+        self.board = None
+        self.result = None
+
+        # Identical information units on one tile are simulated as one unit with a count, see stack_unit_list
+        self.stack_units = True
+        self.attacked = set()
+        self.waiting = {}
+        self.split_units = []
+
+        # Frames where nothing can happen are jumped over, see next_event_frame
+        self.skip_idle_frames = True
+        self.hits = None
+
+        # Decided simulations are finished without their last frames, see close_outcome
+        self.close_early = True
+        self.blocked_units = None
+        self.firewall_range = max(unit["range"] for unit in config["unitInformation"][0:3])
+
 
     def calculate(self):
         self.game_state.game_map.calculate()
         self.calculated = True
 
+    def fork(self):
+        """Returns a copy of this simulator without parsing the turn again.
+        Should be called before simulate(), the fork starts from the same board and can be changed and simulated on its own.
+
+        The config, storage and pathing field are shared until they change, units and resources are copied.
+        """
+        fork = copy.copy(self)
+
+        game_state = copy.copy(self.game_state)
+        game_state.game_map = self.game_state.game_map.fork()
+        game_state.units = list(self.game_state.units)
+        game_state._build_stack = list(self.game_state._build_stack)
+        game_state._deploy_stack = list(self.game_state._deploy_stack)
+        game_state._player_resources = [dict(resources) for resources in self.game_state._player_resources]
+        fork.game_state = game_state
+
+        fork.unit_list = set()
+        fork.encryptor_list = set()
+        fork.board = None
+        fork.result = None
+
+        return fork
+
+    def evaluate(self, candidates):
+        """Simulates every candidate on its own fork and returns their idealness, this simulator is left as it is
+
+        Args:
+            * candidates: A list of (unit_type, location, num, player_index) like attempt_add
+
+        """
+        if not self.calculated:
+            self.calculate()
+
+        scores = []
+        for candidate in candidates:
+            fork = self.fork()
+            fork.game_state.attempt_add(*candidate)
+            fork.simulate()
+            scores.append(fork.idealness())
+        return scores
+
 
     def simulate(self):
         #gamelib.debug_write("New simulation")
@@ -55,6 +131,12 @@ class Simulator:
         if not self.calculated:
             self.game_state.game_map.calculate()
 
+        self.result = SimulationResult()
+
+        if self.array_board:
+            with telemetry.span("simulate"):
+                return self.simulate_array()
+
         #self.game_state.game_map.show_board(self.game_state.game_map.TOP_LEFT)
 
         for x in range(0, self.game_state.game_map.ARENA_SIZE):
@@ -65,43 +147,239 @@ class Simulator:
                             self.unit_list.add(unit)
                     elif len(self.game_state.game_map[x,y]) == 1 and self.game_state.game_map[x,y][0].unit_type == ENCRYPTOR:
                         self.encryptor_list.add(self.game_state.game_map[x,y][0])
+                    if self.game_state.contains_stationary_unit([x,y]):
+                        self.result.add_firewall(self.game_state.game_map[x,y][0])
+        if self.stack_units:
+            self.stack_unit_list()
         #gamelib.debug_write("Finished making simulation lists. Turn = {}".format(self.game_state.turn_number))
         #timeit self.frame()
 
-        #start_time = time.clock()
-        while not self.finished:
-            if self.game_state.turn_number == 4:
-                gamelib.debug_write("Frame")
-            self.frame()
-        #end_time = time.clock()
+        # Kept up to date by move_units and unit_attack, dropped again once the map is handed back
+        self.game_state.game_map.spatial_index = SpatialIndex(self.game_state.game_map)
+
+        with telemetry.span("simulate"):
+            while not self.finished:
+                if self.close_early and self.close_outcome():
+                    break
+                if self.skip_idle_frames:
+                    self.skip_to(self.next_event_frame())
+                self.frame()
+        telemetry.count("frames", self.curr_frame)
+
+        self.game_state.game_map.spatial_index = None
+        #self.game_state.game_map.show_board(self.game_state.game_map.TOP_LEFT)
+
+        self.result.finish(self.curr_frame, *self.stored_resources())
+        return self.result
+
+    def simulate_array(self):
+        """Runs the action phase on an ArrayBoard built from the current game state.
+        The outcome is written back into game_state, so idealness() works the same way for both modes.
+        The result is worked out from the firewalls before and after, the board does not report its breaches.
         """
-        n_times = 0
-        sum_times = 0
-        for t in self.move_times:
-            n_times += 1
-            sum_times += t
+        game_map = self.game_state.game_map
+        firewalls = []
+        for x, y in game_map.storage.arena_tiles:
+            if len(game_map.map[x][y]) > 0 and game_map.map[x][y][0].stationary:
+                firewalls.append((game_map.map[x][y][0], game_map.map[x][y][0].stability))
+
+        self.board = ArrayBoard.from_game_state(self.game_state, self.game_state.storage.unit_stats)
+        self.curr_frame = self.board.simulate()
+        self.board.apply_to(self.game_state)
+        self.finished = True
+
+        result = self.result
+        result.breaches = result.self_destructs = result.information_destroyed = None
+        for firewall, stability in firewalls:
+            result.add_firewall(firewall)
+            if firewall in game_map.map[firewall.x][firewall.y]:
+                result.damage_firewall(firewall, stability - firewall.stability)
+            else:
+                result.damage_firewall(firewall, stability)
+                result.destroy(firewall)
+        result.finish(self.curr_frame, *self.stored_resources())
 
-        if n_times > 0:
-            gamelib.debug_write("Movement took {}s".format(sum_times))
-        else:
-            gamelib.debug_write("Movement was not completed")
-        
-        n_times = 0
-        sum_times = 0
-        for t in self.attack_times:
-            n_times += 1
-            sum_times += t
+        return result
 
-        if n_times > 0:
-            gamelib.debug_write("Attacking took {}s".format(sum_times))
-        else:
-            gamelib.debug_write("Attacking was not completed")
+    def stack_unit_list(self):
+        """Merges the information units of unit_list that would behave the same into stacks
 
-        gamelib.debug_write("Actual simulation took {}s".format(end_time-start_time))
+        Units on one tile with the same type, owner, stability, shields, target edge and move history take the same
+        steps and see the same targets. The first of them in the tile is kept with its count raised and the others
+        are taken off the map, so a rush of 20 pings moves and searches for targets like one ping. A stack is split
+        again by split_unit as soon as some of its units are damaged or pick different targets.
         """
-        #self.game_state.game_map.show_board(self.game_state.game_map.TOP_LEFT)
+        game_map = self.game_state.game_map
 
-        return self.game_state.game_map.map
+        stacks = {}
+        for unit in self.unit_list:
+            key = (unit.x, unit.y, unit.unit_type, unit.player_index, unit.stability, tuple(unit.encryption), unit.path_target,
+                   unit.tiles_moved, unit.next_dir_up, unit.d_target, id(unit.target))
+            stacks.setdefault(key, []).append(unit)
+
+        for units in stacks.values():
+            if len(units) == 1:
+                continue
+            tile = game_map[units[0].x, units[0].y]
+            units.sort(key=tile.index)
+            stack = units[0]
+            for unit in units[1:]:
+                stack.count += unit.count
+                tile.remove(unit)
+                self.unit_list.remove(unit)
+
+    def split_unit(self, unit, count):
+        """Takes count units off a stack and returns them as a new stack on the same tile
+
+        The new stack joins unit_list once the current frame is done with it, see unit_attack.
+        """
+        game_map = self.game_state.game_map
+        split = unit.clone()
+        split.count = count
+        unit.count -= count
+
+        game_map[unit.x, unit.y].append(split)
+        if game_map.spatial_index is not None:
+            game_map.spatial_index.add(split)
+        # Units that breached stay on the map without being in unit_list, so do the units split off them
+        if unit in self.unit_list or unit in self.split_units:
+            self.split_units.append(split)
+        return split
+
+    def hit(self, target, damage):
+        """Deals damage to one unit of target, splitting it off first if target is a stack
+
+        Returns:
+            The unit that was damaged
+        """
+        if target.count > 1:
+            split = self.split_unit(target, 1)
+            if not target.stationary and target not in self.attacked:
+                # It is still to attack this frame along with the rest of its stack
+                self.waiting.setdefault(target, []).append(split)
+            target = split
+        self.hits += 1
+        self.blocked_units = None
+        stability = target.stability
+        target.attack(damage)
+        if target.stationary:
+            self.result.damage_firewall(target, stability - target.stability)
+        return target
+
+    def next_event_frame(self):
+        """The next frame where the board can change
+
+        Units only change tiles on the frames they move, every 1/speed frames. If no unit hit anything in the last
+        frame, nothing is in range of anything until a unit moves again, so the frames up to that move only decay
+        shields. Before the first frame and after a frame with hits that is the next frame.
+        """
+        frame = self.curr_frame + 1
+        if self.hits != 0 or len(self.unit_list) == 0:
+            return frame
+        periods = set(int(round(1 / unit.speed)) for unit in self.unit_list)
+        return min(frame + (-frame) % period for period in periods)
+
+    def skip_to(self, frame):
+        """Advances over the idle frames before frame, frame itself is left to frame()"""
+        skipped = frame - 1 - self.curr_frame
+        if skipped <= 0:
+            return
+        for unit in self.unit_list:
+            for _ in range(0, skipped):
+                unit.decay()
+        self.curr_frame += skipped
+        telemetry.count("skipped_frames", skipped)
+
+    def close_outcome(self):
+        """Finishes the simulation at once if nothing can be hit any more
+
+        Once only one player has information units left and none of them comes in range of an opponent's unit on
+        the rest of its path, or of an opponent's firewall in range of it, the map stays as it is. Every unit then
+        walks its path to the edge it breaches or the tile it self destructs on, which is followed in the next step
+        table instead of frame by frame. Units keep their stability, like they would without encryptors.
+
+        Returns:
+            True if the simulation was finished
+        """
+        if self.hits != 0 or self.blocked_units == len(self.unit_list):
+            return False
+        players = set(unit.player_index for unit in self.unit_list)
+        if len(players) != 1:
+            return False
+
+        game_map = self.game_state.game_map
+        storage = game_map.storage
+        spatial_index = game_map.spatial_index
+        player_index = players.pop()
+        opponents = spatial_index.information[1 - player_index] | spatial_index.firewalls[1 - player_index]
+        next_steps = game_map.get_next_steps()
+        pathfinding_map = game_map.pathfinding_map
+        arena_tiles = storage.arena_tiles
+
+        ends = []
+        for unit in self.unit_list:
+            reach = storage.tile_reach_3 if max(unit.range, self.firewall_range) <= 3 else storage.tile_reach_5
+            period = int(round(1 / unit.speed))
+            frame = self.curr_frame + 1
+            frame += (-frame) % period
+            tile = storage.tile_index[unit.x][unit.y]
+            target = unit.path_target
+            next_dir_up = unit.next_dir_up
+            tiles_moved = unit.tiles_moved
+            breached = None
+
+            # A path longer than the arena has tiles runs in circles, the frames find out what happens to it
+            for _ in range(0, len(arena_tiles)):
+                if reach[tile] & opponents or len(unit.encryption) > 0:
+                    break
+                x, y = arena_tiles[tile]
+                node = pathfinding_map[x][y]
+                if node.dist[target] == 1 and node.temp[target]:
+                    breached = False
+                    break
+                if storage.edge_masks[target] >> tile & 1:
+                    breached = True
+                    break
+                tiles_moved += 1
+                step = next_steps[target][next_dir_up][tile]
+                if arena_tiles[step][0] != x:
+                    next_dir_up = True
+                elif arena_tiles[step][1] != y:
+                    next_dir_up = False
+                tile = step
+                frame += period
+
+            if breached is None:
+                self.blocked_units = len(self.unit_list)
+                return False
+            ends.append((unit, tile, tiles_moved, next_dir_up, breached, frame))
+
+        last_frame = self.curr_frame
+        for unit, tile, tiles_moved, next_dir_up, breached, frame in ends:
+            # Units that self destruct leave the map, those that breach stay on it like in move_units
+            game_map[unit.x, unit.y].remove(unit)
+            spatial_index.remove(unit)
+            if breached:
+                unit.loc = list(arena_tiles[tile])
+                unit.x, unit.y = unit.loc
+                unit.tiles_moved = tiles_moved
+                unit.next_dir_up = next_dir_up
+                game_map[unit.x, unit.y].append(unit)
+                spatial_index.add(unit)
+                if player_index == 0:
+                    self.game_state.enemy_health -= unit.count
+                else:
+                    self.game_state.my_health -= unit.count
+                self.result.breach(unit)
+            else:
+                self.result.self_destruct(unit)
+            last_frame = max(last_frame, frame)
+
+        telemetry.count("closed_frames", last_frame - self.curr_frame)
+        self.curr_frame = last_frame
+        self.unit_list.clear()
+        self.finished = True
+        return True
 
     def frame(self):
         """ 
@@ -134,6 +412,7 @@ class Simulator:
 
         game_state = self.game_state
         game_map = game_state.game_map
+        spatial_index = game_map.spatial_index
 
         removal_list = []
 
@@ -148,28 +427,36 @@ class Simulator:
                 if game_state.game_map.pathfinding_map[unit.loc[0]][unit.loc[1]].dist[unit.path_target] == 1 and game_state.game_map.pathfinding_map[unit.loc[0]][unit.loc[1]].temp[unit.path_target]:
                     # Self destruct
                     game_map[unit.x, unit.y].remove(unit)
+                    spatial_index.remove(unit)
                     removal_list.append(unit)
+                    self.result.self_destruct(unit)
 
                     if unit.tiles_moved >= 5:
-                        # Deal damage to enemy units
+                        # Deal damage to enemy units, once for every unit of the stack. The whole of a stack in range is hit
                         for loc in game_map.get_locations_in_range(unit.loc, 1.5):
                             if game_map.in_arena_bounds(loc):
                                 for attacked_unit in game_map[loc]:
-                                    if attacked_unit.player_index != unit.player_index and attacked_unit.stability > 0:
-                                        attacked_unit.attack(unit.max_stability)
+                                    for _ in range(0, unit.count):
+                                        if attacked_unit.player_index != unit.player_index and attacked_unit.stability > 0:
+                                            stability = attacked_unit.stability
+                                            attacked_unit.attack(unit.max_stability)
+                                            if attacked_unit.stationary:
+                                                self.result.damage_firewall(attacked_unit, stability - attacked_unit.stability)
 
-                                        if attacked_unit.stability <= 0:
-                                            removal_list.append(attacked_unit)
+                                            if attacked_unit.stability <= 0:
+                                                removal_list.append(attacked_unit)
+                                                self.result.destroy(attacked_unit)
 
                     continue
                     
                 if unit.loc in game_map.edges[unit.path_target]:
                     if unit.player_index == 0:
-                        game_state.enemy_health -= 1
+                        game_state.enemy_health -= unit.count
                     else:
-                        game_state.my_health -= 1
+                        game_state.my_health -= unit.count
 
                     removal_list.append(unit)
+                    self.result.breach(unit)
 
                     continue
 
@@ -183,23 +470,26 @@ class Simulator:
                     unit.next_dir_up = False
 
                 game_map[unit.x, unit.y].remove(unit)
+                spatial_index.remove(unit)
 
                 unit.loc = new_loc
                 unit.x = new_loc[0]
                 unit.y = new_loc[1]
 
                 game_map[new_loc[0], new_loc[1]].append(unit)
+                spatial_index.add(unit)
 
         for unit in removal_list:
             if not is_stationary(unit.unit_type):
                 self.unit_list.remove(unit)
             else:
                 game_map[unit.loc].pop(0)
+                spatial_index.remove(unit)
+                if game_map.threat_map is not None:
+                    game_map.threat_map.remove(unit)
                 if unit.unit_type == ENCRYPTOR:
                     encryptor_list.remove(unit)
-                new_loc = set()
-                new_loc.add(gamelib.Coord(unit.loc))
-                game_map.propogate_from_set(new_loc)
+                game_map.reopen(unit.loc)
 
         if len(self.unit_list) == 0:
             self.finished = True
@@ -210,126 +500,48 @@ class Simulator:
 
         game_state = self.game_state
         game_map = game_state.game_map
+        spatial_index = game_map.spatial_index
 
         stationary_list = set()
         stationary_locs = set()
         dead_units = []
         removal_list = []
 
-        loc_in_range = self.loc_in_range
+        tiles_in_range = self.tiles_in_range
+        tile_index = game_map.storage.tile_index
+        arena_tiles = game_map.storage.arena_tiles
         encryptor_list = self.encryptor_list
 
         # Go through encryptors
         for encryptor in encryptor_list:
-            for loc in loc_in_range:
-                loc = [loc[0] + unit.x, loc[1] + unit.y]
-                if game_map.in_arena_bounds(loc):
-                    if len(game_map[loc]) > 0:
-                        if not game_state.contains_stationary_unit(loc):
-                            for unit in game_map[loc]:
-                                if unit.player_index == encryptor.player_index and unit.id not in encryptor.encrypted_IDs:
-                                    unit.encrypt(encryptor.damage)
-                                    encryptor.encrypted_IDs.append(unit.id)
+            for tile in tiles_in_range[tile_index[encryptor.x][encryptor.y]]:
+                units = game_map.tile_units(tile)
+                if len(units) > 0:
+                    if not game_state.contains_stationary_unit(arena_tiles[tile]):
+                        for unit in units:
+                            if unit.player_index == encryptor.player_index and unit.id not in encryptor.encrypted_IDs:
+                                unit.encrypt(encryptor.damage)
+                                encryptor.encrypted_IDs.append(unit.id)
 
         # Go through information units
+        # Units split off a stack join unit_list at the end of the frame, those split off before their stack
+        # attacked wait for it in waiting and attack right after it
+        self.attacked = set()
+        self.waiting = {}
+        self.split_units = []
+        self.hits = 0
         #start_time = time.clock()
-        for unit in self.unit_list:
+        for unit in list(self.unit_list):
             #stationary_list.concatenate(game_map.get_locations_in_range(unit.loc, 3))
-            #s_t = time.clock()
-            for loc in loc_in_range:
-                loc = [loc[0] + unit.x, loc[1] + unit.y]
-                if game_map.in_arena_bounds(loc) and game_state.contains_stationary_unit(loc):
-                    if game_map[loc][0].player_index != unit.player_index and game_map[loc][0].unit_type != ENCRYPTOR:
-                        if game_map[loc][0] not in stationary_list:
-                            stationary_list.add(game_map[loc][0])
-            #mid_t = time.clock()
-
-            # Attack
+            for tile in tiles_in_range[tile_index[unit.x][unit.y]]:
+                if game_state.contains_stationary_unit(arena_tiles[tile]):
+                    firewall = game_map.tile_units(tile)[0]
+                    if firewall.player_index != unit.player_index and firewall.unit_type != ENCRYPTOR:
+                        stationary_list.add(firewall)
 
-            """
-            If we didn't move:
-            If our target was stationary:
-            - We might need to check for pings entering the radius, if this unit is an Emp or a Scrambler
-            - If we didn't move, and it still exists, it is likely still our target. In any case, we only have to search the same distance for alternatives
-            - If we didn't move and it doesn't exist, we can start our search starting at the same distance that we were from with the last target
-
-            If our target was information:
-            - If it still exists, we probably don't have to retarget, but at the very least, we only need to check the same ring
-            - If it no longer exists, our search for information units can start at the same distance, but the search for stationary units is unchanged
-
-            If we didn't have a target:
-            We can search the outer rim, and leave it at that
-
-
-            If we did move:
-            If our target was stationary:
-            - Our search for information units can be at the limit of the radius-1
-            - Our search for stationary units can be starting at the target at the last frame-1
-
-            If our target was information:
-            - Our search for information units starts at the distance last frame-2
-            - Our search for stationary units starts from the beginning
-
-            If we didn't have a target:
-            We can limit the search to radius-1
-
-
-            What we need to do to get_target:
-            - Limit search for information units to starting at a certain radius
-            - Limit search for stationary units starting at certain location
-            - Save distance from target last time
-            """
-            
-            info_start = 0
-            fire_start = 0
-
-            # Starting info and fire ranges
-            if unit.target == None:
-                info_start = unit.range+1
-                fire_start = unit.range+1
-            else:
-                if is_stationary(unit.target.unit_type):
-                    info_start = unit.range+1
-                    fire_start = unit.d_target
-                else:
-                    info_start = unit.d_target
-                    fire_start = 0
-
-
-            # Modify info and fire ranges
-
-            # If we moved, subtract 1 because we could have moved closer to units
-            if self.curr_frame % (1 / unit.speed) == 0:
-                info_start -= 1
-                fire_start -= 1
-
-            # If information units could have moved, subtract one because they could be closer
-            if self.curr_frame % 2 == 0:
-                info_start -= 1
-            
-            if info_start < unit.range or fire_start < unit.range:
-                target = game_state.get_target(unit, info_start, fire_start)
-            else:
-                target = None
-            
-            #target = game_state.get_target(unit)
-            #timme = time.clock()
-            #target = game_state.get_target(unit, 5, 5)
-            #gamelib.debug_write("Finding target took {}s".format(time.clock()-timme))
-
-            if target != None:
-                target.attack(unit.damage)
-                unit.d_target = game_map.distance_between_locations(unit.loc, target.loc)
-
-                if target.stability <= 0:
-                    removal_list.append(target)
-            else:
-                unit.d_target = 0
-                unit.target = None
-            #e_t = time.clock()
-
-            #gamelib.debug_write("Time for adding stationary: {}".format(mid_t-s_t))
-            #gamelib.debug_write("Time for finding a target: {}".format(e_t-mid_t))
+            self.attack_with(unit, removal_list)
+            for split in self.waiting.pop(unit, []):
+                self.attack_with(split, removal_list)
 
         #end_time = time.clock()
         #gamelib.debug_write("Time for information units: {}".format(end_time-start_time))
@@ -353,10 +565,11 @@ class Simulator:
             target = game_state.get_target(unit, info_start, fire_start)
 
             if target != None:
-                target.attack(unit.damage)
+                target = self.hit(target, unit.damage)
 
                 if target.stability <= 0:
                     removal_list.append(target)
+                    self.result.destroy(target)
 
         #end_time = time.clock()
         #gamelib.debug_write("Time for stationary units: {}".format(end_time-start_time))
@@ -370,51 +583,160 @@ class Simulator:
                     target.attack(unit.damage)
                     removal_list.append(target)
         """
+        self.unit_list.update(self.split_units)
+
         for unit in removal_list:
             if not is_stationary(unit.unit_type):
                 self.unit_list.remove(unit)
                 game_map[unit.x, unit.y].remove(unit)
+                spatial_index.remove(unit)
             else:
                 game_map[unit.loc].pop(0)
+                spatial_index.remove(unit)
+                if game_map.threat_map is not None:
+                    game_map.threat_map.remove(unit)
                 #gamelib.debug_write("Hey we actually destroyed a unit yay")
                 if unit.unit_type == ENCRYPTOR:
                     encryptor_list.remove(unit)
                 #gamelib.debug_write("Unit destroyed, re-pathing. Frame = {}, loc = {}".format(self.curr_frame, unit.loc))
-                new_loc = set()
-                new_loc.add(gamelib.Coord(unit.loc))
-                game_map.propogate_from_set(new_loc)
+                game_map.reopen(unit.loc)
                 #gamelib.debug_write("Done re-pathing")
                     
         if len(self.unit_list) == 0:
             self.finished = True
 
-    def idealness(self):
-        cores_on_board = [0, 0]
-        cores_in_storage = [self.game_state.get_resource(self.game_state.CORES, 0), self.game_state.get_resource(self.game_state.CORES, 1)] # This can be set now
-        bits_in_storage = [self.game_state.get_resource(self.game_state.BITS, 0), self.game_state.get_resource(self.game_state.CORES, 1)] # This can be set now
-        player_health = [self.game_state.my_health, self.game_state.enemy_health]
+    def attack_with(self, unit, removal_list):
+        """Every unit of a stack of information units attacks once
 
-        cores_on_board_weight = 0.75
-        cores_in_storage_weight = 1
-        bits_in_storage_weight = 0.5
-        player_health_weight = 2
+        The units of a stack start from the same targeting state, so a target is only searched for again once the
+        previous unit killed it. A target that survives stays the best choice: it lost stability and a stack that was
+        hit is split so the damaged unit comes first. Units that end up with different targets are split apart.
+        """
+        from .game_state import is_stationary
 
-        overall_score = [0, 0]
+        game_state = self.game_state
+        game_map = game_state.game_map
+        self.attacked.add(unit)
+
+        """
+        If we didn't move:
+        If our target was stationary:
+        - We might need to check for pings entering the radius, if this unit is an Emp or a Scrambler
+        - If we didn't move, and it still exists, it is likely still our target. In any case, we only have to search the same distance for alternatives
+        - If we didn't move and it doesn't exist, we can start our search starting at the same distance that we were from with the last target
+
+        If our target was information:
+        - If it still exists, we probably don't have to retarget, but at the very least, we only need to check the same ring
+        - If it no longer exists, our search for information units can start at the same distance, but the search for stationary units is unchanged
+
+        If we didn't have a target:
+        We can search the outer rim, and leave it at that
+
+
+        If we did move:
+        If our target was stationary:
+        - Our search for information units can be at the limit of the radius-1
+        - Our search for stationary units can be starting at the target at the last frame-1
+
+        If our target was information:
+        - Our search for information units starts at the distance last frame-2
+        - Our search for stationary units starts from the beginning
+
+        If we didn't have a target:
+        We can limit the search to radius-1
+
+
+        What we need to do to get_target:
+        - Limit search for information units to starting at a certain radius
+        - Limit search for stationary units starting at certain location
+        - Save distance from target last time
+        """
+
+        info_start = 0
+        fire_start = 0
+
+        # Starting info and fire ranges
+        if unit.target == None:
+            info_start = unit.range+1
+            fire_start = unit.range+1
+        else:
+            if is_stationary(unit.target.unit_type):
+                info_start = unit.range+1
+                fire_start = unit.d_target
+            else:
+                info_start = unit.d_target
+                fire_start = 0
+
+
+        # Modify info and fire ranges
+
+        # If we moved, subtract 1 because we could have moved closer to units
+        if self.curr_frame % (1 / unit.speed) == 0:
+            info_start -= 1
+            fire_start -= 1
+
+        # If information units could have moved, subtract one because they could be closer
+        if self.curr_frame % 2 == 0:
+            info_start -= 1
+
+        # The (target, d_target) each unit of the stack is left with
+        states = []
+        target = None
+        for _ in range(0, unit.count):
+            if target is None or target.stability <= 0:
+                if info_start < unit.range or fire_start < unit.range:
+                    target = game_state.get_target(unit, info_start, fire_start)
+                else:
+                    target = None
+
+            if target == None:
+                # Nothing changes for the rest of the stack either
+                states.extend([(None, 0)] * (unit.count - len(states)))
+                break
+
+            target = self.hit(target, unit.damage)
+            states.append((unit.target, game_map.distance_between_locations(unit.loc, target.loc)))
+
+            if target.stability <= 0:
+                removal_list.append(target)
+                self.result.destroy(target)
 
+        unit.target, unit.d_target = states[0]
+        for state in dict.fromkeys(states):
+            if state != states[0]:
+                split = self.split_unit(unit, states.count(state))
+                split.target, split.d_target = state
+                self.attacked.add(split)
+
+    def idealness(self, weights=None):
+        """The score of the board, read from the result once simulate() has run
+
+        Args:
+            * weights (dict): Weights for Simulator.score, SCORE_WEIGHTS if None
+        """
+        if self.result is not None:
+            return self.result.score(weights)
 
+        cores_on_board = [0, 0]
         for x in range(0, self.game_state.game_map.ARENA_SIZE):
             for y in range(0, self.game_state.game_map.ARENA_SIZE):
                 if self.game_state.game_map.in_arena_bounds([x, y]):
                     if self.game_state.contains_stationary_unit([x, y]):
                         cores_on_board[self.game_state.game_map[x, y][0].player_index] += self.game_state.game_map[x, y][0].cost
 
-        for i in range(0, 2):
-            overall_score[i] += cores_on_board[i] * cores_on_board_weight
-            overall_score[i] += cores_in_storage[i] * cores_in_storage_weight
-            overall_score[i] += bits_in_storage[i] * bits_in_storage_weight
-            overall_score[i] += player_health[i] * player_health_weight
+        return Simulator.score(cores_on_board, *self.stored_resources(), weights)
 
-        return overall_score[0] - overall_score[1]
+    def stored_resources(self):
+        """The cores in storage, bits in storage and health of both players, as idealness() counts them"""
+        cores_in_storage = [self.game_state.get_resource(self.game_state.CORES, 0), self.game_state.get_resource(self.game_state.CORES, 1)] # This can be set now
+        bits_in_storage = [self.game_state.get_resource(self.game_state.BITS, 0), self.game_state.get_resource(self.game_state.CORES, 1)] # This can be set now
+        player_health = [self.game_state.my_health, self.game_state.enemy_health]
+        return cores_in_storage, bits_in_storage, player_health
+
+    @staticmethod
+    def score(cores_on_board, cores_in_storage, bits_in_storage, player_health, weights=None):
+        """Weighs the resources and health of both players against each other, see weighted_score"""
+        return weighted_score(cores_on_board, cores_in_storage, bits_in_storage, player_health, weights)
 
 
 
@@ -444,6 +766,8 @@ class Storage:
         self.split_locs_5 = self.__parse_locs(self.locs_in_range_5)
 
         self.edges = self.__get_edges()
+
+        self.unit_stats = UnitStats(config)
         
         for x in range(0, 28+5):
 
@@ -470,6 +794,110 @@ class Storage:
 
                     self.arena_bounds[x].append(bottom_half_check or top_half_check)
 
+        self.__build_tile_tables()
+
+    def __build_tile_tables(self):
+        """Dense indices over the tiles inside the arena, used by the pathing engine"""
+        self.arena_tiles = []
+        self.tile_index = [[-1] * self.ARENA_SIZE for _ in range(0, self.ARENA_SIZE)]
+        for x in range(0, self.ARENA_SIZE):
+            for y in range(0, self.ARENA_SIZE):
+                if self.arena_bounds[x][y]:
+                    self.tile_index[x][y] = len(self.arena_tiles)
+                    self.arena_tiles.append([x, y])
+
+        self.arena_x = np.array([x for x, y in self.arena_tiles], dtype=np.intp)
+        self.arena_y = np.array([y for x, y in self.arena_tiles], dtype=np.intp)
+
+        # Neighbours in the order next_loc tries them: up, down, left, right
+        self.tile_neighbours = []
+        for x, y in self.arena_tiles:
+            neighbours = []
+            for nx, ny in [[x, y+1], [x, y-1], [x-1, y], [x+1, y]]:
+                if 0 <= nx < self.ARENA_SIZE and 0 <= ny < self.ARENA_SIZE and self.arena_bounds[nx][ny]:
+                    neighbours.append(self.tile_index[nx][ny])
+            self.tile_neighbours.append(neighbours)
+
+        # The same neighbours by direction, -1 where the step leaves the arena
+        self.tile_steps = np.full((len(self.arena_tiles), 4), -1, dtype=np.intp)
+        for tile, (x, y) in enumerate(self.arena_tiles):
+            for k, (nx, ny) in enumerate([[x, y+1], [x, y-1], [x-1, y], [x+1, y]]):
+                if 0 <= nx < self.ARENA_SIZE and 0 <= ny < self.ARENA_SIZE and self.arena_bounds[nx][ny]:
+                    self.tile_steps[tile, k] = self.tile_index[nx][ny]
+
+        # The tiles row by row, the order GameMap iterates over them
+        self.row_tiles = sorted(range(0, len(self.arena_tiles)), key=lambda tile: (self.arena_y[tile], self.arena_x[tile]))
+        self.row_locations = [self.arena_tiles[tile] for tile in self.row_tiles]
+
+        self.edge_tiles = [[self.tile_index[x][y] for x, y in edge] for edge in self.edges]
+
+        # Edge an information unit on each tile walks to, None off the edges. The last matching edge wins like in attempt_add
+        self.tile_path_target = [None] * len(self.arena_tiles)
+        for i, edge in enumerate(self.edge_tiles):
+            for tile in edge:
+                self.tile_path_target[tile] = (i + 2) % 4
+
+        # Edge tiles start with temp False for every edge, like the Nodes PathFinding makes for them
+        self.tile_default_temp = [True] * len(self.arena_tiles)
+        for edge in self.edge_tiles:
+            for tile in edge:
+                self.tile_default_temp[tile] = False
+
+        # Best tile of an unreachable region: highest y, then highest x for the right edges and lowest x for the left
+        x_value_less = [False, True, True, False]
+        self.pocket_priority = []
+        for i in range(0, 4):
+            x_key = self.ARENA_SIZE - 1 - self.arena_x if x_value_less[i] else self.arena_x
+            self.pocket_priority.append(self.arena_y * self.ARENA_SIZE + x_key)
+
+        self.tile_rings_3 = build_tile_rings(self, self.split_locs_3)
+        self.tile_rings_5 = build_tile_rings(self, self.split_locs_5)
+
+        # Every tile in range of each tile as one bit mask, the rings of the tile together
+        self.tile_reach_3 = []
+        self.tile_reach_5 = []
+        for rings_3, rings_5 in zip(self.tile_rings_3, self.tile_rings_5):
+            for reach, rings in [(self.tile_reach_3, rings_3), (self.tile_reach_5, rings_5)]:
+                mask = 0
+                for dist, ring_mask, ring_tiles in rings:
+                    mask |= ring_mask
+                reach.append(mask)
+
+        self.offset_tile_tables = {}
+
+        self.edge_masks = []
+        for edge in self.edge_tiles:
+            mask = 0
+            for tile in edge:
+                mask |= 1 << tile
+            self.edge_masks.append(mask)
+
+        self.field_cache = FieldCache(self)
+
+        # The Nodes of a PathFinding map that was not calculated yet, shared by new maps until they change them
+        self.blank_pathing = [[Node(x, y) for y in range(0, self.ARENA_SIZE)] for x in range(0, self.ARENA_SIZE)]
+
+
+    def offset_tiles(self, offsets):
+        """The dense tiles at the given [dx, dy] offsets from every tile
+
+        Returns:
+            A list indexed by dense tile of the tiles at the offsets that are in the arena, in the order of offsets.
+            Tables are kept, every simulator asking for the same offsets shares one.
+        """
+        key = tuple(tuple(offset) for offset in offsets)
+        table = self.offset_tile_tables.get(key)
+        if table is None:
+            table = []
+            for x, y in self.arena_tiles:
+                tiles = []
+                for dx, dy in key:
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < self.ARENA_SIZE and 0 <= ny < self.ARENA_SIZE and self.tile_index[nx][ny] >= 0:
+                        tiles.append(self.tile_index[nx][ny])
+                table.append(tiles)
+            self.offset_tile_tables[key] = table
+        return table
 
     def in_arena_bounds(self, loc):
         #x, y = loc
@@ -763,9 +1191,7 @@ class Simulator_2:
                 game_map[unit.loc].pop(0)
                 if unit.unit_type == ENCRYPTOR:
                     encryptor_list.remove(unit)
-                new_loc = set()
-                new_loc.add(gamelib.Coord(unit.loc))
-                game_map.propogate_from_set(new_loc)
+                game_map.propogate_from_set([game_map.storage.tile_index[unit.x][unit.y]])
 
         if len(self.unit_list) == 0:
             self.finished = True
@@ -946,9 +1372,7 @@ class Simulator_2:
                 if unit.unit_type == ENCRYPTOR:
                     encryptor_list.remove(unit)
                 #gamelib.debug_write("Unit destroyed, re-pathing. Frame = {}, loc = {}".format(self.curr_frame, unit.loc))
-                new_loc = set()
-                new_loc.add(gamelib.Coord(unit.loc))
-                game_map.propogate_from_set(new_loc)
+                game_map.propogate_from_set([game_map.storage.tile_index[unit.x][unit.y]])
                 #gamelib.debug_write("Done re-pathing")
                     
         if len(self.unit_list) == 0:
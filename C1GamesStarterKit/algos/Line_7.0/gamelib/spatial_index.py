@@ -0,0 +1,87 @@
+def build_tile_rings(storage, split_locs):
+    """The rings of split_locs around every arena tile, clipped to the arena
+
+    Args:
+        * storage: The Storage holding the dense tile tables
+        * split_locs: Offsets grouped into rings of equal distance, like Storage.split_locs_3
+
+    Returns:
+        A list indexed by dense tile of (ring distance, bit mask of the ring, dense tiles of the ring) tuples,
+        nearest ring first. The tiles keep the order of split_locs and rings with no tile in the arena are left out.
+    """
+    tile_index = storage.tile_index
+    size = storage.ARENA_SIZE
+
+    rings = []
+    for x, y in storage.arena_tiles:
+        tile_rings = []
+        for ring in split_locs:
+            tiles = []
+            for dx, dy in ring:
+                rx, ry = x + dx, y + dy
+                if 0 <= rx < size and 0 <= ry < size and tile_index[rx][ry] >= 0:
+                    tiles.append(tile_index[rx][ry])
+            if tiles:
+                mask = 0
+                for tile in tiles:
+                    mask |= 1 << tile
+                tile_rings.append((storage.distance_between_locations(ring[0]), mask, tiles))
+        rings.append(tile_rings)
+    return rings
+
+
+class SpatialIndex:
+    """Occupancy bitboards of a GameMap, one bit per dense arena tile
+
+    Bit t of information[p] is set while at least one information unit of player p stands on tile t,
+    bit t of firewalls[p] while a firewall of player p does. Units that are dead but still on the map count,
+    the index only tells which tiles are worth looking at.
+
+    The index has to be told about every unit that is added to, removed from or moved on the map.
+
+    Attributes:
+        * information (list): A bit mask of tiles with information units for each player
+        * firewalls (list): A bit mask of tiles with firewalls for each player
+
+    """
+    def __init__(self, game_map):
+        """Indexes every unit on the map
+
+        Args:
+            * game_map: A GameMap whose storage holds the dense tile tables
+        """
+        self.tile_index = game_map.storage.tile_index
+        self.counts = [[0] * len(game_map.storage.arena_tiles) for _ in range(0, 2)]
+        self.information = [0, 0]
+        self.firewalls = [0, 0]
+
+        for x, y in game_map.storage.arena_tiles:
+            for unit in game_map.map[x][y]:
+                self.add(unit)
+
+    def fork(self):
+        fork = SpatialIndex.__new__(SpatialIndex)
+        fork.tile_index = self.tile_index
+        fork.counts = [list(counts) for counts in self.counts]
+        fork.information = list(self.information)
+        fork.firewalls = list(self.firewalls)
+        return fork
+
+    def add(self, unit):
+        tile = self.tile_index[unit.x][unit.y]
+        player = unit.player_index
+        if unit.stationary:
+            self.firewalls[player] |= 1 << tile
+        else:
+            self.counts[player][tile] += 1
+            self.information[player] |= 1 << tile
+
+    def remove(self, unit):
+        tile = self.tile_index[unit.x][unit.y]
+        player = unit.player_index
+        if unit.stationary:
+            self.firewalls[player] &= ~(1 << tile)
+        else:
+            self.counts[player][tile] -= 1
+            if self.counts[player][tile] == 0:
+                self.information[player] &= ~(1 << tile)
@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+import threading
+import time
+
+
+class _Span:
+    """Times one with block and records it as an observation of its name"""
+    __slots__ = ["telemetry", "name", "start"]
+
+    def __init__(self, telemetry, name):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.telemetry.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class _NoSpan:
+    """The span handed out while telemetry is disabled, it does nothing"""
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Telemetry:
+    """Named spans, counters and histograms collected per turn.
+
+    Spans time a with block in milliseconds and are kept as histograms of their name, so a span entered many times
+    in a turn reports how often it ran, its total and its spread. AlgoCore.start opens a record when a turn starts
+    and writes it out when the next one does, so a record holds the turn and the action phase that follows it.
+    While disabled every method returns at once, instrumented code costs a function call and nothing more.
+    Only the thread that configured it records, work done on other threads like the Precomputer's is not counted
+    and cannot race the main thread for the counters.
+
+    The module level `telemetry` is the one gamelib records to. AlgoCore.start enables it when the GAMELIB_TELEMETRY
+    environment variable is set, to "stderr" for one summary line per turn or to a file path for one json object
+    per turn.
+
+    Attributes:
+        * enabled (bool): Whether anything is recorded
+        * output: Where records are written, "stderr" or the path of a JSONL file
+        * thread (int): Identifier of the thread that records, the one that called configure
+        * turn (int): The turn being recorded, None outside of a turn
+        * counters (dict): Name -> summed count in the current turn
+        * histograms (dict): Name -> list of the values observed in the current turn
+
+    """
+    def __init__(self):
+        self.enabled = False
+        self.output = None
+        self.thread = threading.get_ident()
+        self.turn = None
+        self.counters = {}
+        self.histograms = {}
+
+    def configure(self, output=None):
+        """Enables telemetry writing to output, "stderr" or a file path, or disables it if output is None"""
+        self.enabled = output is not None
+        self.output = output
+        self.thread = threading.get_ident()
+        self.turn = None
+        self.counters = {}
+        self.histograms = {}
+
+    def configure_from_env(self, variable="GAMELIB_TELEMETRY"):
+        value = os.environ.get(variable, "").strip()
+        self.configure(value or None)
+
+    def span(self, name):
+        """A context manager timing its block as an observation of name, in milliseconds"""
+        if not self.enabled or threading.get_ident() != self.thread:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def count(self, name, n=1):
+        if not self.enabled or threading.get_ident() != self.thread:
+            return
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        """Adds a value to the histogram of name"""
+        if not self.enabled or threading.get_ident() != self.thread:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            self.histograms[name] = [value]
+        else:
+            histogram.append(value)
+
+    def start_turn(self, turn):
+        """Writes out the record of the previous turn and starts recording turn"""
+        if not self.enabled:
+            return
+        self.end_turn()
+        self.turn = turn
+
+    def end_turn(self):
+        """Writes out the record of the current turn, if anything was recorded in it"""
+        if not self.enabled:
+            return
+        if self.counters or self.histograms:
+            self.write(self.summary())
+        self.turn = None
+        self.counters = {}
+        self.histograms = {}
+
+    def summary(self):
+        """The record of the current turn
+
+        Returns:
+            {"turn", "counters", "histograms"}, every histogram summarized as {"n", "total", "mean", "p50", "p90", "max"}
+        """
+        histograms = {}
+        for name, values in self.histograms.items():
+            ordered = sorted(values)
+            n = len(ordered)
+            histograms[name] = {"n": n, "total": round(sum(ordered), 3), "mean": round(sum(ordered) / n, 3),
+                                "p50": round(ordered[n // 2], 3), "p90": round(ordered[min(n - 1, int(n * 0.9))], 3),
+                                "max": round(ordered[-1], 3)}
+        return {"turn": self.turn, "counters": dict(self.counters), "histograms": histograms}
+
+    def write(self, record):
+        if self.output == "stderr":
+            parts = []
+            for name, h in record["histograms"].items():
+                if h["n"] == 1:
+                    parts.append("{} {:.1f}".format(name, h["total"]))
+                else:
+                    parts.append("{} {}x {:.1f} (p90 {:.1f}, max {:.1f})".format(name, h["n"], h["total"], h["p90"], h["max"]))
+            parts.extend("{}={}".format(name, value) for name, value in record["counters"].items())
+            sys.stderr.write("Telemetry turn {} (ms): {}\n".format(record["turn"], ", ".join(parts)))
+        else:
+            with open(self.output, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+telemetry = Telemetry()
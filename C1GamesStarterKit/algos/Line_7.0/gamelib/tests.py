@@ -1,136 +1,197 @@
 import unittest
+import contextlib
+import csv
+import io
 import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import importlib
+import numpy as np
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, unit_types, _unit_tables
 from .advanced_game_state import AdvancedGameState
+from .scheduler import SearchScheduler
+from .navigation import PathFinding
+from .spatial_index import SpatialIndex
+from .threat_map import ThreatMap
+from .estimator import AttackEstimator
+from .simulator import Simulator, Storage
+from .batch_simulator import BatchSimulator
+from . import parallel
+from .parallel import AttackPool
+from .simulation_result import SimulationResult
+from .turn_snapshot import TurnSnapshot
+from .telemetry import Telemetry
+from .profiler import SamplingProfiler
+from .precompute import Precomputer, cached, candidate_key
+
+CONFIG = """
+{
+    "debug":{
+        "printMapString":false,
+        "printTStrings":false,
+        "printActStrings":false,
+        "printHitStrings":false,
+        "printPlayerInputStrings":false,
+        "printBotErrors":false,
+        "printPlayerGetHitStrings":false
+    },
+    "unitInformation":[
+        {
+        "damage":0.0,
+        "cost":1,
+        "getHitRadius":0.51,
+        "display":"Filter",
+        "range":3.0,
+        "shorthand":"FF",
+        "stability":60.0
+        },
+        {
+        "damage":0.0,
+        "cost":4,
+        "getHitRadius":0.51,
+        "shieldAmount":10.0,
+        "display":"Encryptor",
+        "range":3.0,
+        "shorthand":"EF",
+        "stability":30.0
+        },
+        {
+        "damage":4.0,
+        "cost":3,
+        "getHitRadius":0.51,
+        "display":"Destructor",
+        "range":3.0,
+        "shorthand":"DF",
+        "stability":75.0
+        },
+        {
+        "damageI":1.0,
+        "damageToPlayer":1.0,
+        "cost":1.0,
+        "getHitRadius":0.51,
+        "damageF":1.0,
+        "display":"Ping",
+        "range":3.0,
+        "shorthand":"PI",
+        "stability":15.0,
+        "speed":0.5
+        },
+        {
+        "damageI":3.0,
+        "damageToPlayer":1.0,
+        "cost":3.0,
+        "getHitRadius":0.51,
+        "damageF":3.0,
+        "display":"EMP",
+        "range":5.0,
+        "shorthand":"EI",
+        "stability":5.0,
+        "speed":0.25
+        },
+        {
+        "damageI":10.0,
+        "damageToPlayer":1.0,
+        "cost":1.0,
+        "getHitRadius":0.51,
+        "damageF":0.0,
+        "display":"Scrambler",
+        "range":3.0,
+        "shorthand":"SI",
+        "stability":40.0,
+        "speed":0.25
+        },
+        {
+        "display":"Remove",
+        "shorthand":"RM"
+        }
+    ],
+    "timingAndReplay":{
+        "waitTimeBotMax":100000,
+        "waitTimeManual":1820000,
+        "waitForever":false,
+        "waitTimeBotSoft":70000,
+        "replaySave":0,
+        "storeBotTimes":true
+    },
+    "resources":{
+        "turnIntervalForBitCapSchedule":10,
+        "turnIntervalForBitSchedule":10,
+        "bitRampBitCapGrowthRate":5.0,
+        "roundStartBitRamp":10,
+        "bitGrowthRate":1.0,
+        "startingHP":30.0,
+        "maxBits":999999.0,
+        "bitsPerRound":5.0,
+        "coresPerRound":5.0,
+        "coresForPlayerDamage":1.0,
+        "startingBits":5.0,
+        "bitDecayPerRound":0.33333,
+        "startingCores":25.0
+    },
+    "mechanics":{
+        "basePlayerHealthDamage":1.0,
+        "damageGrowthBasedOnY":0.0,
+        "bitsCanStackOnDeployment":true,
+        "destroyOwnUnitRefund":0.5,
+        "destroyOwnUnitsEnabled":true,
+        "stepsRequiredSelfDestruct":5,
+        "selfDestructRadius":1.5,
+        "shieldDecayPerFrame":0.15,
+        "meleeMultiplier":0,
+        "destroyOwnUnitDelay":1,
+        "rerouteMidRound":true,
+        "firewallBuildTime":0
+    }
+}
+"""
+GAME_CONFIG = os.path.join(os.path.dirname(__file__), "..", "..", "..", "game-configs.json")
+ALGO = os.path.join(os.path.dirname(__file__), "..")
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "..", "..", "scripts")
+
+TURN_0 = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
+
+
+def make_strategy(config, **environ):
+    """An AlgoStrategy started on config with the given environment variables set while it starts"""
+    if ALGO not in sys.path:
+        sys.path.insert(0, ALGO)
+    strategy = importlib.import_module("algo_strategy").AlgoStrategy()
+    saved = os.environ.copy()
+    os.environ.update(environ)
+    try:
+        strategy.on_game_start(config, TURN_0)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    return strategy
+
+
+class GameTestCase(unittest.TestCase):
+    """Loads the game config and a Storage of its own for every test"""
+
+    def setUp(self):
+        with open(GAME_CONFIG) as f:
+            self.config = json.load(f)
+        self.storage = Storage(self.config)
+
+    def make_simulator(self, turn_state=TURN_0, array_board=False, firewalls=()):
+        """A Simulator of turn_state with firewalls, a list of (unit_type, location, player_index), on its map"""
+        simulator = Simulator(self.config, turn_state, self.storage, array_board)
+        for unit_type, location, player_index in firewalls:
+            simulator.game_state.game_map.add_unit(unit_type, location, player_index)
+        return simulator
+
 
 class BasicTests(unittest.TestCase):
 
     def make_turn_0_map(self, adv=False):
-        config = """
-        {
-            "debug":{
-                "printMapString":false,
-                "printTStrings":false,
-                "printActStrings":false,
-                "printHitStrings":false,
-                "printPlayerInputStrings":false,
-                "printBotErrors":false,
-                "printPlayerGetHitStrings":false
-            },
-            "unitInformation":[
-                {
-                "damage":0.0,
-                "cost":1,
-                "getHitRadius":0.51,
-                "display":"Filter",
-                "range":3.0,
-                "shorthand":"FF",
-                "stability":60.0
-                },
-                {
-                "damage":0.0,
-                "cost":4,
-                "getHitRadius":0.51,
-                "shieldAmount":10.0,
-                "display":"Encryptor",
-                "range":3.0,
-                "shorthand":"EF",
-                "stability":30.0
-                },
-                {
-                "damage":4.0,
-                "cost":3,
-                "getHitRadius":0.51,
-                "display":"Destructor",
-                "range":3.0,
-                "shorthand":"DF",
-                "stability":75.0
-                },
-                {
-                "damageI":1.0,
-                "damageToPlayer":1.0,
-                "cost":1.0,
-                "getHitRadius":0.51,
-                "damageF":1.0,
-                "display":"Ping",
-                "range":3.0,
-                "shorthand":"PI",
-                "stability":15.0,
-                "speed":0.5
-                },
-                {
-                "damageI":3.0,
-                "damageToPlayer":1.0,
-                "cost":3.0,
-                "getHitRadius":0.51,
-                "damageF":3.0,
-                "display":"EMP",
-                "range":5.0,
-                "shorthand":"EI",
-                "stability":5.0,
-                "speed":0.25
-                },
-                {
-                "damageI":10.0,
-                "damageToPlayer":1.0,
-                "cost":1.0,
-                "getHitRadius":0.51,
-                "damageF":0.0,
-                "display":"Scrambler",
-                "range":3.0,
-                "shorthand":"SI",
-                "stability":40.0,
-                "speed":0.25
-                },
-                {
-                "display":"Remove",
-                "shorthand":"RM"
-                }
-            ],
-            "timingAndReplay":{
-                "waitTimeBotMax":100000,
-                "waitTimeManual":1820000,
-                "waitForever":false,
-                "waitTimeBotSoft":70000,
-                "replaySave":0,
-                "storeBotTimes":true
-            },
-            "resources":{
-                "turnIntervalForBitCapSchedule":10,
-                "turnIntervalForBitSchedule":10,
-                "bitRampBitCapGrowthRate":5.0,
-                "roundStartBitRamp":10,
-                "bitGrowthRate":1.0,
-                "startingHP":30.0,
-                "maxBits":999999.0,
-                "bitsPerRound":5.0,
-                "coresPerRound":5.0,
-                "coresForPlayerDamage":1.0,
-                "startingBits":5.0,
-                "bitDecayPerRound":0.33333,
-                "startingCores":25.0
-            },
-            "mechanics":{
-                "basePlayerHealthDamage":1.0,
-                "damageGrowthBasedOnY":0.0,
-                "bitsCanStackOnDeployment":true,
-                "destroyOwnUnitRefund":0.5,
-                "destroyOwnUnitsEnabled":true,
-                "stepsRequiredSelfDestruct":5,
-                "selfDestructRadius":1.5,
-                "shieldDecayPerFrame":0.15,
-                "meleeMultiplier":0,
-                "destroyOwnUnitDelay":1,
-                "rerouteMidRound":true,
-                "firewallBuildTime":0
-            }
-        }
-        """
-        turn_0 = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
         if adv:
-            return AdvancedGameState(json.loads(config), turn_0)
-        return GameState(json.loads(config), turn_0)
+            return AdvancedGameState(json.loads(CONFIG), TURN_0)
+        return GameState(json.loads(CONFIG), TURN_0)
 
     def test_basic(self, adv=False):
         self.assertEqual(True, True, "It's the end of the world as we know it, and I feel fine")
@@ -240,3 +301,1004 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_bits(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} power {} turns from now, got {}".format(expected, turns, actual))
 
+
+class UnitTests(GameTestCase):
+
+    def test_shared_stats(self):
+        config = json.loads(CONFIG)
+        first = GameUnit("SI", config, 0, x=3, y=4)
+        second = GameUnit("SI", config, 1, x=5, y=6)
+        self.assertIs(first.type_stats, second.type_stats)
+        self.assertIs(first.type_stats, unit_types(config)["SI"])
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertEqual(first.config, config)
+
+    def test_tables_by_contents(self):
+        config = json.loads(CONFIG)
+        types = unit_types(config)
+        tables = len(_unit_tables)
+        for _ in range(0, 20):
+            self.assertIs(unit_types(json.loads(CONFIG)), types)
+        self.assertEqual(len(_unit_tables), tables)
+
+        changed = json.loads(CONFIG)
+        changed["unitInformation"][3]["stability"] = 20.0
+        self.assertEqual(unit_types(changed)["PI"].max_stability, 20.0)
+        self.assertEqual(types["PI"].max_stability, 15.0)
+
+    def test_placeholder_target(self):
+        outcomes = []
+        for own_placeholders in [False, True]:
+            simulator = self.make_simulator()
+            # Units with their own placeholders never stack, compare them unit by unit
+            simulator.stack_units = False
+            # Units added with an id start out with the shared placeholder target, the EMPs and scramblers fight
+            simulator.game_state.attempt_add("EI", [13, 27], 3, 1)
+            simulator.game_state.attempt_add("SI", [13, 0], 2, 0)
+            game_map = simulator.game_state.game_map
+            units = [unit for x, y in game_map for unit in game_map[x, y]]
+            self.assertTrue(all(unit.target is units[0].target for unit in units))
+            if own_placeholders:
+                # What every unit used to get, a scrambler of the other player on its own tile
+                for unit in units:
+                    unit.target = GameUnit("SI", self.config, 1 - unit.player_index, None, None, unit.x, unit.y)
+            simulator.simulate()
+            stabilities = sorted(unit.stability for unit in units)
+            self.assertLess(min(stabilities), 5)
+            outcomes.append((stabilities, simulator.game_state.my_health, simulator.game_state.enemy_health, simulator.idealness(), simulator.curr_frame))
+        self.assertEqual(outcomes[0], outcomes[1])
+
+    def test_clone(self):
+        config = json.loads(CONFIG)
+        unit = GameUnit("EF", config, 0, x=3, y=4)
+        clone = unit.clone()
+        clone.loc[0] = 7
+        clone.encryption.append(1)
+        clone.encrypted_IDs.append(2)
+        self.assertEqual(unit.loc, [3, 4])
+        self.assertEqual(unit.encryption, [])
+        self.assertEqual(unit.encrypted_IDs, [])
+        self.assertEqual(clone.max_stability, unit.max_stability)
+
+
+class TurnSnapshotTests(GameTestCase):
+
+    TURN = """{"p2Units":[[[13,20,60,"1"]],[],[[12,20,75,"2"]],[],[],[[13,27,15,"3"]],[[13,20,0,"4"]]],"turnInfo":[1,3,5],"p1Stats":[28.0,7.0,4.5,100],"p1Units":[[[3,13,60,"5"]],[],[],[[14,0,15,"6"]],[],[],[]],"p2Stats":[25.0,3.0,9.0,200],"events":{}}"""
+
+    def test_same_as_string(self):
+        snapshot = TurnSnapshot(self.config, self.TURN, self.storage)
+        parsed = GameState(self.config, self.TURN, self.storage)
+        built = GameState(self.config, snapshot, self.storage)
+        for game_state in [parsed, built]:
+            self.assertEqual(game_state.turn_number, 3)
+            self.assertEqual(game_state.get_resource(game_state.BITS, 1), 9.0)
+            self.assertEqual(game_state.unitID, 5)
+            self.assertTrue(game_state.game_map[13, 20][0].pending_removal)
+            self.assertEqual(game_state.game_map[14, 0][0].path_target, game_state.game_map.TOP_LEFT)
+            self.assertEqual(game_state.game_map[13, 27][0].path_target, game_state.game_map.BOTTOM_RIGHT)
+        self.assertEqual([(unit.id, unit.loc) for unit in parsed.units], [(unit.id, unit.loc) for unit in built.units])
+
+    def test_states_are_independent(self):
+        snapshot = TurnSnapshot(self.config, self.TURN, self.storage)
+        first = Simulator(self.config, snapshot, self.storage).game_state
+        second = Simulator(self.config, snapshot, self.storage).game_state
+        first.game_map[14, 0][0].stability = 1
+        self.assertEqual(second.game_map[14, 0][0].stability, 15)
+        self.assertIsNot(first.units[0], second.units[0])
+        self.assertEqual(snapshot.units.shape, (5, 4))
+
+    def test_next_turn(self):
+        snapshot = TurnSnapshot(self.config, self.TURN, self.storage)
+        self.assertFalse(snapshot.settled())
+        next_turn = snapshot.next_turn(self.storage)
+        self.assertTrue(next_turn.settled())
+        self.assertEqual(next_turn.turn_number, 4)
+        self.assertEqual(next_turn.removals, [])
+        self.assertEqual(next_turn.units.tolist(), [[0, 0, 3, 13], [2, 1, 12, 20]])
+        # The removed filter refunds destroyOwnUnitRefund, half its cost
+        self.assertEqual(next_turn.stats[1][:3], [25.0, 7.5, 11.0])
+        self.assertEqual(next_turn.stats[0][:3], [28.0, 11.0, 8.0])
+        self.assertNotEqual(next_turn.key(), snapshot.key())
+
+        self.config["mechanics"]["destroyOwnUnitRefund"] = 1.0
+        snapshot = TurnSnapshot(self.config, self.TURN, self.storage)
+        self.assertEqual(snapshot.next_turn(self.storage).stats[1][:3], [25.0, 8.0, 11.0])
+
+
+class ForkTests(GameTestCase):
+
+    def make_parent(self):
+        simulator = self.make_simulator(firewalls=[("FF", [2, 13], 0), ("DF", [3, 12], 0)])
+        simulator.game_state.attempt_add("PI", [14, 27], 8, 1)
+        simulator.calculate()
+        return simulator
+
+    def board(self, simulator):
+        game_state = simulator.game_state
+        game_map = game_state.game_map
+        units = [(x, y, unit.unit_type, unit.player_index, unit.stability) for x, y in game_map for unit in game_map[x, y]]
+        pathing = [(node.dist[:], node.temp[:]) for column in game_map.pathfinding_map for node in column]
+        resources = [game_state.get_resource(resource, i) for resource in [game_state.BITS, game_state.CORES] for i in range(2)]
+        return units, pathing, resources
+
+    def test_fork_leaves_parent(self):
+        parent = self.make_parent()
+        before = self.board(parent)
+
+        fork = parent.fork()
+        fork.game_state.attempt_spawn("FF", [24, 12])
+        fork.game_state.attempt_add("SI", [13, 0], 2, 0)
+        # A wall the pings have to walk around changes the pathing field
+        for x in range(4, 24):
+            fork.game_state.game_map.add_unit("FF", [x, 12], 0)
+        fork.calculate()
+        fork.simulate()
+        self.assertNotEqual(self.board(fork), before)
+        self.assertEqual(self.board(parent), before)
+
+        # The parent still simulates the board it was forked from
+        parent.simulate()
+        fresh = self.make_parent()
+        fresh.simulate()
+        self.assertEqual(self.board(parent), self.board(fresh))
+        self.assertEqual(parent.idealness(), fresh.idealness())
+
+    def test_evaluate(self):
+        parent = self.make_parent()
+        before = self.board(parent)
+        candidates = [("EI", [13, 27], 3, 1), ("SI", [13, 0], 2, 0)]
+        scores = parent.evaluate(candidates)
+        self.assertEqual(self.board(parent), before)
+
+        for candidate, idealness in zip(candidates, scores):
+            fresh = self.make_parent()
+            fresh.game_state.attempt_add(*candidate)
+            fresh.simulate()
+            self.assertEqual(idealness, fresh.idealness())
+
+
+class StackTests(GameTestCase):
+
+    def simulate(self, stack_units):
+        simulator = self.make_simulator()
+        simulator.stack_units = stack_units
+        # Two stacks of pings run into each other, so stacks are hit and split
+        simulator.game_state.attempt_add("PI", [14, 27], 12, 1)
+        simulator.game_state.attempt_add("PI", [13, 0], 10, 0)
+        simulator.simulate()
+        return simulator
+
+    def test_same_as_single_units(self):
+        stacked = self.simulate(True)
+        single = self.simulate(False)
+        self.assertEqual(stacked.game_state.my_health, single.game_state.my_health)
+        self.assertEqual(stacked.game_state.enemy_health, single.game_state.enemy_health)
+        self.assertEqual(stacked.idealness(), single.idealness())
+        self.assertEqual(stacked.curr_frame, single.curr_frame)
+
+    def test_stack_unit_list(self):
+        simulator = self.make_simulator()
+        simulator.game_state.attempt_add("PI", [13, 27], 5, 1)
+        simulator.game_state.attempt_add("EI", [13, 27], 2, 1)
+        simulator.unit_list.update(simulator.game_state.game_map[13, 27])
+        simulator.stack_unit_list()
+        self.assertEqual(sorted((unit.unit_type, unit.count) for unit in simulator.unit_list), [("EI", 2), ("PI", 5)])
+        self.assertEqual(len(simulator.game_state.game_map[13, 27]), 2)
+
+
+class FrameSkipTests(GameTestCase):
+
+    def simulate(self, skip_idle_frames):
+        simulator = self.make_simulator()
+        simulator.skip_idle_frames = skip_idle_frames
+        # EMPs and scramblers fight where they meet and walk alone for the rest of the phase
+        simulator.game_state.attempt_add("EI", [13, 27], 3, 1)
+        simulator.game_state.attempt_add("SI", [13, 0], 2, 0)
+        simulator.simulate()
+        return simulator
+
+    def test_same_as_every_frame(self):
+        skipping = self.simulate(True)
+        every_frame = self.simulate(False)
+        self.assertEqual(skipping.game_state.my_health, every_frame.game_state.my_health)
+        self.assertEqual(skipping.game_state.enemy_health, every_frame.game_state.enemy_health)
+        self.assertEqual(skipping.idealness(), every_frame.idealness())
+        self.assertEqual(skipping.curr_frame, every_frame.curr_frame)
+
+    def test_next_event_frame(self):
+        simulator = self.make_simulator()
+        simulator.game_state.attempt_add("EI", [13, 27], 1, 1)
+        simulator.unit_list.update(simulator.game_state.game_map[13, 27])
+        self.assertEqual(simulator.next_event_frame(), 1)
+        simulator.hits = 0
+        self.assertEqual(simulator.next_event_frame(), 4)
+        simulator.curr_frame = 4
+        self.assertEqual(simulator.next_event_frame(), 8)
+        simulator.hits = 1
+        self.assertEqual(simulator.next_event_frame(), 5)
+
+
+class CloseOutcomeTests(GameTestCase):
+
+    def simulate(self, close_early, firewall=None):
+        simulator = self.make_simulator()
+        simulator.close_early = close_early
+        if firewall is not None:
+            simulator.game_state.game_map.add_unit("DF", firewall, 0)
+        simulator.game_state.attempt_add("EI", [13, 27], 3, 1)
+        simulator.game_state.attempt_add("PI", [14, 27], 4, 1)
+        simulator.simulate()
+        return simulator
+
+    def test_same_as_every_frame(self):
+        for firewall in [None, [3, 12]]:
+            closed = self.simulate(True, firewall)
+            every_frame = self.simulate(False, firewall)
+            self.assertEqual(closed.game_state.my_health, every_frame.game_state.my_health)
+            self.assertEqual(closed.game_state.enemy_health, every_frame.game_state.enemy_health)
+            self.assertEqual(closed.idealness(), every_frame.idealness())
+            self.assertEqual(closed.curr_frame, every_frame.curr_frame)
+
+    def test_close_outcome(self):
+        simulator = self.make_simulator()
+        simulator.game_state.attempt_add("PI", [14, 27], 4, 1)
+        simulator.unit_list.update(simulator.game_state.game_map[14, 27])
+        simulator.game_state.game_map.calculate()
+        simulator.game_state.game_map.spatial_index = SpatialIndex(simulator.game_state.game_map)
+        simulator.result = SimulationResult()
+        simulator.hits = 0
+        self.assertTrue(simulator.close_outcome())
+        self.assertEqual(simulator.game_state.my_health, 26)
+        self.assertEqual(simulator.result.breaches, [0, 0, 4, 0])
+        self.assertEqual(len(simulator.unit_list), 0)
+
+    def test_opponent_in_range(self):
+        simulator = self.make_simulator()
+        simulator.game_state.game_map.add_unit("DF", [3, 12], 0)
+        simulator.game_state.attempt_add("PI", [14, 27], 4, 1)
+        simulator.unit_list.update(simulator.game_state.game_map[14, 27])
+        simulator.game_state.game_map.calculate()
+        simulator.game_state.game_map.spatial_index = SpatialIndex(simulator.game_state.game_map)
+        simulator.result = SimulationResult()
+        simulator.hits = 0
+        self.assertFalse(simulator.close_outcome())
+        self.assertEqual(len(simulator.unit_list), 4)
+
+
+class SimulationResultTests(GameTestCase):
+
+    def simulate(self, array_board=False):
+        simulator = self.make_simulator(array_board=array_board, firewalls=[("FF", [2, 13], 0), ("DF", [3, 12], 0), ("FF", [20, 20], 1)])
+        simulator.game_state.attempt_add("PI", [14, 27], 8, 1)
+        return simulator, simulator.simulate()
+
+    def test_result(self):
+        simulator, result = self.simulate()
+        self.assertIs(result, simulator.result)
+        self.assertEqual(sum(result.breaches), 30 - simulator.game_state.my_health)
+        self.assertEqual(result.breaches[0] + result.breaches[1] + result.breaches[3], 0)
+        self.assertEqual(sum(result.breaches) + result.self_destructs[1] + result.information_destroyed[1], 8)
+        self.assertEqual(set(result.firewall_damage), {(2, 13), (3, 12)})
+        self.assertEqual(result.cores_destroyed[1], 0)
+        self.assertEqual(result.cores_on_board[0] + result.cores_destroyed[0], 1 + 3)
+        self.assertEqual(result.frames, simulator.curr_frame)
+
+    def test_score_same_as_board(self):
+        for array_board in [False, True]:
+            simulator, result = self.simulate(array_board)
+            simulator.result = None
+            self.assertEqual(result.score(), simulator.idealness())
+            weights = {"cores_on_board": 1, "cores_in_storage": 0, "bits_in_storage": 0, "player_health": 0}
+            self.assertEqual(result.score(weights), result.cores_on_board[0] - result.cores_on_board[1])
+
+
+class ArrayBoardTests(GameTestCase):
+
+    def simulate(self, array_board, firewalls, units):
+        simulator = self.make_simulator(array_board=array_board, firewalls=firewalls)
+        for unit_type, location, num, player_index in units:
+            simulator.game_state.attempt_add(unit_type, location, num, player_index)
+        simulator.simulate()
+        game_map = simulator.game_state.game_map
+        firewalls = sorted((x, y, unit.stability) for x, y in self.storage.arena_tiles for unit in game_map[x, y] if unit.stationary)
+        return (simulator.game_state.my_health, simulator.game_state.enemy_health, simulator.idealness(), firewalls,
+                simulator.curr_frame)
+
+    def test_same_as_simulator(self):
+        # Information units meet each other and encryptors, but never pass a filter or destructor
+        boards = [
+            ([], [("PI", [14, 27], 8, 1)]),
+            ([("EF", [12, 25], 1)], [("PI", [14, 27], 5, 1)]),
+            ([("FF", [12, 12], 0)], [("PI", [14, 27], 6, 1), ("SI", [13, 0], 2, 0)]),
+            ([("FF", [2, 13], 0)], [("EI", [13, 27], 3, 1)]),
+        ]
+        for firewalls, units in boards:
+            self.assertEqual(self.simulate(True, firewalls, units), self.simulate(False, firewalls, units))
+
+    def test_apply_to_keeps_indexes(self):
+        simulator = self.make_simulator(array_board=True)
+        game_map = simulator.game_state.game_map
+        game_map.add_unit("DF", [3, 12], 0)
+        game_map.add_unit("DF", [20, 20], 1)
+        simulator.game_state.attempt_add("PI", [14, 27], 8, 1)
+        game_map.threat_map = ThreatMap.from_game_map(game_map)
+        game_map.spatial_index = SpatialIndex(game_map)
+        simulator.simulate()
+
+        self.assertEqual(len(game_map[3, 12]), 0)
+        fresh = ThreatMap.from_game_map(game_map)
+        self.assertEqual(game_map.threat_map.coverage.tolist(), fresh.coverage.tolist())
+        self.assertEqual(game_map.threat_map.damage.tolist(), fresh.damage.tolist())
+        fresh = SpatialIndex(game_map)
+        self.assertEqual((game_map.spatial_index.information, game_map.spatial_index.firewalls), (fresh.information, fresh.firewalls))
+
+    def test_destructors_fire(self):
+        # The destructor shoots two of the pings before they take it down, the Simulator's never fires
+        board = ([("DF", [3, 12], 0)], [("PI", [14, 27], 8, 1)])
+        health, _, _, firewalls, _ = self.simulate(True, *board)
+        self.assertEqual(health, 24)
+        self.assertEqual(firewalls, [])
+        health, _, _, firewalls, _ = self.simulate(False, *board)
+        self.assertEqual(health, 22)
+        self.assertEqual(firewalls, [(3, 12, 51.0)])
+
+
+class BatchSimulatorTests(GameTestCase):
+
+    FIREWALLS = [("FF", [2, 13], 0), ("DF", [3, 12], 0), ("EF", [12, 25], 1), ("FF", [20, 20], 1)]
+    CANDIDATES = [("PI", [14, 27], 8, 1), ("EI", [13, 27], 3, 1), ("SI", [4, 18], 5, 1), ("PI", [13, 0], 6, 0)]
+
+    def simulate_batch(self):
+        batch = BatchSimulator(self.make_simulator(firewalls=self.FIREWALLS), [[candidate] for candidate in self.CANDIDATES])
+        # Padding slots must not divide by their zero period
+        with np.errstate(all="raise"):
+            batch.simulate()
+        return batch
+
+    def test_same_as_array_board(self):
+        batch = self.simulate_batch()
+        for candidate, idealness in zip(self.CANDIDATES, batch.idealness()):
+            simulator = self.make_simulator(array_board=True, firewalls=self.FIREWALLS)
+            simulator.game_state.attempt_add(*candidate)
+            simulator.simulate()
+            self.assertAlmostEqual(idealness, simulator.idealness(), places=4)
+
+    def test_spent(self):
+        # Charged like attempt_add, which takes every spawn from player 0
+        batch = self.simulate_batch()
+        self.assertEqual(batch.spent.tolist(), [8, 9, 5, 6])
+
+    def test_opt_in(self):
+        # The attack search ranks with the Simulator unless it is asked for the batch
+        base = self.make_simulator(firewalls=self.FIREWALLS)
+        base.calculate()
+        scores = make_strategy(self.config).simulate_attacks(base, self.CANDIDATES)
+        for candidate, idealness in zip(self.CANDIDATES, scores):
+            simulator = self.make_simulator(firewalls=self.FIREWALLS)
+            simulator.game_state.attempt_add(*candidate)
+            simulator.simulate()
+            self.assertAlmostEqual(idealness, simulator.idealness())
+
+        batch_scores = make_strategy(self.config, GAMELIB_BATCH_ATTACKS="1").simulate_attacks(base, self.CANDIDATES)
+        self.assertEqual(batch_scores, self.simulate_batch().idealness())
+        # The destructor shoots at the pings in the batch only
+        self.assertNotAlmostEqual(batch_scores[0], scores[0])
+
+    def test_destructors_fire(self):
+        # The batch follows the ArrayBoard rules, the destructor shoots pings the GameUnit Simulator lets through
+        batch = self.simulate_batch()
+        simulator = self.make_simulator(firewalls=self.FIREWALLS)
+        simulator.game_state.attempt_add(*self.CANDIDATES[0])
+        simulator.simulate()
+        self.assertLess(batch.health[0, 0], 30)
+        self.assertGreater(batch.health[0, 0], simulator.game_state.my_health)
+
+
+class AttackPoolTests(GameTestCase):
+
+    # Player 0 holds a filter and a destructor, player 1 an encryptor
+    TURN = """{"p2Units":[[],[[12,25,30,"3"]],[],[],[],[],[]],"turnInfo":[0,1,-1],"p1Stats":[30.0,21.0,5.0,0],"p1Units":[[[2,13,60,"1"]],[],[[3,12,75,"2"]],[],[],[],[]],"p2Stats":[30.0,21.0,5.0,0],"events":{}}"""
+
+    def test_same_as_in_process(self):
+        candidates = BatchSimulatorTests.CANDIDATES
+
+        expected = []
+        for candidate in candidates:
+            simulator = self.make_simulator(self.TURN)
+            simulator.game_state.attempt_add(*candidate)
+            simulator.simulate()
+            expected.append(simulator.idealness())
+        batch = BatchSimulator(self.make_simulator(self.TURN), [[candidate] for candidate in candidates])
+        batch.simulate()
+
+        for use_batch, scores in [(False, expected), (True, batch.idealness())]:
+            pool = AttackPool(self.config, self.storage, 2, use_batch)
+            try:
+                self.assertEqual(pool.evaluate(self.TURN, candidates), scores)
+                self.assertEqual(pool.evaluate(self.TURN, []), [])
+            finally:
+                pool.close()
+
+    def test_parses_turn_once(self):
+        candidates = BatchSimulatorTests.CANDIDATES
+        parallel._init_worker(self.config, self.storage, False)
+        try:
+            first = parallel._evaluate_chunk((self.TURN, candidates[:2]))
+            simulator = parallel._worker_simulator
+            second = parallel._evaluate_chunk((self.TURN, candidates[2:]))
+            self.assertIs(parallel._worker_simulator, simulator)
+            self.assertEqual(first + second, parallel._evaluate_chunk((self.TURN, candidates)))
+
+            parallel._evaluate_chunk((TURN_0, candidates[:1]))
+            self.assertIsNot(parallel._worker_simulator, simulator)
+        finally:
+            parallel._init_worker(None, None, False)
+            parallel._worker_turn = parallel._worker_simulator = None
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def make_scheduler(self, budget):
+        scheduler = SearchScheduler({"timingAndReplay": {"waitTimeBotSoft": 5000}}, chunk_size=2)
+        scheduler.budget = budget
+        scheduler.start_turn()
+        return scheduler
+
+    def test_budget_from_config(self):
+        scheduler = SearchScheduler({"timingAndReplay": {"waitTimeBotSoft": 5000}}, fraction=0.5)
+        self.assertAlmostEqual(scheduler.budget, 2.5)
+
+    def test_best_first(self):
+        scheduler = self.make_scheduler(10)
+        evaluated = []
+        def evaluate(chunk):
+            evaluated.extend(chunk)
+            return [-candidate for candidate in chunk]
+        results, skipped = scheduler.search([3, 1, 4, 2], lambda candidate: candidate, evaluate)
+        self.assertEqual(evaluated, [4, 3, 2, 1])
+        self.assertEqual(results, [(-1, 1), (-2, 2), (-3, 3), (-4, 4)])
+        self.assertEqual(skipped, 0)
+
+    def test_limit(self):
+        scheduler = self.make_scheduler(10)
+        estimated = []
+        def heuristic(candidate):
+            estimated.append(candidate)
+            return candidate
+        results, skipped = scheduler.search([3, 1, 4, 2, 5], heuristic, lambda chunk: chunk, 3)
+        self.assertEqual(results, [(5, 5), (4, 4), (3, 3)])
+        self.assertEqual(skipped, 0)
+        # Every candidate is estimated once, including the ones left out
+        self.assertEqual(sorted(estimated), [1, 2, 3, 4, 5])
+
+    def test_stops_at_budget(self):
+        scheduler = self.make_scheduler(0)
+        results, skipped = scheduler.search([1, 2, 3], lambda candidate: candidate, lambda chunk: chunk)
+        self.assertEqual(results, [])
+        self.assertEqual(skipped, 3)
+
+
+class TelemetryTests(unittest.TestCase):
+
+    def test_disabled(self):
+        telemetry = Telemetry()
+        with telemetry.span("parse"):
+            telemetry.count("frames", 3)
+        telemetry.observe("simulate", 1.0)
+        self.assertEqual(telemetry.histograms, {})
+        self.assertEqual(telemetry.counters, {})
+
+    def test_turn_record(self):
+        records = []
+        telemetry = Telemetry()
+        telemetry.configure("stderr")
+        telemetry.write = records.append
+        telemetry.start_turn(1)
+        for value in [1.0, 2.0, 3.0]:
+            telemetry.observe("simulate", value)
+        telemetry.count("frames", 3)
+        telemetry.count("frames", 4)
+        with telemetry.span("parse"):
+            pass
+        telemetry.start_turn(2)
+        telemetry.end_turn()
+
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record["turn"], 1)
+        self.assertEqual(record["counters"], {"frames": 7})
+        self.assertEqual(record["histograms"]["simulate"], {"n": 3, "total": 6.0, "mean": 2.0, "p50": 2.0, "p90": 3.0, "max": 3.0})
+        self.assertEqual(record["histograms"]["parse"]["n"], 1)
+
+    def test_other_threads(self):
+        telemetry = Telemetry()
+        telemetry.configure("stderr")
+        def work():
+            with telemetry.span("simulate"):
+                telemetry.count("frames", 3)
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        telemetry.count("frames")
+        self.assertEqual(telemetry.counters, {"frames": 1})
+        self.assertEqual(telemetry.histograms, {})
+
+
+class PrecomputeTests(GameTestCase):
+
+    def test_take(self):
+        precomputer = Precomputer(chunk_size=2)
+        candidates = [("PI", [x, 14 + x], 1, 1) for x in range(0, 5)]
+        precomputer.start("turn", lambda: (candidates, lambda chunk: [candidate[1][0] for candidate in chunk]))
+        precomputer.thread.join()
+        results = precomputer.take("turn")
+        self.assertEqual(results[("PI", (3, 17), 1, 1)], 3)
+        self.assertEqual(len(results), 5)
+
+        precomputer.start("turn", lambda: (candidates, lambda chunk: [0 for candidate in chunk]))
+        precomputer.thread.join()
+        self.assertEqual(precomputer.take("another turn"), {})
+
+    def test_same_turn_not_restarted(self):
+        precomputer = Precomputer(chunk_size=2)
+        candidates = [("PI", [x, 14 + x], 1, 1) for x in range(0, 5)]
+        precomputer.start("turn", lambda: (candidates, lambda chunk: [1 for candidate in chunk]))
+        thread = precomputer.thread
+        precomputer.start("turn", lambda: (candidates, lambda chunk: [2 for candidate in chunk]))
+        self.assertIs(precomputer.thread, thread)
+        thread.join()
+        self.assertEqual(set(precomputer.take("turn").values()), {1})
+
+    def test_alongside_parse(self):
+        strategy = make_strategy(self.config, GAMELIB_PRECOMPUTE="1")
+        self.assertIsNot(strategy.precompute_storage, strategy.storage)
+
+        # The last frame of an action phase, nothing moves any more and the worker starts on the next turn
+        settled = AttackPoolTests.TURN.replace('"turnInfo":[0,1,-1]', '"turnInfo":[1,1,12]')
+        strategy.parse_action_phase(settled)
+        # Meanwhile the main thread parses frames and paths new layouts through its own FieldCache
+        for x in range(0, 16):
+            frame = json.loads(settled)
+            frame["p1Units"][0].append([x, 13, 60, "9"])
+            frame["p1Units"][3].append([14, x % 4, 15, "8"])
+            frame = json.dumps(frame)
+            strategy.parse_action_phase(frame)
+            Simulator(self.config, frame, strategy.storage).calculate()
+        strategy.precomputer.thread.join()
+
+        next_turn = TurnSnapshot(self.config, settled, strategy.storage).next_turn(strategy.storage)
+        results = strategy.precomputer.take(next_turn.key())
+        self.assertEqual(len(results), strategy.attack_top_k)
+        self.assertGreater(strategy.precompute_storage.field_cache.misses, 0)
+
+        base_simul = self.make_simulator(next_turn)
+        base_simul.calculate()
+        candidates = [(unit_type, list(location), num, player_index) for unit_type, location, num, player_index in results]
+        for candidate, idealness in zip(candidates, strategy.simulate_attacks(base_simul, candidates)):
+            self.assertAlmostEqual(results[candidate_key(candidate)], idealness, places=6)
+
+    def test_cached(self):
+        evaluated = []
+        def evaluate(chunk):
+            evaluated.extend(chunk)
+            return [candidate[2] for candidate in chunk]
+        chunk = [("PI", [0, 14], 1, 1), ("EI", [0, 14], 2, 1)]
+        self.assertEqual(cached({("PI", (0, 14), 1, 1): 7}, evaluate)(chunk), [7, 2])
+        self.assertEqual(evaluated, [chunk[1]])
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def busy_turn(self, seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    def test_turn_stacks(self):
+        with tempfile.TemporaryDirectory() as output:
+            profiler = SamplingProfiler(output, interval=0.001)
+            profiler.set_config({"timingAndReplay": {"waitTimeBotSoft": 100}})
+            profiler.start_turn(3)
+            self.busy_turn(0.1)
+            profiler.end_turn()
+            profiler.finish()
+
+            with open(os.path.join(output, "turn_3.folded")) as f:
+                lines = f.read().splitlines()
+            self.assertGreater(len(lines), 0)
+            # The most sampled stack comes first
+            self.assertTrue(lines[0].rsplit(" ", 1)[0].endswith("tests.py:test_turn_stacks;tests.py:busy_turn"))
+            with open(os.path.join(output, "summary.txt")) as f:
+                summary = f.read()
+            self.assertTrue(summary.startswith("turn 3 "))
+            self.assertIn("SLOW", summary)
+
+    def test_disabled(self):
+        profiler = SamplingProfiler()
+        profiler.start_turn(0)
+        self.assertIsNone(profiler.thread)
+        profiler.end_turn()
+        profiler.finish()
+
+
+class PathingTests(GameTestCase):
+
+    def make_map(self, filters):
+        game_map = PathFinding(self.config, self.storage)
+        for location in filters:
+            game_map.add_unit("FF", location)
+        game_map.calculate()
+        return game_map
+
+    def test_edges(self):
+        game_map = self.make_map([])
+        self.assertEqual(game_map.pathfinding_map[14][27].dist[0], 1)
+        self.assertEqual(game_map.pathfinding_map[13][27].dist[1], 1)
+        self.assertEqual(game_map.pathfinding_map[13][0].dist[2], 1)
+        self.assertEqual(game_map.pathfinding_map[13][0].dist[0], 29)
+        self.assertEqual(game_map.pathfinding_map[13][13].temp, [False] * 4)
+
+    def test_pocket(self):
+        game_map = self.make_map([[12, 10], [14, 10], [13, 9], [13, 11]])
+        node = game_map.pathfinding_map[13][10]
+        self.assertEqual(node.dist, [1] * 4)
+        self.assertEqual(node.temp, [True] * 4)
+
+    def test_reopen(self):
+        game_map = self.make_map([[12, 10], [14, 10], [13, 9], [13, 11], [5, 10], [6, 10]])
+        for location in ([13, 11], [5, 10]):
+            game_map.remove_unit(location)
+            game_map.reopen(location)
+            self.assertEqual(game_map.check_field(), 0)
+        self.assertEqual(game_map.pathfinding_map[13][10].temp, [False] * 4)
+
+    def field(self, game_map):
+        return [(node.dist[:], node.temp[:]) for column in game_map.pathfinding_map for node in column]
+
+    def test_reopen_same_as_calculate(self):
+        # A wall with one gap, then a pocket, opened a tile at a time
+        filters = [[x, 12] for x in range(2, 26) if x != 20] + [[12, 10], [14, 10], [13, 9]]
+        game_map = self.make_map(filters)
+        changed = 0
+        for location in ([7, 12], [13, 9], [8, 12], [2, 12], [25, 12], [12, 10]):
+            before = self.field(game_map)
+            game_map.remove_unit(location)
+            game_map.reopen(location)
+            filters.remove(location)
+            self.assertEqual(self.field(game_map), self.field(self.make_map(filters)))
+            changed += self.field(game_map) != before
+        self.assertGreater(changed, 0)
+
+    def test_field_cache(self):
+        game_map = self.make_map([[13, 11]])
+        cache = game_map.storage.field_cache
+        cache.size = 1
+        game_map.calculate()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        game_map.remove_unit([13, 11])
+        game_map.calculate()
+        game_map.add_unit("FF", [13, 11])
+        game_map.calculate()
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertEqual(game_map.check_field(), 0)
+
+    def test_field_cache_collision(self):
+        game_map = self.make_map([[13, 11]])
+        cache = game_map.storage.field_cache
+        # Every layout hashes to the same value
+        cache.keys = [0] * len(cache.keys)
+        cache.clear()
+        game_map.calculate()
+        game_map.remove_unit([13, 11])
+        game_map.calculate()
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(len(cache.fields), 1)
+        self.assertEqual(game_map.check_field(), 0)
+
+    def test_next_loc(self):
+        game_map = self.make_map([])
+        unit = GameUnit("PI", game_map.config, 0, None, None, 13, 0)
+        unit.path_target = 0
+        self.assertEqual(game_map.next_loc(unit), [13, 1])
+        unit.next_dir_up = False
+        self.assertEqual(game_map.next_loc(unit), [14, 0])
+
+        game_map = self.make_map([[13, 1], [14, 1], [14, 0]])
+        self.assertEqual(game_map.next_loc(unit), unit.loc)
+        game_map.remove_unit([14, 0])
+        game_map.reopen([14, 0])
+        self.assertEqual(game_map.next_loc(unit), [14, 0])
+
+
+class SpatialIndexTests(GameTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game_map = PathFinding(self.config, self.storage)
+
+    def bit(self, x, y):
+        return 1 << self.storage.tile_index[x][y]
+
+    def test_occupancy(self):
+        self.game_map.add_unit("DF", [13, 13], 0)
+        self.game_map.add_unit("PI", [13, 14], 1)
+        self.game_map.add_unit("PI", [13, 14], 1)
+        index = SpatialIndex(self.game_map)
+        self.assertEqual(index.firewalls, [self.bit(13, 13), 0])
+        self.assertEqual(index.information, [0, self.bit(13, 14)])
+
+        pings = self.game_map[13, 14]
+        index.remove(pings[0])
+        self.assertEqual(index.information, [0, self.bit(13, 14)])
+        index.remove(pings[1])
+        self.assertEqual(index.information, [0, 0])
+
+    def test_rings_clipped(self):
+        rings = self.storage.tile_rings_3[self.storage.tile_index[13][0]]
+        self.assertEqual(rings[0][0], 0)
+        self.assertEqual(rings[0][2], [self.storage.tile_index[13][0]])
+        for dist, mask, tiles in rings:
+            self.assertLess(dist, 3.51)
+            for tile in tiles:
+                x, y = self.storage.arena_tiles[tile]
+                self.assertTrue(self.storage.in_arena_bounds([x, y]))
+                self.assertTrue(mask & (1 << tile))
+
+    def test_offset_tiles(self):
+        tile_index = self.storage.tile_index
+        table = self.storage.offset_tiles([[0, 1], [1, 0], [-1, 0]])
+        self.assertEqual(table[tile_index[13][0]], [tile_index[13][1], tile_index[14][0]])
+        self.assertEqual(table[tile_index[14][27]], [tile_index[13][27]])
+        self.assertIs(self.storage.offset_tiles([[0, 1], [1, 0], [-1, 0]]), table)
+
+    def test_row_order(self):
+        locations = list(self.game_map)
+        self.assertEqual(len(locations), len(self.storage.arena_tiles))
+        self.assertEqual(locations[0], [13, 0])
+        self.assertEqual(locations[-1], [14, 27])
+        self.assertEqual(locations, sorted(locations, key=lambda location: (location[1], location[0])))
+        self.game_map.add_unit("DF", [3, 12], 0)
+        self.assertIs(self.game_map.tile_units(self.storage.tile_index[3][12]), self.game_map[3, 12])
+
+
+class ThreatMapTests(GameTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game_map = PathFinding(self.config, self.storage)
+        self.game_map.threat_map = ThreatMap(self.game_map.storage)
+
+    def test_coverage(self):
+        self.game_map.add_unit("DF", [13, 13], 1)
+        self.game_map.add_unit("DF", [14, 13], 1)
+        threat_map = self.game_map.threat_map
+        self.assertEqual(threat_map.attackers([13, 10], 0), 2)
+        self.assertEqual(threat_map.attackers([11, 11], 0), 1)
+        self.assertEqual(threat_map.attackers([13, 10], 1), 0)
+
+        self.game_map.remove_unit([14, 13])
+        self.assertEqual(threat_map.attackers([13, 10], 0), 1)
+        self.game_map.add_unit("FF", [13, 13], 1)
+        self.assertEqual(threat_map.attackers([13, 10], 0), 0)
+
+    def test_path_damage(self):
+        self.game_map.add_unit("DF", [13, 13], 1)
+        damage = self.game_map.threat_map.damage[1][13, 13]
+        path = [[13, 9], [13, 10], [13, 11]]
+        self.assertAlmostEqual(self.game_map.threat_map.path_damage(path, 0), 2 * damage)
+        self.assertAlmostEqual(self.game_map.threat_map.path_damage(path, 0, 2), 4 * damage)
+        self.assertEqual(self.game_map.threat_map.path_damage([], 0), 0)
+
+
+class EstimatorTests(GameTestCase):
+
+    def make_estimator(self, destructors):
+        simulator = self.make_simulator(firewalls=[("DF", location, 0) for location in destructors])
+        simulator.calculate()
+        return AttackEstimator(simulator.game_state)
+
+    def test_open_board(self):
+        estimate = self.make_estimator([]).estimate("PI", [13, 27], 5, 1)
+        self.assertEqual(estimate.breaches, 5)
+        self.assertFalse(estimate.self_destructed)
+        self.assertEqual(estimate.path[0], [13, 27])
+        self.assertIn(estimate.path[-1], [[x, x - 14] for x in range(14, 28)])
+        self.assertAlmostEqual(estimate.idealness, -2 * 5 - 0.5 * 5)
+
+    def test_destructor_on_path(self):
+        open_board = self.make_estimator([]).estimate("PI", [13, 27], 5, 1)
+        defended = self.make_estimator([open_board.path[14]]).estimate("PI", [13, 27], 5, 1)
+        self.assertLess(defended.survivors, 5)
+        self.assertGreater(defended.idealness, open_board.idealness)
+
+
+def load_script(name):
+    """Imports one of the C1GamesStarterKit scripts, they import each other by name"""
+    if SCRIPTS not in sys.path:
+        sys.path.insert(0, SCRIPTS)
+    return importlib.import_module(name)
+
+
+# A config line, a turn, an action phase of two frames, a turn, an action phase of one frame and the end of the game
+REPLAY_FRAMES = [
+    {"p1Units": [[[2, 13, 60, "1"]], [], [], [], [], [], []], "p2Units": [[], [], [], [], [], [], []],
+     "turnInfo": [0, 1, -1], "p1Stats": [30, 24, 5, 10], "p2Stats": [30, 25, 5, 12], "events": {}},
+    {"p1Units": [[[2, 13, 60, "1"]], [], [], [[13, 0, 15, "2"], [13, 0, 15, "3"]], [], [], []], "p2Units": [[], [], [], [], [], [], []],
+     "turnInfo": [1, 1, 0], "p1Stats": [30, 24, 3, 10], "p2Stats": [30, 25, 5, 12],
+     "events": {"spawn": [[[13, 0], 3, "2", 1], [[13, 0], 3, "3", 1]]}},
+    {"p1Units": [[[2, 13, 60, "1"]], [], [], [[13, 1, 15, "2"], [13, 1, 15, "3"]], [], [], []], "p2Units": [[], [], [], [], [], [], []],
+     "turnInfo": [1, 1, 1], "p1Stats": [30, 24, 3, 10], "p2Stats": [30, 25, 5, 12],
+     "events": {"move": [[[13, 0], [13, 1], [-1, -1], 3, "2", 1]],
+                "selfDestruct": [[[13, 1], [[12, 1], [14, 1]], 15.0, 3, "3", 1]]}},
+    {"p1Units": [[[2, 13, 60, "1"]], [], [], [], [], [], []], "p2Units": [[], [], [[20, 20, 75, "4"]], [], [], [], []],
+     "turnInfo": [0, 2, -1], "p1Stats": [30, 24, 8, 20], "p2Stats": [30, 22, 10, 22], "events": {}},
+    {"p1Units": [[[2, 13, 60, "1"]], [], [], [], [], [], []], "p2Units": [[], [], [[20, 20, 75, "4"]], [], [], [], []],
+     "turnInfo": [1, 2, 0], "p1Stats": [29, 24, 8, 20], "p2Stats": [30, 22, 10, 22],
+     "events": {"breach": [[[0, 13], 1.0, 3, "5", 2]], "damage": [[[20, 20], 2.0, 2, "4", 2]]}},
+    {"p1Units": [[], [], [], [], [], [], []], "p2Units": [[], [], [], [], [], [], []],
+     "turnInfo": [2, 2, 1], "p1Stats": [29, 24, 8, 20], "p2Stats": [30, 22, 10, 22], "events": {}, "endStats": {"winner": 2}},
+]
+
+
+def write_replay(path, frames=REPLAY_FRAMES):
+    with open(path, "w") as f:
+        f.write(CONFIG.replace("\n", "") + "\n")
+        for frame in frames:
+            f.write(json.dumps(frame) + "\n")
+
+
+class ReplayReaderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.replay_reader = load_script("replay_reader")
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "game.replay")
+        write_replay(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lines(self):
+        reader = self.replay_reader.ReplayReader(self.path)
+        self.assertEqual(reader.config["unitInformation"][3]["shorthand"], "PI")
+        self.assertEqual([json.loads(line) for line in reader.lines()], REPLAY_FRAMES)
+        self.assertEqual([json.loads(line)["turnInfo"][1] for line in reader.turn_states()], [1, 2])
+
+    def test_columns(self):
+        meta, columns = self.replay_reader.ReplayReader(self.path).to_columns()
+        self.assertEqual(meta["end_stats"], {"winner": 2})
+        self.assertEqual(columns["frame_type"].tolist(), [0, 1, 1, 0, 1, 2])
+        self.assertEqual(columns["frame_units"].tolist(), [0, 1, 4, 7, 9, 11, 11])
+        self.assertEqual(columns["frame_stats"].shape, (6, 8))
+        self.assertEqual(columns["frame_stats"][4, 0], 29)
+
+        # The units of frame 2, the filter and the two pings one step up
+        rows = slice(columns["frame_units"][2], columns["frame_units"][3])
+        self.assertEqual(columns["unit_type"][rows].tolist(), [0, 3, 3])
+        self.assertEqual(columns["unit_y"][rows].tolist(), [13, 1, 1])
+        self.assertEqual(columns["unit_id"][rows].tolist(), [1, 2, 3])
+
+        kinds = self.replay_reader.EVENT_KINDS
+        self.assertEqual(columns["frame_events"].tolist(), [0, 0, 2, 4, 4, 6, 6])
+        self.assertEqual([kinds[kind] for kind in columns["event_kind"]], ["spawn", "spawn", "move", "selfDestruct", "damage", "breach"])
+        self.assertEqual(columns["event_x2"][2], 13)
+        self.assertEqual(columns["event_amount"][3], 15.0)
+        # Both self destruct targets point at the self destruct event
+        self.assertEqual(columns["target_event"].tolist(), [3, 3])
+        self.assertEqual(columns["target_x"].tolist(), [12, 14])
+
+    def test_save_and_load(self):
+        meta, columns = self.replay_reader.ReplayReader(self.path).to_columns()
+        for name in ["columns", "columns.npz"]:
+            path = os.path.join(self.directory.name, name)
+            self.replay_reader.save_columns(path, meta, columns)
+            loaded_meta, loaded = self.replay_reader.load_columns(path)
+            self.assertEqual(loaded_meta, meta)
+            for key, values in columns.items():
+                self.assertEqual(loaded[key].dtype, values.dtype)
+                self.assertEqual(np.asarray(loaded[key]).tolist(), values.tolist())
+
+
+class SimulatorBenchmarkTests(GameTestCase):
+
+    # The first frame of an action phase, four enemy pings were just spawned
+    PHASE = """{"p2Units":[[],[],[],[[14,27,15,"2"],[14,27,15,"3"],[14,27,15,"4"],[14,27,15,"5"]],[],[],[]],"turnInfo":[1,0,0],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[[2,13,60,"1"]],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,1.0,0],"events":{}}"""
+
+    def setUp(self):
+        super().setUp()
+        self.benchmark = load_script("simulator_benchmark")
+        self.type_index = {unit["shorthand"]: i for i, unit in enumerate(self.config["unitInformation"])}
+
+    def test_action_phases(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game.replay")
+            write_replay(path)
+            reader = load_script("replay_reader").ReplayReader(path)
+            phases = list(self.benchmark.action_phases(reader))
+        self.assertEqual([len(frames) for first, frames in phases], [2, 1])
+        self.assertEqual(json.loads(phases[0][0]), REPLAY_FRAMES[1])
+        self.assertEqual(phases[1][1], [REPLAY_FRAMES[4]])
+
+    def test_engine_units(self):
+        information, firewalls = self.benchmark.engine_units(REPLAY_FRAMES[2])
+        self.assertEqual(information, [(0, 3, 13, 1), (0, 3, 13, 1)])
+        self.assertEqual(firewalls, [(0, 0, 2, 13)])
+
+    def engine_frame(self, simulator):
+        """The units of the simulator in the engine's frame format"""
+        frame = {"p1Units": [[] for _ in range(0, 7)], "p2Units": [[] for _ in range(0, 7)]}
+        information, firewalls = self.benchmark.simulator_units(simulator, self.type_index)
+        for player, unit_type, x, y in information + firewalls:
+            frame[["p1Units", "p2Units"][player]][unit_type].append([x, y, 0, "0"])
+        return frame
+
+    def test_first_mismatch(self):
+        import gamelib
+
+        # Frames recorded from a run of the simulator itself stand in for the engine's
+        simulator = self.make_simulator(self.PHASE)
+        simulator.skip_idle_frames = False
+        simulator.close_early = False
+        frames = [self.engine_frame(simulator)]
+        step = simulator.frame
+        def recorded_frame():
+            step()
+            frames.append(self.engine_frame(simulator))
+        simulator.frame = recorded_frame
+        simulator.simulate()
+        self.assertGreater(len(frames), 10)
+
+        self.assertIsNone(self.benchmark.first_mismatch(gamelib, "simulator", self.config, self.PHASE, self.storage, frames))
+        frames[7]["p2Units"][3][0][0] += 1
+        self.assertEqual(self.benchmark.first_mismatch(gamelib, "simulator", self.config, self.PHASE, self.storage, frames), 7)
+        # The engine kept going after the last simulated unit was gone
+        frames[7]["p2Units"][3][0][0] -= 1
+        frames.append(frames[-1])
+        frames.append(frames[-1])
+        self.assertEqual(self.benchmark.first_mismatch(gamelib, "simulator", self.config, self.PHASE, self.storage, frames), len(frames) - 2)
+        self.assertIsNone(self.benchmark.first_mismatch(gamelib, "array", self.config, self.PHASE, self.storage, frames))
+
+
+class TournamentTests(unittest.TestCase):
+    """Plays through scripts/fake_engine.py, which writes the replay of a one turn game the first algo wins"""
+
+    def setUp(self):
+        self.tournament = load_script("tournament")
+        self.engine = os.path.abspath(os.path.join(SCRIPTS, "fake_engine.py"))
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        with open("game-configs.json", "w") as f:
+            f.write(CONFIG)
+        for algo in ["first", "second"]:
+            os.makedirs(algo)
+            open(os.path.join(algo, "run.sh"), "w").close()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_play(self):
+        row = self.tournament.play(0, self.engine, os.path.abspath("first"), os.path.abspath("missing"), "out", 60)
+        self.assertEqual((row["winner"], row["points1"], row["turns"]), ("first", 1, 1))
+        self.assertEqual(row["error"], "player2 crashed")
+        replay = os.listdir(os.path.join("out", "game_0", "replays"))[0]
+        config = load_script("replay_reader").ReplayReader(os.path.join("out", "game_0", "replays", replay)).config
+        self.assertEqual(config["unitInformation"][3]["shorthand"], "PI")
+
+    def test_round(self):
+        argv = sys.argv
+        sys.argv = ["tournament.py", "-g", "2", "-j", "2", "-e", self.engine, "-o", "out", "--csv", "games.csv", "first", "second"]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                self.tournament.main()
+        finally:
+            sys.argv = argv
+        self.assertIn("Playing 2 games, 2 at a time", output.getvalue())
+
+        with open("games.csv") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([(row["game"], row["player1"], row["player2"]) for row in rows], [("0", "first", "second"), ("1", "second", "first")])
+        # The first algo of each game wins, so the sides switched
+        self.assertEqual([row["winner"] for row in rows], ["first", "second"])
+        self.assertEqual([row["error"] for row in rows], ["", ""])
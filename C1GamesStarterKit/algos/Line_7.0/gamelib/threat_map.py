@@ -0,0 +1,89 @@
+import numpy as np
+
+
+class ThreatMap:
+    """Per player grids of the tiles destructors can hit
+
+    coverage[p][x, y] is the number of player p's destructors that reach the tile and damage[p][x, y] the damage
+    they deal there every frame, so a unit of player p is threatened by coverage[1 - p].
+    The grids are changed in place with add() and remove() as destructors are built and destroyed.
+
+    Attributes:
+        * coverage (ndarray): int16 [2, 28, 28], destructors in range of each tile per player
+        * damage (ndarray): float32 [2, 28, 28], damage per frame on each tile per player
+
+    """
+    def __init__(self, storage):
+        """Starts from an empty board
+
+        Args:
+            * storage: The Storage shared by every simulation of the game
+        """
+        size = storage.ARENA_SIZE
+        stats = storage.unit_stats
+
+        self.destructor = stats.shorthand[stats.DESTRUCTOR]
+        self.in_arena = np.array([row[:size] for row in storage.arena_bounds[:size]], dtype=bool)
+        self.grid_x, self.grid_y = np.meshgrid(np.arange(size), np.arange(size), indexing="ij")
+
+        self.coverage = np.zeros((2, size, size), dtype=np.int16)
+        self.damage = np.zeros((2, size, size), dtype=np.float32)
+
+    @classmethod
+    def from_game_map(cls, game_map):
+        """Builds the threat map of every destructor on a GameMap"""
+        threat_map = cls(game_map.storage)
+        for x, y in game_map.storage.arena_tiles:
+            for unit in game_map.map[x][y]:
+                threat_map.add(unit)
+        return threat_map
+
+    def fork(self):
+        fork = ThreatMap.__new__(ThreatMap)
+        fork.__dict__.update(self.__dict__)
+        fork.coverage = self.coverage.copy()
+        fork.damage = self.damage.copy()
+        return fork
+
+    def reach(self, location, radius):
+        """Mask of the arena tiles within radius of location, the same tiles get_locations_in_range returns"""
+        dx = self.grid_x - location[0]
+        dy = self.grid_y - location[1]
+        limit = radius + 0.51
+        return self.in_arena & (dx * dx + dy * dy < limit * limit)
+
+    def add(self, unit):
+        """Adds the threat of unit if it is a destructor"""
+        if unit.unit_type != self.destructor:
+            return
+        mask = self.reach([unit.x, unit.y], unit.range)
+        self.coverage[unit.player_index][mask] += 1
+        self.damage[unit.player_index][mask] += unit.damage
+
+    def remove(self, unit):
+        """Removes the threat of unit if it is a destructor"""
+        if unit.unit_type != self.destructor:
+            return
+        mask = self.reach([unit.x, unit.y], unit.range)
+        self.coverage[unit.player_index][mask] -= 1
+        self.damage[unit.player_index][mask] -= unit.damage
+
+    def attackers(self, location, player_index):
+        """Number of destructors that would attack a unit of player_index at location"""
+        return int(self.coverage[1 - player_index][location[0], location[1]])
+
+    def path_damage(self, path, player_index, frames_per_tile=1):
+        """Damage a unit of player_index takes from destructors while walking path
+
+        Args:
+            * path: A list of locations, like find_path_to_edge returns
+            * player_index: The player the walking unit belongs to
+            * frames_per_tile: Frames the unit spends on each tile, 1 / speed
+
+        Returns:
+            The summed damage, shields and the unit dying on the way are not taken into account
+        """
+        if len(path) == 0:
+            return 0.0
+        path = np.asarray(path)
+        return float(self.damage[1 - player_index][path[:, 0], path[:, 1]].sum()) * frames_per_tile
@@ -0,0 +1,179 @@
+import json
+import numpy as np
+from .telemetry import telemetry
+from .unit import GameUnit, unit_types
+from .util import debug_write
+
+
+class TurnSnapshot:
+    """A turn message parsed once, that any number of game states can be built from
+
+    The message is decoded into compact arrays and a template of the board, the units every GameState built from
+    the snapshot starts with. Pass the snapshot wherever a serialized turn string is expected, GameState,
+    AdvancedGameState and Simulator then clone the template instead of parsing the json again.
+
+    Attributes:
+        * serialized_string (string): The turn message the snapshot was parsed from
+        * turn_info (list): The turnInfo of the message, [state type, turn number, action phase frame]
+        * turn_number (int): The turn number
+        * stats (list): [health, cores, bits, time] of each player
+        * units (ndarray): int16 [n, 4] of (unit type index, player, x, y) in the order the units were parsed,
+          which is also their id
+        * stability (ndarray): float64 [n], the stability of each unit
+        * removals (list): (x, y, player) of each pending removal
+
+    """
+    def __init__(self, config, serialized_string, storage):
+        """Parses the turn message
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * storage: The Storage shared by every simulation of the game
+
+        """
+        with telemetry.span("parse"):
+            self.__parse(config, serialized_string, storage)
+
+    def __parse(self, config, serialized_string, storage):
+        state = json.loads(serialized_string)
+
+        self.serialized_string = serialized_string
+        self.config = config
+        self.turn_info = state["turnInfo"]
+        self.turn_number = int(self.turn_info[1])
+        self.stats = [list(map(float, state["p1Stats"][:4])), list(map(float, state["p2Stats"][:4]))]
+
+        types = unit_types(config)
+        shorthands = [unit_information.get("shorthand") for unit_information in config["unitInformation"]]
+        remove = shorthands[6]
+        tile_index = storage.tile_index
+        tile_path_target = storage.tile_path_target
+
+        rows = []
+        stability = []
+        self.removals = []
+        # The template: GameUnits by id, the ids game_state.units lists and the first unit on every occupied tile
+        self.template = []
+        self.listed = []
+        first = {}
+
+        for player_index, key in enumerate(["p1Units", "p2Units"]):
+            unit = None
+            for i, unit_infos in enumerate(state[key]):
+                unit_type = shorthands[i]
+                for uinfo in unit_infos:
+                    sx, sy, shp = uinfo[:3]
+                    x, y = int(sx), int(sy)
+                    hp = float(shp)
+                    # This depends on RM always being the last type to be processed
+                    if unit_type == remove:
+                        self.removals.append((x, y, player_index))
+                        if (x, y) in first:
+                            first[(x, y)].pending_removal = True
+                        else:
+                            debug_write("Didn't like setting a pending removal flag")
+                        # GameState lists the unit parsed last once more for every removal
+                        if unit is None:
+                            continue
+                    else:
+                        unit = GameUnit(unit_type, config, player_index, len(self.template), hp, x, y)
+                        self.template.append(unit)
+                        first.setdefault((x, y), unit)
+                        rows.append((i, player_index, x, y))
+                        stability.append(hp)
+                        if types[unit_type].stationary:
+                            continue
+                    self.listed.append(unit.id)
+                    tile = tile_index[unit.x][unit.y]
+                    if tile >= 0 and tile_path_target[tile] is not None:
+                        unit.path_target = tile_path_target[tile]
+
+        self.units = np.array(rows, dtype=np.int16).reshape(-1, 4)
+        self.stability = np.array(stability, dtype=np.float64)
+
+    def key(self):
+        """Everything a simulation from this snapshot depends on, equal for two snapshots of the same board
+
+        Returns:
+            A hashable tuple of the units, their stability, the pending removals and each player's health, cores and bits
+        """
+        return (self.units.tobytes(), self.stability.tobytes(), tuple(self.removals),
+                tuple(self.stats[0][:3]), tuple(self.stats[1][:3]))
+
+    def settled(self):
+        """Whether no information units are left on the board, the action phase cannot change it any more"""
+        types = unit_types(self.config)
+        return all(types[unit.unit_type].stationary for unit in self.template)
+
+    def next_turn(self, storage):
+        """Predicts the snapshot the next turn starts with from the last frame of an action phase
+
+        The pending removals are taken off the board and refunded, then the cores and bits of the next round are
+        added the way the engine does with the resources in the config. The prediction is exact unless the engine
+        rounds a refund differently, compare key() with the real turn before reusing anything computed from it.
+
+        Args:
+            * storage: The Storage shared by every simulation of the game
+
+        Returns:
+            A TurnSnapshot of the predicted turn
+        """
+        state = json.loads(self.serialized_string)
+        resources = self.config["resources"]
+        refund_fraction = self.config["mechanics"]["destroyOwnUnitRefund"]
+        types = unit_types(self.config)
+        shorthands = [unit_information.get("shorthand") for unit_information in self.config["unitInformation"]]
+        turn = self.turn_number + 1
+
+        state["turnInfo"] = [0, turn, -1]
+        state["events"] = {}
+        for key, stats_key in [("p1Units", "p1Stats"), ("p2Units", "p2Stats")]:
+            removed = set((int(x), int(y)) for x, y in (uinfo[:2] for uinfo in state[key][6]))
+            refund = 0
+            for i, unit_infos in enumerate(state[key]):
+                # Information units and removals do not carry over, RM has no UnitType
+                unit_type = types.get(shorthands[i])
+                kept = []
+                if unit_type is not None and unit_type.stationary:
+                    for uinfo in unit_infos:
+                        if (int(uinfo[0]), int(uinfo[1])) in removed:
+                            refund += unit_type.cost * refund_fraction * float(uinfo[2]) / unit_type.max_stability
+                        else:
+                            kept.append(uinfo)
+                state[key][i] = kept
+
+            stats = state[stats_key]
+            bits = stats[2] * (1 - resources["bitDecayPerRound"]) + resources["bitsPerRound"] + \
+                (turn // resources["turnIntervalForBitSchedule"]) * resources["bitGrowthRate"]
+            stats[1] = round(stats[1] + resources["coresPerRound"] + refund, 1)
+            stats[2] = round(min(resources["maxBits"], bits), 1)
+
+        return TurnSnapshot(self.config, json.dumps(state), storage)
+
+    def apply(self, game_state, clone=True):
+        """Fills a freshly made game state with the turn
+
+        Args:
+            * game_state: The GameState, its game_map must still be empty
+            * clone (bool): Place clones of the template units, only a snapshot that is applied once may pass False
+
+        """
+        p1_health, p1_cores, p1_bits, p1_time = self.stats[0]
+        p2_health, p2_cores, p2_bits, p2_time = self.stats[1]
+
+        game_state.turn_number = self.turn_number
+        game_state.my_health = p1_health
+        game_state.my_time = p1_time
+        game_state.enemy_health = p2_health
+        game_state.enemy_time = p2_time
+        game_state._player_resources = [
+            {'cores': p1_cores, 'bits': p1_bits},
+            {'cores': p2_cores, 'bits': p2_bits}]
+
+        units = [unit.clone() for unit in self.template] if clone else self.template
+        game_map = game_state.game_map.map
+        for unit in units:
+            game_map[unit.x][unit.y].append(unit)
+        game_state.units = [units[i] for i in self.listed]
+        game_state.unitID = len(units)
@@ -1,11 +1,101 @@
+import json
 import gamelib
 
 def is_stationary(unit_type, firewall_types):
     return unit_type in firewall_types
 
+class UnitType:
+    """The stats shared by every unit of one type, read from the config once
+
+    Attributes:
+        * unit_type (string): The shorthand of the type
+        * config (JSON): Contains information about the game
+        * stationary (bool): Whether or not units of this type are firewalls
+        * encryptor (bool): Whether or not units of this type are encryptors
+        * speed (float): A unit will move once every 1/speed frames
+        * damage (int): Damage to enemy information for firewalls, the shield amount for encryptors
+        * damage_f (int): The amount of damage an information unit deals to enemy firewalls
+        * damage_i (int): The amount of damage an information unit deals to enemy information
+        * range (float): The effective range of the unit
+        * max_stability (float): The starting health of the unit
+        * cost (int): The resource cost of the unit
+
+    """
+    __slots__ = ("unit_type", "config", "stationary", "encryptor", "speed", "damage", "damage_f", "damage_i", "range", "max_stability", "cost")
+
+    def __init__(self, config, index, firewall_types, encryptor):
+        type_config = config["unitInformation"][index]
+        self.unit_type = type_config["shorthand"]
+        self.config = config
+        self.stationary = is_stationary(self.unit_type, firewall_types)
+        self.encryptor = self.unit_type == encryptor
+        if self.stationary:
+            self.speed = 0
+            if self.encryptor:
+                self.damage = type_config["shieldAmount"]
+            else:
+                self.damage = type_config["damage"]
+            self.damage_f = None
+            self.damage_i = None
+        else:
+            self.speed = type_config["speed"]
+            self.damage_f = type_config["damageF"]
+            self.damage_i = type_config["damageI"]
+            self.damage = self.damage_i
+        self.range = type_config["range"]
+        self.max_stability = type_config["stability"]
+        self.cost = type_config["cost"]
+
+
+# The config serialized with sorted keys -> [config, {shorthand: UnitType}, placeholder target].
+# Configs with the same contents share the table of the first of them, so a game holds one table however
+# many times its config is parsed
+_unit_tables = {}
+
+# (config, table) of the last lookup, nearly every unit of a game is made with the same config object
+_last_table = (None, None)
+
+
+def _unit_table(config):
+    global _last_table
+    last = _last_table
+    if last[0] is config:
+        return last[1]
+
+    key = json.dumps(config, sort_keys=True)
+    table = _unit_tables.get(key)
+    if table is None:
+        table = _unit_tables.setdefault(key, [config, _build_unit_types(config), None])
+    _last_table = (config, table)
+
+    if table[2] is None:
+        # Units parsed with an id start out targeting this scrambler, see GameUnit.__init__
+        table[2] = GameUnit(config["unitInformation"][5]["shorthand"], config)
+    return table
+
+
+def _build_unit_types(config):
+    unit_information = config["unitInformation"]
+    FILTER, ENCRYPTOR, DESTRUCTOR = [unit_information[i]["shorthand"] for i in range(0, 3)]
+    firewall_types = [FILTER, ENCRYPTOR, DESTRUCTOR]
+
+    types = {}
+    for index in range(0, 6):
+        unit_type = UnitType(config, index, firewall_types, ENCRYPTOR)
+        types[unit_type.unit_type] = unit_type
+    return types
+
+
+def unit_types(config):
+    """The UnitType of every unit type in the config by shorthand, built the first time a config is seen"""
+    return _unit_table(config)[1]
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
+    The stats every unit of a type shares come from its UnitType and are copied into the unit when it is created.
+
     Attributes:
         * unit_type (string): This unit's type
         * config (JSON): Contains information about the game
@@ -21,40 +111,38 @@ class GameUnit:
         * range (float): The effective range of this unit
         * stability (float): The current health of this unit
         * cost (int): The resource cost of this unit
+        * count (int): The number of identical units this unit stands for, more than 1 only for stacks in a Simulator
 
     """
+    __slots__ = ("unit_type", "type_stats", "player_index", "pending_removal", "x", "y", "loc", "stability", "actual_stability",
+                 "encryption", "encrypted_IDs", "id", "tiles_moved", "d_target", "target", "path_target", "next_dir_up", "moved", "count",
+                 "stationary", "speed", "damage", "damage_f", "damage_i", "range", "max_stability", "cost")
+
     def __init__(self, unit_type, config, player_index=None, id=None, stability=None, x=-1, y=-1, path_target=None):
         """ Initialize unit variables using args passed
 
         """
-        global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, REMOVE, FIREWALL_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
-        UNIT_TYPE_TO_INDEX = {}
-        FILTER = config["unitInformation"][0]["shorthand"]
-        UNIT_TYPE_TO_INDEX[FILTER] = 0
-        ENCRYPTOR = config["unitInformation"][1]["shorthand"]
-        UNIT_TYPE_TO_INDEX[ENCRYPTOR] = 1
-        DESTRUCTOR = config["unitInformation"][2]["shorthand"]
-        UNIT_TYPE_TO_INDEX[DESTRUCTOR] = 2
-        PING = config["unitInformation"][3]["shorthand"]
-        UNIT_TYPE_TO_INDEX[PING] = 3
-        EMP = config["unitInformation"][4]["shorthand"]
-        UNIT_TYPE_TO_INDEX[EMP] = 4
-        SCRAMBLER = config["unitInformation"][5]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SCRAMBLER] = 5
-        REMOVE = config["unitInformation"][6]["shorthand"]
-        UNIT_TYPE_TO_INDEX[REMOVE] = 6
-
-        ALL_UNITS = [PING, EMP, SCRAMBLER, FILTER, ENCRYPTOR, DESTRUCTOR]
-        FIREWALL_TYPES = [FILTER, ENCRYPTOR, DESTRUCTOR]
+        table = _unit_table(config)
+        type_stats = table[1][unit_type]
 
         self.unit_type = unit_type
-        self.config = config
+        self.type_stats = type_stats
         self.player_index = player_index
         self.pending_removal = False
         self.x = x
         self.y = y
         self.loc = [x, y]
-        self.__serialize_type()
+
+        self.stationary = type_stats.stationary
+        self.speed = type_stats.speed
+        self.damage = type_stats.damage
+        self.range = type_stats.range
+        self.max_stability = type_stats.max_stability
+        self.cost = type_stats.cost
+        self.damage_f = type_stats.damage_f
+        self.damage_i = type_stats.damage_i
+        self.encrypted_IDs = [] if type_stats.encryptor else None
+
         self.stability = self.max_stability if not stability else stability
         self.actual_stability = self.stability
         self.encryption = []
@@ -62,9 +150,12 @@ class GameUnit:
         self.tiles_moved = 0
 
         self.d_target = None
+        self.target = None
 
+        # The placeholder only tells the Simulator that the unit has a target that is not a firewall, it reads
+        # nothing else of it. Sharing one lets freshly parsed identical units stack, see Simulator.stack_unit_list
         if id != None:
-            self.target = GameUnit(SCRAMBLER, config, not player_index, None, None, x, y)
+            self.target = table[2]
             self.d_target = 0
 
         # Dir:
@@ -76,26 +167,11 @@ class GameUnit:
         self.next_dir_up = True
 
         self.moved = False
+        self.count = 1
 
-    def __serialize_type(self):
-
-        self.stationary = is_stationary(self.unit_type, FIREWALL_TYPES)
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        if self.stationary:
-            self.speed = 0
-            if self.unit_type == ENCRYPTOR:
-                self.damage = type_config["shieldAmount"]
-                self.encrypted_IDs = []
-            else:
-                self.damage = type_config["damage"]
-        else:
-            self.speed = type_config["speed"]
-            self.damage_f = type_config["damageF"]
-            self.damage_i = type_config["damageI"]
-            self.damage = self.damage_i
-        self.range = type_config["range"]
-        self.max_stability = type_config["stability"]
-        self.cost = type_config["cost"]
+    @property
+    def config(self):
+        return self.type_stats.config
 
     def attack(self, damage):
 
@@ -130,6 +206,38 @@ class GameUnit:
     def self_destruct(self):
         pass
 
+    def clone(self):
+        """Returns a copy of this unit that can be moved and damaged without changing the original"""
+        clone = GameUnit.__new__(GameUnit)
+        clone.unit_type = self.unit_type
+        clone.type_stats = self.type_stats
+        clone.player_index = self.player_index
+        clone.pending_removal = self.pending_removal
+        clone.x = self.x
+        clone.y = self.y
+        clone.loc = list(self.loc)
+        clone.stability = self.stability
+        clone.actual_stability = self.actual_stability
+        clone.encryption = list(self.encryption)
+        clone.encrypted_IDs = None if self.encrypted_IDs is None else list(self.encrypted_IDs)
+        clone.id = self.id
+        clone.tiles_moved = self.tiles_moved
+        clone.d_target = self.d_target
+        clone.target = self.target
+        clone.path_target = self.path_target
+        clone.next_dir_up = self.next_dir_up
+        clone.moved = self.moved
+        clone.count = self.count
+        clone.stationary = self.stationary
+        clone.speed = self.speed
+        clone.damage = self.damage
+        clone.damage_f = self.damage_f
+        clone.damage_i = self.damage_i
+        clone.range = self.range
+        clone.max_stability = self.max_stability
+        clone.cost = self.cost
+        return clone
+
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
         removal = ", pending removal" if self.pending_removal else ""
@@ -149,4 +257,3 @@ class GameUnit:
         if self.id > other.id:
             return 1
     """
-
@@ -1,4 +1,14 @@
 $scriptPath = Split-Path -parent $PSCommandPath;
 $algoPath = "$scriptPath\algo_strategy.py"
+# Uncomment to write one summary of the turn timings per turn to the debug output
+#$env:GAMELIB_TELEMETRY = "stderr"
+# Uncomment to sample the stack during every turn, collapsed stacks and a summary of slow turns go to profile\
+#$env:GAMELIB_PROFILE = "$scriptPath\profile"
+# Uncomment to simulate candidate attacks on 4 worker processes
+#$env:GAMELIB_ATTACK_WORKERS = "4"
+# Uncomment to score candidate attacks in one BatchSimulator, it lets destructors fire unlike the Simulator
+#$env:GAMELIB_BATCH_ATTACKS = "1"
+# Uncomment to simulate the next turn's enemy attacks while the action phase plays out
+#$env:GAMELIB_PRECOMPUTE = "1"
 
 py -3 $algoPath
@@ -1,4 +1,14 @@
 #!/bin/bash
 
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+# Uncomment to write one summary of the turn timings per turn to the debug output
+#export GAMELIB_TELEMETRY=stderr
+# Uncomment to sample the stack during every turn, collapsed stacks and a summary of slow turns go to profile/
+#export GAMELIB_PROFILE="$DIR/profile"
+# Uncomment to simulate candidate attacks on 4 worker processes
+#export GAMELIB_ATTACK_WORKERS=4
+# Uncomment to score candidate attacks in one BatchSimulator, it lets destructors fire unlike the Simulator
+#export GAMELIB_BATCH_ATTACKS=1
+# Uncomment to simulate the next turn's enemy attacks while the action phase plays out
+#export GAMELIB_PRECOMPUTE=1
 ${PYTHON_CMD:-python3} -u "$DIR/algo_strategy.py"
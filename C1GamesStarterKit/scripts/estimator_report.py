@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Compares gamelib.AttackEstimator with the full simulator on recorded games.
+
+For every turn of every replay the enemy attacks deploy_attackers considers are estimated and
+simulated with BatchSimulator, then the errors and the time taken by both are printed.
+
+Run from the C1GamesStarterKit directory:
+>python scripts/estimator_report.py [-a algos/Line_7.0] [-k 24] REPLAY [REPLAY ...]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+
+def load_replay(path):
+    """Returns the config and the turn strings at the start of each turn of a replay"""
+    config = None
+    turns = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if config is None:
+                config = json.loads(line)
+            elif json.loads(line)["turnInfo"][0] == 0:
+                turns.append(line)
+    return config, turns
+
+
+def enemy_candidates(game_state):
+    """The enemy attacks deploy_attackers considers"""
+    candidates = []
+    for x in range(0, 28):
+        y = x + 14 if x < 14 else 41 - x
+        if game_state.can_spawn("SI", [x, y], 1, 1):
+            for unit_type in ["EI", "SI", "PI"]:
+                candidates.append((unit_type, [x, y], int(game_state.number_affordable(unit_type, 1)) or 1, 1))
+    return candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("replays", nargs="*", help="Replay files or directories, defaults to replays/")
+    parser.add_argument("-a", "--algo", default=os.path.join("algos", "Line_7.0"), help="Algo folder holding the gamelib to test")
+    parser.add_argument("-k", "--top-k", type=int, default=24, help="Candidates kept by the estimator, like AlgoStrategy.attack_top_k")
+    parser.add_argument("-n", "--worst", type=int, default=5, help="Worst simulated attacks the kept candidates should contain")
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.algo)
+    import gamelib
+
+    paths = []
+    for path in args.replays or ["replays"]:
+        paths.extend(sorted(glob.glob(os.path.join(path, "*.replay"))) if os.path.isdir(path) else [path])
+
+    warnings.simplefilter("ignore")
+    # gamelib debug output goes to stderr
+    sys.stderr = open(os.devnull, "w")
+
+    simulated = []
+    estimated = []
+    simulated_breaches = []
+    estimated_breaches = []
+    recall = []
+    estimate_time = 0
+    simulate_time = 0
+
+    for path in paths:
+        config, turns = load_replay(path)
+        storage = gamelib.Storage(config)
+        for turn in turns:
+            base = gamelib.Simulator(config, turn, storage)
+            base.calculate()
+            game_state = base.game_state
+            candidates = enemy_candidates(game_state)
+            if len(candidates) == 0:
+                continue
+
+            start = time.perf_counter()
+            estimator = gamelib.AttackEstimator(game_state)
+            estimates = [estimator.estimate(*candidate) for candidate in candidates]
+            estimate_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            batch = gamelib.BatchSimulator(base, [[candidate] for candidate in candidates])
+            batch.simulate()
+            idealness = np.array(batch.idealness())
+            simulate_time += time.perf_counter() - start
+
+            change = idealness - base.idealness()
+            predicted = np.array([estimate.idealness for estimate in estimates])
+            simulated.append(change)
+            estimated.append(predicted)
+            simulated_breaches.append(game_state.my_health - batch.health[:, 0])
+            estimated_breaches.append(np.array([estimate.breaches for estimate in estimates]))
+
+            worst = set(np.argsort(change, kind="stable")[:args.worst])
+            kept = set(np.argsort(predicted, kind="stable")[:args.top_k])
+            recall.append(len(worst & kept) / len(worst))
+
+    sys.stderr = sys.__stderr__
+
+    if len(simulated) == 0:
+        print("No turns found")
+        return
+
+    simulated = np.concatenate(simulated)
+    estimated = np.concatenate(estimated)
+    simulated_breaches = np.concatenate(simulated_breaches)
+    estimated_breaches = np.concatenate(estimated_breaches)
+    n = len(simulated)
+
+    print("{} candidates on {} turns of {} replays".format(n, len(recall), len(paths)))
+    print("Time per candidate:   estimate {:.0f}us, simulate {:.0f}us".format(estimate_time / n * 1e6, simulate_time / n * 1e6))
+    print("Idealness change:     mean absolute error {:.2f}, bias {:+.2f}, correlation {:.3f}".format(
+        np.abs(estimated - simulated).mean(), (estimated - simulated).mean(), np.corrcoef(estimated, simulated)[0, 1]))
+    print("Breaches:             mean absolute error {:.2f}, exact {:.0%}".format(
+        np.abs(estimated_breaches - simulated_breaches).mean(), (estimated_breaches == simulated_breaches).mean()))
+    print("Worst {} simulated attacks kept in the top {} estimates: {:.0%}".format(args.worst, args.top_k, np.mean(recall)))
+
+
+if __name__ == "__main__":
+    main()
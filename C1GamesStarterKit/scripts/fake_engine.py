@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Stands in for engine.jar where Java or the real engine is not available, like in the tournament tests.
+
+It takes the same "work ALGO1 ALGO2" arguments but does not start the algos. It writes a replay of a single
+turn to replays/ in its working directory, the first algo wins 1 to 0. An algo whose run script does not exist
+is reported as crashed and loses. The config line is game-configs.json from the working directory, {} without it.
+
+>python scripts/fake_engine.py work algos/Line_7.0/run.sh algos/Not_A_Line_7.0/run.sh
+"""
+import json
+import os
+import sys
+import time
+
+
+def end_stats(algo1, algo2):
+    crashed = [not os.path.exists(algo1), not os.path.exists(algo2)]
+    winner = 2 if crashed[0] and not crashed[1] else 1
+    players = {}
+    for player in [1, 2]:
+        players["player{}".format(player)] = {"points_scored": 1 if player == winner else 0,
+                                              "total_computation_time": 0, "crashed": crashed[player - 1]}
+    return dict(winner=winner, turns=1, frames=1, duration=0, **players)
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] != "work":
+        print("Usage: fake_engine.py work ALGO1 ALGO2")
+        sys.exit(2)
+    algo1, algo2 = sys.argv[2:]
+
+    config = {}
+    if os.path.exists("game-configs.json"):
+        with open("game-configs.json") as f:
+            config = json.load(f)
+    stats = end_stats(algo1, algo2)
+    frame = {"turnInfo": [2, 1, 0], "p1Stats": [30 - stats["player2"]["points_scored"], 0, 0, 0],
+             "p2Stats": [30 - stats["player1"]["points_scored"], 0, 0, 0], "events": {}, "endStats": stats}
+
+    os.makedirs("replays", exist_ok=True)
+    path = os.path.join("replays", "p1-{}.replay".format(int(time.time() * 1000)))
+    with open(path, "w") as f:
+        f.write(json.dumps(config) + "\n")
+        f.write(json.dumps(frame) + "\n")
+    print("Wrote {}".format(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+Streams replay files frame by frame and converts them to a columnar format.
+
+A converted replay is a set of flat NumPy arrays: one row per frame, one row per unit on the board of every frame
+and one row per event. They are written either to a single .npz file or to a directory of .npy files that
+load_columns memory maps, so scans over many games only read the columns they use.
+
+Run from the C1GamesStarterKit directory:
+>python scripts/replay_reader.py [-o columns] [--npz] REPLAY [REPLAY ...]
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+EVENT_KINDS = ["spawn", "move", "damage", "attack", "melee", "death", "breach", "shield", "selfDestruct"]
+
+# What each entry of an event holds, by position. None entries are not stored
+EVENT_LAYOUTS = {
+    "spawn": ("loc", "unit_type", "unit_id", "player"),
+    "move": ("loc", "loc2", None, "unit_type", "unit_id", "player"),
+    "damage": ("loc", "amount", "unit_type", "unit_id", "player"),
+    "attack": ("loc", "loc2", "amount", "unit_type", "unit_id", "target_id", "player"),
+    "melee": ("loc", "loc2", "amount", "unit_type", "unit_id", "player"),
+    "death": ("loc", "unit_type", "unit_id", "player", "flag"),
+    "breach": ("loc", "amount", "unit_type", "unit_id", "player"),
+    "shield": ("loc", "loc2", "amount", "unit_type", "unit_id", "target_id", "player"),
+    "selfDestruct": ("loc", "targets", "amount", "unit_type", "unit_id", "player"),
+}
+
+# Column name -> dtype of the columnar format
+FRAME_COLUMNS = {
+    "frame_type": np.int8, "frame_turn": np.int16, "frame_index": np.int16,
+    "frame_stats": np.float64, "frame_units": np.int64, "frame_events": np.int64,
+}
+UNIT_COLUMNS = {
+    "unit_player": np.int8, "unit_type": np.int8, "unit_x": np.int8, "unit_y": np.int8,
+    "unit_stability": np.float32, "unit_id": np.int32,
+}
+EVENT_COLUMNS = {
+    "event_kind": np.int8, "event_x": np.int8, "event_y": np.int8, "event_x2": np.int8, "event_y2": np.int8,
+    "event_amount": np.float32, "event_unit_type": np.int8, "event_unit_id": np.int32, "event_target_id": np.int32,
+    "event_player": np.int8, "event_flag": np.bool_,
+    "target_event": np.int64, "target_x": np.int8, "target_y": np.int8,
+}
+
+
+class ReplayReader:
+    """Reads a replay one line at a time, nothing but the config is kept in memory
+
+    Attributes:
+        * path (string): The replay file
+        * config (JSON): The game config, the first line of the replay
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.config = None
+        for line in self.__lines():
+            self.config = json.loads(line)
+            break
+
+    def __lines(self):
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+    def lines(self):
+        """Yields the serialized frames, the strings AlgoCore passes to on_turn and parse_action_phase"""
+        lines = self.__lines()
+        next(lines, None)
+        for line in lines:
+            yield line
+
+    def frames(self):
+        """Yields every frame parsed, one at a time"""
+        for line in self.lines():
+            yield json.loads(line)
+
+    def turn_states(self):
+        """Yields the serialized frames that start a turn, the ones a Simulator is built from"""
+        for line in self.lines():
+            if json.loads(line)["turnInfo"][0] == 0:
+                yield line
+
+    def to_columns(self):
+        """Converts the replay to columns
+
+        Returns:
+            (meta, columns), meta holds the config and the end stats and columns maps the names in FRAME_COLUMNS,
+            UNIT_COLUMNS and EVENT_COLUMNS to arrays. frame_units and frame_events hold one more row than there are
+            frames, the units of frame i are rows frame_units[i] to frame_units[i + 1] of the unit columns and
+            likewise for the events. target_event links the self destruct targets to their event row.
+        """
+        columns = {name: [] for name in list(FRAME_COLUMNS) + list(UNIT_COLUMNS) + list(EVENT_COLUMNS)}
+        columns["frame_units"].append(0)
+        columns["frame_events"].append(0)
+        end_stats = None
+
+        for frame in self.frames():
+            turn_info = frame["turnInfo"]
+            columns["frame_type"].append(turn_info[0])
+            columns["frame_turn"].append(turn_info[1])
+            columns["frame_index"].append(turn_info[2])
+            columns["frame_stats"].append(frame["p1Stats"][:4] + frame["p2Stats"][:4])
+            if "endStats" in frame:
+                end_stats = frame["endStats"]
+
+            for player, key in enumerate(["p1Units", "p2Units"]):
+                for unit_type, units in enumerate(frame[key]):
+                    for unit in units:
+                        columns["unit_player"].append(player)
+                        columns["unit_type"].append(unit_type)
+                        columns["unit_x"].append(unit[0])
+                        columns["unit_y"].append(unit[1])
+                        columns["unit_stability"].append(unit[2])
+                        columns["unit_id"].append(int(unit[3]))
+            columns["frame_units"].append(len(columns["unit_id"]))
+
+            events = frame.get("events", {})
+            for kind, name in enumerate(EVENT_KINDS):
+                for event in events.get(name, []):
+                    self.__add_event(columns, kind, EVENT_LAYOUTS[name], event)
+            columns["frame_events"].append(len(columns["event_kind"]))
+
+        meta = {"replay": os.path.basename(self.path), "config": self.config, "end_stats": end_stats}
+        dtypes = dict(FRAME_COLUMNS, **UNIT_COLUMNS, **EVENT_COLUMNS)
+        arrays = {name: np.array(values, dtype=dtypes[name]) for name, values in columns.items()}
+        arrays["frame_stats"] = arrays["frame_stats"].reshape(-1, 8)
+        return meta, arrays
+
+    def __add_event(self, columns, kind, layout, event):
+        row = {"loc": [-1, -1], "loc2": [-1, -1], "amount": 0, "unit_type": -1, "unit_id": -1, "target_id": -1, "player": -1, "flag": False}
+        for field, value in zip(layout, event):
+            if field == "targets":
+                for x, y in value:
+                    columns["target_event"].append(len(columns["event_kind"]))
+                    columns["target_x"].append(x)
+                    columns["target_y"].append(y)
+            elif field is not None:
+                row[field] = value
+
+        columns["event_kind"].append(kind)
+        columns["event_x"].append(row["loc"][0])
+        columns["event_y"].append(row["loc"][1])
+        columns["event_x2"].append(row["loc2"][0])
+        columns["event_y2"].append(row["loc2"][1])
+        columns["event_amount"].append(row["amount"])
+        columns["event_unit_type"].append(row["unit_type"])
+        columns["event_unit_id"].append(int(row["unit_id"]))
+        columns["event_target_id"].append(int(row["target_id"]))
+        columns["event_player"].append(row["player"])
+        columns["event_flag"].append(row["flag"])
+
+
+def save_columns(path, meta, columns):
+    """Writes converted columns to a .npz file, or to a directory of .npy files with a meta.json for any other path"""
+    if path.endswith(".npz"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), **columns)
+        return
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    for name, values in columns.items():
+        np.save(os.path.join(path, name + ".npy"), values)
+
+
+def load_columns(path):
+    """Opens columns written by save_columns without reading them
+
+    Returns:
+        (meta, columns). The columns of a directory are memory mapped, those of a .npz file are read when first used
+    """
+    if path.endswith(".npz"):
+        columns = np.load(path)
+        return json.loads(str(columns["meta"])), columns
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {}
+    for file in glob.glob(os.path.join(path, "*.npy")):
+        columns[os.path.basename(file)[:-4]] = np.load(file, mmap_mode="r")
+    return meta, columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("replays", nargs="*", help="Replay files or directories, defaults to replays/")
+    parser.add_argument("-o", "--output", default="columns", help="Directory the converted replays are written to")
+    parser.add_argument("--npz", action="store_true", help="Write one compressed .npz file per replay instead of a directory of .npy files")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.replays or ["replays"]:
+        paths.extend(sorted(glob.glob(os.path.join(path, "*.replay"))) if os.path.isdir(path) else [path])
+    if len(paths) == 0:
+        print("No replays found")
+        return
+
+    for path in paths:
+        start = time.perf_counter()
+        meta, columns = ReplayReader(path).to_columns()
+        name = os.path.splitext(os.path.basename(path))[0]
+        output = os.path.join(args.output, name + (".npz" if args.npz else ""))
+        save_columns(output, meta, columns)
+        size = sum(values.nbytes for values in columns.values())
+        print("{}: {} frames, {} units, {} events, {:.1f} MB of columns from {:.1f} MB in {:.1f}s -> {}".format(
+            name, len(columns["frame_type"]), len(columns["unit_id"]), len(columns["event_kind"]),
+            size / 1e6, os.path.getsize(path) / 1e6, time.perf_counter() - start, output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+Replays the action phases of recorded games through the gamelib simulators and compares them with the engine.
+
+Every action phase starts from its first frame, the board after both players spawned their units, and is
+simulated to the end. Speed is reported as frames per second and milliseconds per action phase. Fidelity is
+reported as the first frame whose units differ from the engine's, the error in player health at the end of the
+phase and the breaches of each player.
+
+Run from the C1GamesStarterKit directory:
+>python scripts/simulator_benchmark.py [-a algos/Line_7.0] [-m simulator array simulator_2] REPLAY [REPLAY ...]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from replay_reader import ReplayReader
+
+MODES = ["simulator", "array", "simulator_2"]
+
+
+def action_phases(reader):
+    """Yields (first frame string, parsed frames) of every action phase of a replay"""
+    first = None
+    frames = []
+    for line in reader.lines():
+        frame = json.loads(line)
+        if frame["turnInfo"][0] != 1:
+            if first is not None:
+                yield first, frames
+            first = None
+            frames = []
+            continue
+        if first is None:
+            first = line
+        frames.append(frame)
+    if first is not None:
+        yield first, frames
+
+
+def engine_units(frame):
+    """Sorted (player, type, x, y) of the information units and of the firewalls in a frame"""
+    information = []
+    firewalls = []
+    for player, key in enumerate(["p1Units", "p2Units"]):
+        for unit_type, units in enumerate(frame[key][:6]):
+            for unit in units:
+                (firewalls if unit_type < 3 else information).append((player, unit_type, unit[0], unit[1]))
+    return sorted(information), sorted(firewalls)
+
+
+def simulator_units(simulator, type_index):
+    """The same as engine_units for a simulator between two frames"""
+    game_map = simulator.game_state.game_map
+    # A stack of information units stands for count of them
+    information = sorted((unit.player_index, type_index[unit.unit_type], unit.x, unit.y)
+                         for unit in simulator.unit_list for _ in range(getattr(unit, "count", 1)))
+    firewalls = []
+    for x, y in game_map.storage.arena_tiles:
+        tile = game_map.map[x][y]
+        if len(tile) > 0 and tile[0].stationary:
+            firewalls.append((tile[0].player_index, type_index[tile[0].unit_type], x, y))
+    return information, sorted(firewalls)
+
+
+def make_simulator(gamelib, mode, config, state, storage):
+    if mode == "simulator_2":
+        return gamelib.Simulator_2(config, state, storage)
+    return gamelib.Simulator(config, state, storage, mode == "array")
+
+
+def first_mismatch(gamelib, mode, config, state, storage, frames):
+    """Simulates one action phase frame by frame
+
+    Returns:
+        The first frame whose units differ from the engine, None if every frame matches
+    """
+    if mode == "array":
+        # The array board runs the whole phase at once, only its outcome can be compared
+        return None
+    type_index = {unit["shorthand"]: i for i, unit in enumerate(config["unitInformation"])}
+    simulator = make_simulator(gamelib, mode, config, state, storage)
+    # Every frame is compared, so none of them may be skipped or closed early
+    simulator.skip_idle_frames = False
+    simulator.close_early = False
+    simulator.calculate()
+
+    mismatch = []
+    step = simulator.frame
+
+    def checked_frame():
+        step()
+        if len(mismatch) == 0:
+            frame = simulator.curr_frame
+            expected = engine_units(frames[frame]) if frame < len(frames) else ([], None)
+            information, firewalls = simulator_units(simulator, type_index)
+            if information != expected[0] or (expected[1] is not None and firewalls != expected[1]):
+                mismatch.append(frame)
+
+    # simulate() keeps its own setup and calls self.frame() until the phase is over
+    simulator.frame = checked_frame
+    simulator.simulate()
+    if len(mismatch) == 0 and simulator.curr_frame < len(frames) - 1:
+        # The engine kept going after every simulated unit was gone
+        mismatch.append(simulator.curr_frame + 1)
+    return mismatch[0] if mismatch else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("replays", nargs="*", help="Replay files or directories, defaults to replays/")
+    parser.add_argument("-a", "--algo", default=os.path.join("algos", "Line_7.0"), help="Algo folder holding the gamelib to test")
+    parser.add_argument("-m", "--modes", nargs="+", default=MODES, choices=MODES, help="Simulators to run")
+    parser.add_argument("-n", "--phases", type=int, default=0, help="Action phases per replay, 0 for all of them")
+    parser.add_argument("--no-fidelity", action="store_true", help="Only measure speed, skip the frame by frame comparison")
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.algo)
+    import gamelib
+
+    paths = []
+    for path in args.replays or ["replays"]:
+        paths.extend(sorted(glob.glob(os.path.join(path, "*.replay"))) if os.path.isdir(path) else [path])
+    if len(paths) == 0:
+        print("No replays found")
+        return
+
+    warnings.simplefilter("ignore")
+    # gamelib debug output goes to stderr
+    sys.stderr = open(os.devnull, "w")
+
+    results = {mode: {"phases": 0, "errors": 0, "frames": 0, "parse": 0.0, "simulate": 0.0, "matched": 0, "first_mismatch": [],
+                      "health_error": [], "breaches": [], "engine_breaches": []} for mode in args.modes}
+
+    for path in paths:
+        reader = ReplayReader(path)
+        config = reader.config
+        storage = gamelib.Storage(config)
+        for n, (state, frames) in enumerate(action_phases(reader)):
+            if args.phases and n >= args.phases:
+                break
+            last = frames[-1]
+            start_health = [frames[0]["p1Stats"][0], frames[0]["p2Stats"][0]]
+            engine_health = [last["p1Stats"][0], last["p2Stats"][0]]
+            engine_breaches = [0, 0]
+            for frame in frames:
+                for breach in frame["events"]["breach"]:
+                    engine_breaches[breach[4] - 1] += 1
+
+            for mode in args.modes:
+                result = results[mode]
+
+                start = time.perf_counter()
+                try:
+                    simulator = make_simulator(gamelib, mode, config, state, storage)
+                    parsed = time.perf_counter()
+                    simulator.simulate()
+                    done = time.perf_counter()
+                    mismatch = None
+                    if not args.no_fidelity and mode != "array":
+                        mismatch = first_mismatch(gamelib, mode, config, state, storage, frames)
+                except Exception:
+                    result["errors"] += 1
+                    continue
+
+                game_state = simulator.game_state
+                health = [game_state.my_health, game_state.enemy_health]
+                result["phases"] += 1
+                result["frames"] += simulator.curr_frame
+                result["parse"] += parsed - start
+                result["simulate"] += done - parsed
+                result["health_error"].append(abs(health[0] - engine_health[0]) + abs(health[1] - engine_health[1]))
+                # A breach takes one health from the other player in the simulators
+                result["breaches"].append([start_health[1] - health[1], start_health[0] - health[0]])
+                result["engine_breaches"].append(engine_breaches)
+
+                if not args.no_fidelity and mode != "array":
+                    if mismatch is None:
+                        result["matched"] += 1
+                    else:
+                        result["first_mismatch"].append(mismatch)
+
+    sys.stderr = sys.__stderr__
+
+    for mode in args.modes:
+        result = results[mode]
+        if result["phases"] == 0:
+            print("{}: no action phases were simulated, {} raised an error".format(mode, result["errors"]))
+            continue
+        phases = result["phases"]
+        breaches = np.array(result["breaches"])
+        engine_breaches = np.array(result["engine_breaches"])
+
+        print("{}: {} action phases of {} replays, {} more raised an error".format(mode, phases, len(paths), result["errors"]))
+        print("  Speed:     {:.0f} frames/s, {:.2f}ms per action phase + {:.2f}ms to parse it".format(
+            result["frames"] / max(result["simulate"], 1e-9), result["simulate"] / phases * 1e3, result["parse"] / phases * 1e3))
+        print("  Health:    mean absolute error {:.2f}, exact in {:.0%} of the phases".format(
+            np.mean(result["health_error"]), np.mean(np.array(result["health_error"]) == 0)))
+        print("  Breaches:  simulated {} / {}, engine {} / {}, exact in {:.0%} of the phases".format(
+            breaches[:, 0].sum(), breaches[:, 1].sum(), engine_breaches[:, 0].sum(), engine_breaches[:, 1].sum(),
+            np.mean(np.all(breaches == engine_breaches, axis=1))))
+        if not args.no_fidelity and mode != "array":
+            mismatches = result["first_mismatch"]
+            print("  Frames:    every frame matches in {:.0%} of the phases, first mismatch at frame {} on average".format(
+                result["matched"] / phases, "{:.1f}".format(np.mean(mismatches)) if mismatches else "-"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Plays many local games between algo folders at once and summarizes their results.
+
+Every pair of algos plays the given number of games, switching sides after each game. Each game runs in its own
+working directory under the output directory so that concurrent games do not mix up their replays, at most
+--jobs games run at the same time. The endStats of every replay are collected into one table.
+
+The engine is engine.jar by default. Any other executable taking the same "work ALGO1 ALGO2" arguments and writing
+a replay to replays/ in its working directory can stand in for it, like scripts/fake_engine.py.
+
+Run from the C1GamesStarterKit directory:
+>python scripts/tournament.py [-g 4] [-j 2] [-e engine.jar] algos/Line_7.0 algos/Not_A_Line_7.0
+"""
+import argparse
+import concurrent.futures
+import csv
+import glob
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+from replay_reader import ReplayReader
+
+COLUMNS = ["game", "player1", "player2", "winner", "points1", "points2", "time1", "time2", "turns", "frames", "seconds", "error"]
+
+
+def engine_command(engine, algo1, algo2):
+    """The command that plays one game, java -jar for a .jar and the file itself for anything else"""
+    run = "run.ps1" if sys.platform.startswith("win") else "run.sh"
+    algos = [os.path.join(algo1, run), os.path.join(algo2, run)]
+    if engine.endswith(".jar"):
+        return ["java", "-jar", engine, "work"] + algos
+    return [engine, "work"] + algos
+
+
+def end_stats(path):
+    """The endStats of a replay, None if the game did not finish"""
+    stats = None
+    for frame in ReplayReader(path).frames():
+        stats = frame.get("endStats", stats)
+    return stats
+
+
+def play(game, engine, algo1, algo2, output, timeout):
+    """Plays one game in output/game_<game> and returns its row of the summary"""
+    workdir = os.path.join(output, "game_{}".format(game))
+    os.makedirs(os.path.join(workdir, "replays"), exist_ok=True)
+    # The engine reads the game config from its working directory
+    config = os.path.abspath("game-configs.json")
+    if os.path.exists(config) and not os.path.exists(os.path.join(workdir, "game-configs.json")):
+        os.symlink(config, os.path.join(workdir, "game-configs.json"))
+
+    row = dict.fromkeys(COLUMNS)
+    row.update(game=game, player1=os.path.basename(algo1), player2=os.path.basename(algo2))
+
+    start = time.perf_counter()
+    with open(os.path.join(workdir, "engine.log"), "w") as log:
+        try:
+            subprocess.run(engine_command(engine, algo1, algo2), cwd=workdir, stdout=log, stderr=subprocess.STDOUT, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            row["error"] = "timed out"
+        except OSError as e:
+            row["error"] = str(e)
+    row["seconds"] = round(time.perf_counter() - start, 1)
+
+    replays = sorted(glob.glob(os.path.join(workdir, "replays", "*.replay")), key=os.path.getmtime)
+    stats = end_stats(replays[-1]) if replays else None
+    if stats is None:
+        row["error"] = row["error"] or ("no endStats in the replay" if replays else "no replay written")
+        return row
+
+    row.update(winner=row["player{}".format(stats["winner"])],
+               points1=stats["player1"]["points_scored"], points2=stats["player2"]["points_scored"],
+               time1=stats["player1"]["total_computation_time"], time2=stats["player2"]["total_computation_time"],
+               turns=stats["turns"], frames=stats["frames"])
+    for player in [1, 2]:
+        if stats["player{}".format(player)]["crashed"]:
+            row["error"] = "player{} crashed".format(player)
+    return row
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(column)), *(len(str(row[column])) for row in rows)) for column in columns]
+    for values in [columns] + [[row[column] for column in columns] for row in rows]:
+        print("  ".join(str("" if value is None else value).ljust(width) for value, width in zip(values, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("algos", nargs="+", help="Algo folders, every pair of them plays")
+    parser.add_argument("-g", "--games", type=int, default=2, help="Games per pair of algos, they switch sides after each game")
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Games played at the same time, every game runs two algo processes")
+    parser.add_argument("-e", "--engine", default="engine.jar", help="The engine jar, or an executable that plays a game like it")
+    parser.add_argument("-o", "--output", default="tournament", help="Directory the games are played in")
+    parser.add_argument("-t", "--timeout", type=float, default=3600, help="Seconds before a game is stopped")
+    parser.add_argument("--csv", help="Also write the table of games to this file")
+    args = parser.parse_args()
+
+    engine = os.path.abspath(args.engine)
+    if not os.path.exists(engine):
+        print("Engine {} not found".format(engine))
+        return
+    algos = [os.path.abspath(algo.rstrip("/\\")) for algo in args.algos]
+    pairs = list(itertools.combinations(algos, 2)) if len(algos) > 1 else [(algos[0], algos[0])]
+
+    games = []
+    for algo1, algo2 in pairs:
+        for i in range(0, args.games):
+            games.append((algo1, algo2) if i % 2 == 0 else (algo2, algo1))
+
+    print("Playing {} games, {} at a time".format(len(games), args.jobs))
+    with concurrent.futures.ThreadPoolExecutor(args.jobs) as pool:
+        futures = [pool.submit(play, game, engine, algo1, algo2, os.path.abspath(args.output), args.timeout)
+                   for game, (algo1, algo2) in enumerate(games)]
+        rows = []
+        for future in concurrent.futures.as_completed(futures):
+            rows.append(future.result())
+            print("Finished game {} of {}".format(len(rows), len(games)))
+    rows.sort(key=lambda row: row["game"])
+
+    print()
+    print_table(rows, COLUMNS)
+
+    summary = []
+    for algo in sorted(set(os.path.basename(algo) for algo in algos)):
+        played = [row for row in rows if row["error"] is None and algo in (row["player1"], row["player2"])]
+        points = [row["points1"] if row["player1"] == algo else row["points2"] for row in played]
+        times = [row["time1"] if row["player1"] == algo else row["time2"] for row in played]
+        summary.append({"algo": algo, "games": len(played), "wins": sum(row["winner"] == algo for row in played),
+                        "points": round(sum(points) / len(played), 1) if played else None,
+                        "time": round(sum(times) / len(played)) if played else None})
+    print()
+    print_table(summary, ["algo", "games", "wins", "points", "time"])
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()